@@ -0,0 +1,117 @@
+# fake_telegram.py – minimal stand-ins for the python-telegram-bot objects the handlers use
+import asyncio
+import itertools
+import time
+
+_message_ids = itertools.count(1)
+_file_ids = itertools.count(1)
+
+
+class SentRecord:
+    def __init__(self, method: str, chat_id: int, text: str | None = None):
+        self.method = method
+        self.chat_id = chat_id
+        self.text = text
+        self.at = time.monotonic()
+
+
+class FakeFile:
+    def __init__(self):
+        self.file_id = f"file-{next(_file_ids)}"
+
+
+class FakeSentMessage:
+    def __init__(self, bot, chat_id: int, text: str | None = None, photo: bool = False, document: bool = False):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = next(_message_ids)
+        self.text = text
+        self.photo = [FakeFile()] if photo else []
+        self.document = FakeFile() if document else None
+
+    async def edit_text(self, text: str, **kwargs):
+        return await self.bot.edit_message_text(text=text, chat_id=self.chat_id, message_id=self.message_id)
+
+
+class FakeBot:
+    """Records every send; `upload_latency` simulates the time an upload takes."""
+
+    def __init__(self, upload_latency: float = 0.0, on_send=None):
+        self.upload_latency = upload_latency
+        self.on_send = on_send
+        self.sent: list[SentRecord] = []
+
+    def _record(self, method: str, chat_id: int, text: str | None = None):
+        record = SentRecord(method, chat_id, text)
+        self.sent.append(record)
+        if self.on_send:
+            self.on_send(record)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self._record("send_message", chat_id, text)
+        return FakeSentMessage(self, chat_id, text=text)
+
+    async def edit_message_text(self, text: str, chat_id: int | None = None, message_id: int | None = None, **kwargs):
+        self._record("edit_message_text", chat_id, text)
+        return FakeSentMessage(self, chat_id, text=text)
+
+    async def send_photo(self, chat_id: int, photo, **kwargs):
+        if not isinstance(photo, str):
+            await asyncio.sleep(self.upload_latency)
+        self._record("send_photo", chat_id, kwargs.get("caption"))
+        return FakeSentMessage(self, chat_id, photo=True)
+
+    async def send_document(self, chat_id: int, document, **kwargs):
+        if not isinstance(document, str):
+            await asyncio.sleep(self.upload_latency)
+        self._record("send_document", chat_id, kwargs.get("caption"))
+        return FakeSentMessage(self, chat_id, document=True)
+
+    async def send_media_group(self, chat_id: int, media, **kwargs):
+        await asyncio.sleep(self.upload_latency)
+        self._record("send_media_group", chat_id)
+        return [FakeSentMessage(self, chat_id, photo=True) for _ in media]
+
+
+class FakeUser:
+    def __init__(self, user_id: int, full_name: str | None = None):
+        self.id = user_id
+        self.full_name = full_name or f"bench-user-{user_id}"
+
+
+class FakeChat:
+    def __init__(self, chat_id: int):
+        self.id = chat_id
+
+
+class FakeMessage:
+    def __init__(self, bot: FakeBot, user: FakeUser, text: str = ""):
+        self.bot = bot
+        self.from_user = user
+        self.chat = FakeChat(user.id)
+        self.chat_id = user.id
+        self.message_id = next(_message_ids)
+        self.text = text
+        self.document = None
+
+    async def reply_text(self, text: str, **kwargs):
+        return await self.bot.send_message(chat_id=self.chat_id, text=text)
+
+    async def reply_markdown(self, text: str, **kwargs):
+        return await self.bot.send_message(chat_id=self.chat_id, text=text)
+
+    async def reply_document(self, document, **kwargs):
+        return await self.bot.send_document(chat_id=self.chat_id, document=document)
+
+
+class FakeUpdate:
+    def __init__(self, bot: FakeBot, user: FakeUser, text: str = ""):
+        self.effective_user = user
+        self.effective_chat = FakeChat(user.id)
+        self.message = FakeMessage(bot, user, text)
+        self.callback_query = None
+
+
+class FakeContext:
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
@@ -0,0 +1,189 @@
+# ingest.py – offline benchmark of update ingestion: webhook (real HTTP) vs simulated long polling
+#
+# Usage:
+#   python -m agron_bot.bench.ingest --updates 2000 --rate 200 --rtt 0.08
+#   python -m agron_bot.bench.ingest --mode polling --poll-interval 1.0
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+
+from agron_bot.bench.fake_telegram import FakeBot
+from agron_bot.core.webhook import WebhookServer
+from agron_bot.logger import logger
+from agron_bot.utils import percentile
+
+SECRET = "bench-secret"
+
+
+def synthetic_update(update_id: int, user_id: int) -> dict:
+    """A private-chat text message as Telegram would POST it."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"bench-{user_id}"},
+            "text": f"{100_000_000 + update_id % 900_000_000}",
+        },
+    }
+
+
+class Arrivals:
+    """When each update was sent by "Telegram" and when the dispatcher got it."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.sent: dict[int, float] = {}
+        self.latencies: list[float] = []
+        self.done = asyncio.Event()
+
+    def dispatched(self, update_id: int):
+        self.latencies.append(time.monotonic() - self.sent[update_id])
+        if len(self.latencies) >= self.total:
+            self.done.set()
+
+
+async def _dispatch(update_queue: asyncio.Queue, arrivals: Arrivals):
+    # Stands in for Application's update fetcher: take updates off the queue in order
+    while True:
+        update = await update_queue.get()
+        arrivals.dispatched(update.update_id)
+
+
+async def _produce(total: int, rate: float, users: int, send):
+    interval = 1 / rate if rate else 0
+    started = time.monotonic()
+    tasks = []
+    for n in range(total):
+        # Paced against the start time so a slow send does not lower the offered rate
+        delay = started + n * interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(synthetic_update(n + 1, 1000 + n % users))))
+    await asyncio.gather(*tasks)
+
+
+async def bench_webhook(total: int, rate: float, users: int, rtt: float, concurrency: int) -> dict:
+    update_queue = asyncio.Queue()
+    arrivals = Arrivals(total)
+    server = WebhookServer(FakeBot(), update_queue, SECRET)
+    port = server.listen("127.0.0.1", 0)
+    url = f"http://127.0.0.1:{port}{server.path}"
+    client = AsyncHTTPClient(max_clients=concurrency)
+    failed = 0
+
+    async def send(update: dict):
+        nonlocal failed
+        arrivals.sent[update["update_id"]] = time.monotonic()
+        # Telegram → us is one network leg
+        await asyncio.sleep(rtt / 2)
+        request = HTTPRequest(url, method="POST", body=json.dumps(update),
+                              headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": SECRET})
+        response = await client.fetch(request, raise_error=False)
+        if response.code != 200:
+            failed += 1
+            arrivals.dispatched(update["update_id"])
+
+    dispatcher = asyncio.create_task(_dispatch(update_queue, arrivals))
+    started = time.monotonic()
+    await _produce(total, rate, users, send)
+    await arrivals.done.wait()
+    wall = time.monotonic() - started
+    dispatcher.cancel()
+    client.close()
+    await server.stop()
+    return _report("webhook", arrivals, wall, failed=failed)
+
+
+async def bench_polling(total: int, rate: float, users: int, rtt: float, poll_interval: float, batch: int) -> dict:
+    """getUpdates loop: one request per round trip, long-polling when idle, up to `batch` updates each."""
+    update_queue = asyncio.Queue()
+    arrivals = Arrivals(total)
+    pending: list[dict] = []
+    has_pending = asyncio.Event()
+    bot = FakeBot()
+    from telegram import Update
+
+    async def send(update: dict):
+        arrivals.sent[update["update_id"]] = time.monotonic()
+        pending.append(update)
+        has_pending.set()
+
+    async def poller():
+        while True:
+            await asyncio.sleep(rtt / 2)           # request reaches Telegram
+            await has_pending.wait()               # long poll: held open until there is something
+            taken, pending[:] = pending[:batch], pending[batch:]
+            if not pending:
+                has_pending.clear()
+            await asyncio.sleep(rtt / 2)           # response comes back
+            for data in taken:
+                update_queue.put_nowait(Update.de_json(data, bot))
+            if poll_interval:
+                await asyncio.sleep(poll_interval)
+
+    dispatcher = asyncio.create_task(_dispatch(update_queue, arrivals))
+    polling = asyncio.create_task(poller())
+    started = time.monotonic()
+    await _produce(total, rate, users, send)
+    await arrivals.done.wait()
+    wall = time.monotonic() - started
+    dispatcher.cancel()
+    polling.cancel()
+    return _report("polling", arrivals, wall)
+
+
+def _report(mode: str, arrivals: Arrivals, wall: float, failed: int = 0) -> dict:
+    return {
+        "mode": mode,
+        "updates": arrivals.total,
+        "failed": failed,
+        "wall_sec": round(wall, 3),
+        "throughput_per_sec": round(arrivals.total / wall, 1) if wall else 0.0,
+        "latency_p50_ms": round(percentile(arrivals.latencies, 0.50) * 1000, 2),
+        "latency_p95_ms": round(percentile(arrivals.latencies, 0.95) * 1000, 2),
+        "latency_p99_ms": round(percentile(arrivals.latencies, 0.99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline update-ingestion benchmark: webhook vs long polling.")
+    parser.add_argument("--mode", choices=("both", "webhook", "polling"), default="both")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=100, help="updates per second offered (0 = all at once)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rtt", type=float, default=0.05, help="simulated round trip to Telegram, seconds")
+    parser.add_argument("--concurrency", type=int, default=40, help="parallel webhook connections (max_connections)")
+    parser.add_argument("--poll-interval", type=float, default=0.0, help="pause between getUpdates calls")
+    parser.add_argument("--batch", type=int, default=100, help="updates per getUpdates response")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    async def run():
+        reports = []
+        if args.mode in ("both", "webhook"):
+            reports.append(await bench_webhook(args.updates, args.rate, args.users, args.rtt, args.concurrency))
+        if args.mode in ("both", "polling"):
+            reports.append(await bench_polling(args.updates, args.rate, args.users, args.rtt,
+                                               args.poll_interval, args.batch))
+        return reports
+
+    reports = asyncio.run(run())
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    print("\n📊 Ingestion benchmark")
+    keys = [k for k in reports[0] if k != "mode"]
+    print(f"  {'':<20}" + "".join(f"{r['mode']:>12}" for r in reports))
+    for key in keys:
+        print(f"  {key:<20}" + "".join(f"{r[key]:>12}" for r in reports))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# load.py – offline load test: fake users → handle_message → queue → worker → fake Agron targets
+#
+# Usage:
+#   python -m agron_bot.bench.load --users 5 --ids 4 --targets 2 --latency search=0.5 --failure-rate 0.02
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+from agron_bot.bench.fake_telegram import FakeBot, FakeContext, FakeUpdate, FakeUser
+from agron_bot.core.fake_automation import FakeAgronBackend, STEPS
+from agron_bot.handlers.messages import NOT_FOUND_MESSAGE
+from agron_bot.logger import logger
+from agron_bot.utils import percentile
+
+# Default per-step latencies (seconds), roughly matching a warm Agron on our Windows box
+DEFAULT_LATENCIES = {"launch": 2.0, "load": 3.0, "filter": 0.3, "search": 0.8, "open_result": 0.5, "close": 0.2}
+
+
+def parse_latencies(items: list[str]) -> dict:
+    latencies = dict(DEFAULT_LATENCIES)
+    for item in items or []:
+        step, _, value = item.partition("=")
+        if step not in STEPS:
+            raise SystemExit(f"Unknown step '{step}' (expected one of {', '.join(STEPS)})")
+        latencies[step] = float(value)
+    return latencies
+
+
+class Tracker:
+    """Matches bot sends back to submissions (FIFO per chat) to measure queue wait and end-to-end latency."""
+
+    def __init__(self):
+        self.submitted = 0
+        self.queue_waits = []
+        self.latencies = []
+        self.completed = 0
+        self.errors = 0
+        self.not_found = 0
+        self._waiting_start = defaultdict(deque)
+        self._waiting_done = defaultdict(deque)
+        self.all_done = asyncio.Event()
+
+    def submit(self, chat_id: int):
+        now = time.monotonic()
+        self.submitted += 1
+        self._waiting_start[chat_id].append(now)
+        self._waiting_done[chat_id].append(now)
+
+    def on_send(self, record):
+        pending_start = self._waiting_start[record.chat_id]
+        pending_done = self._waiting_done[record.chat_id]
+        text = record.text or ""
+        if record.method == "send_message" and text.startswith("🔍") and pending_start:
+            self.queue_waits.append(record.at - pending_start.popleft())
+        elif record.method == "send_document" and pending_done:
+            self.latencies.append(record.at - pending_done.popleft())
+            self.completed += 1
+        elif record.method == "send_message" and text == NOT_FOUND_MESSAGE and pending_done:
+            pending_done.popleft()
+            self.not_found += 1
+        elif record.method == "send_message" and text.startswith(("❗", "🛑")) and pending_done:
+            pending_done.popleft()
+            self.errors += 1
+        if self.completed + self.not_found + self.errors >= self.submitted:
+            self.all_done.set()
+
+
+async def run_benchmark(users: int, ids_per_user: int, targets: int, latencies: dict, failure_rate: float,
+                        hang_rate: float, id_pool: int, interval: float, upload_latency: float,
+                        timeout: float, seed: int, scheduler: str = "fair", missing_rate: float = 0.0,
+                        stall_rate: float = 0.0) -> dict:
+    # Imported here so module-level state (queues, pools) binds to this event loop
+    from agron_bot.core.agron_session import AgronSession
+    from agron_bot.core.state import create_queue
+    from agron_bot.core.targets import TargetPool
+    from agron_bot.core.watchdog import watchdog
+    from agron_bot.handlers.handlers import enable_position_updates, handle_message
+    from agron_bot.worker import worker
+
+    tracker = Tracker()
+    bot = FakeBot(upload_latency=upload_latency, on_send=tracker.on_send)
+    context = FakeContext(bot)
+
+    pool = TargetPool()
+    for i in range(targets):
+        backend = FakeAgronBackend(latencies=latencies, failure_rate=failure_rate, hang_rate=hang_rate, seed=seed + i,
+                                   missing_rate=missing_rate, stall_rate=stall_rate)
+        pool.register(f"fake{i + 1}", AgronSession(backend=backend))
+
+    queue = create_queue(scheduler)
+    enable_position_updates(queue)
+    worker_task = asyncio.create_task(worker(queue, pool))
+    pool_health_task = asyncio.create_task(pool.health_check_loop(interval=1))
+
+    rng = random.Random(seed)
+    ids = [str(rng.randint(100_000_000, 999_999_999)) for _ in range(id_pool or users * ids_per_user)]
+    submissions = [(FakeUser(1000 + u), rng.choice(ids) if id_pool else ids[u * ids_per_user + n])
+                   for n in range(ids_per_user) for u in range(users)]
+
+    tracemalloc.start()
+    started = time.monotonic()
+    for user, id_number in submissions:
+        tracker.submit(user.id)
+        await handle_message(queue)(FakeUpdate(bot, user, id_number), context)
+        if interval:
+            await asyncio.sleep(interval)
+
+    try:
+        await asyncio.wait_for(tracker.all_done.wait(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"⏰ Benchmark timed out after {timeout}s")
+    wall = time.monotonic() - started
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    worker_task.cancel()
+    pool_health_task.cancel()
+    pool.shutdown()
+
+    backends = [t.session.backend for t in pool.targets.values()]
+    stalls = watchdog.snapshot()
+    user_waits = [s["avg"] for s in queue.wait_stats().values()]
+    return {
+        "submitted": tracker.submitted,
+        "completed": tracker.completed,
+        "not_found": tracker.not_found,
+        "errors": tracker.errors,
+        "wall_sec": round(wall, 2),
+        "throughput_per_min": round(tracker.completed / wall * 60, 2) if wall else 0.0,
+        "queue_wait_p50": round(percentile(tracker.queue_waits, 0.50), 3),
+        "queue_wait_p95": round(percentile(tracker.queue_waits, 0.95), 3),
+        "latency_p50": round(percentile(tracker.latencies, 0.50), 3),
+        "latency_p95": round(percentile(tracker.latencies, 0.95), 3),
+        "latency_p99": round(percentile(tracker.latencies, 0.99), 3),
+        "user_wait_avg_min": min(user_waits, default=0.0),
+        "user_wait_avg_max": max(user_waits, default=0.0),
+        "peak_memory_mb": round(peak_memory / 1024 / 1024, 2),
+        "agron_launches": sum(b.launch_count for b in backends),
+        "agron_searches": sum(b.search_count for b in backends),
+        "agron_crashes": sum(b.crash_count for b in backends),
+        "agron_stalls": sum(b.stall_count for b in backends),
+        "watchdog_stalls": stalls["stalls_total"],
+        "watchdog_retried": stalls["retried"],
+        "watchdog_gave_up": stalls["gave_up"],
+        "recovery_p50": stalls["recovery_p50"],
+        "recovery_max": stalls["recovery_max"],
+    }
+
+
+def print_report(report: dict):
+    print("\n📊 Benchmark results")
+    for key, value in report.items():
+        print(f"  {key:<20} {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Agron Bot load test with simulated Agron and Telegram.")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--ids", type=int, default=4, help="IDs submitted per user")
+    parser.add_argument("--targets", type=int, default=1, help="number of fake Agron targets")
+    parser.add_argument("--latency", action="append", metavar="STEP=SEC",
+                        help=f"override a step latency ({', '.join(STEPS)})")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="chance a click crashes Agron")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="chance a click freezes Agron")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="chance a click blocks until the watchdog kills Agron")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="share of IDs with no Agron record")
+    parser.add_argument("--id-pool", type=int, default=0,
+                        help="draw IDs from a pool of this size (0 = every ID unique) to exercise cache/coalescing")
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between submissions")
+    parser.add_argument("--upload-latency", type=float, default=0.2, help="simulated seconds per file upload")
+    parser.add_argument("--scheduler", choices=("fair", "fifo"), default="fair")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", help="where logs/history are written (default: a temp directory)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep bot INFO logging on the console")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+    # The bot writes history/journal/traces relative to the working directory
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="agron-bench-"))
+
+    report = asyncio.run(run_benchmark(
+        users=args.users, ids_per_user=args.ids, targets=args.targets,
+        latencies=parse_latencies(args.latency), failure_rate=args.failure_rate, hang_rate=args.hang_rate,
+        id_pool=args.id_pool, interval=args.interval, upload_latency=args.upload_latency,
+        timeout=args.timeout, seed=args.seed, scheduler=args.scheduler,
+        missing_rate=args.missing_rate, stall_rate=args.stall_rate,
+    ))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
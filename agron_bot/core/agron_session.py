@@ -0,0 +1,308 @@
+# agron_session.py – long-lived Agron instance reused across searches
+import os
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+from agron_bot.core.automation import create_backend
+from agron_bot.core.cancel_state import CancelToken, Cancelled
+from agron_bot.core.waits import (
+    wait_until,
+    window_present,
+    region_signature,
+    region_changed,
+    region_stable,
+)
+from agron_bot.core.locator import Locator
+from agron_bot.core.readiness import ReadinessDetector, is_blank
+from agron_bot.core.tracing import span
+from agron_bot.core.watchdog import StepClock
+from agron_bot.logger import logger, log_search_step
+
+# Load license from environment
+load_dotenv()
+AGRON_LICENSE = os.getenv("AGRON_LICENSE", "7958423837")
+AGRON_DIR = os.getenv("AGRON_DIR", r"C:\\Users\\USER\\Desktop\\אגרון\\אגרון")
+AGRON_EXE = os.path.join(AGRON_DIR, "ap2006.exe")
+
+REGISTRATION_TITLE = "רישום"
+MAIN_TITLE = "אגרון פלוס 2006"
+
+# Maximum time (seconds) each UI step may take before it is treated as failed
+STEP_TIMEOUTS = {
+    "registration_window": 10,
+    "main_window": 20,
+    "app_loaded": 15,
+    "filter_open": 5,
+    "results_shown": 10,
+    "result_open": 10,
+    "window_closed": 5,
+}
+
+# Reference layout; buttons are found by core/locator.py and these regions move with them
+RESULT_REGION = (622, 207, 700, 473)
+
+# Small regions watched to detect that a click took effect
+FILTER_BUTTON_REGION = (283, 24, 80, 40)
+FILTER_DIALOG_REGION = (814, 768, 200, 80)
+RESULT_ROW_REGION = (1029, 450, 400, 40)
+
+
+class RecordNotFound(Exception):
+    """Agron finished the search but has no record for the ID."""
+
+
+class AgronSession:
+    """
+    Keeps a single Agron instance open and licensed between searches.
+    The app is launched lazily on the first search and relaunched automatically
+    when its process dies or its main window disappears / stops responding.
+    """
+
+    def __init__(self, backend=None, exe_path: str = AGRON_EXE, license_key: str = AGRON_LICENSE):
+        self.backend = backend or create_backend()
+        self.exe_path = exe_path
+        self.license_key = license_key
+        self.process = None
+        self.main_window = None
+        self.launches = 0
+        self.locator = Locator(self.backend)
+        self._lock = threading.Lock()
+        # Agron windows the running search has open (closed again if it is cancelled)
+        self._open_regions: list = []
+        # Step trace read by the watchdog
+        self.clock = StepClock()
+
+    def is_healthy(self) -> bool:
+        """Check that Agron is running with a responsive main window."""
+        if not self._alive():
+            return False
+        window = self.backend.find_window(MAIN_TITLE)
+        if not window:
+            return False
+        if not self.backend.is_window_responsive(window):
+            logger.warning("⚠️ Agron main window is not responding.")
+            return False
+        self.main_window = window
+        return True
+
+    def ensure_ready(self):
+        """Launch Agron if needed, or relaunch it if the running instance is dead or hung."""
+        if self.is_healthy():
+            return
+        if self.process is not None:
+            logger.warning("♻️ Agron session is unhealthy – relaunching.")
+        self.relaunch()
+
+    def launch(self):
+        with self._step("launch"):
+            self._launch()
+        self.launches += 1
+
+    def _launch(self):
+        log_search_step("Launching Agron...")
+        try:
+            self.process = self.backend.launch(self.exe_path, cwd=os.path.dirname(self.exe_path))
+            log_search_step("✅ Agron executable launched.")
+        except Exception as e:
+            logger.error(f"❌ Failed to launch Agron: {str(e)}")
+            raise
+
+        with self._step("license"):
+            if not self._wait_for_window(REGISTRATION_TITLE, "registration_window"):
+                raise RuntimeError("❌ Registration window not found.")
+            self.backend.write(self.license_key, interval=0.1)
+            self.backend.press("enter")
+            log_search_step("🔑 License entered.")
+
+        with self._step("window_ready"):
+            self.main_window = self._wait_for_window(MAIN_TITLE, "main_window")
+            if not self.main_window:
+                raise RuntimeError("❌ Agron main window did not appear.")
+            self._focus()
+
+            log_search_step("⏳ Waiting for Agron to finish loading...")
+            stable = region_stable(self.backend, self.locator.shift_region(FILTER_BUTTON_REGION), frames=3)
+            loaded = wait_until(
+                lambda: self.backend.is_window_responsive(self.main_window) and stable(),
+                STEP_TIMEOUTS["app_loaded"], "app_loaded", poll_interval=0.25,
+            )
+            if not loaded:
+                raise RuntimeError("❌ Agron did not finish loading.")
+
+    def close(self):
+        """Terminate the Agron process (used on relaunch and on bot shutdown)."""
+        if self.process is None:
+            return
+        try:
+            self.backend.kill(self.process)
+            log_search_step("❌ Agron process closed.")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to close Agron: {e}")
+        self.process = None
+        self.main_window = None
+
+    def force_kill(self):
+        """
+        Kill the Agron process tree from outside the automation thread (watchdog). Does not
+        take the session lock – the thread holding it is the one that is stuck; its blocked
+        step then fails and search() cleans up as after any crash.
+        """
+        process = self.process
+        if process is None:
+            return
+        try:
+            self.backend.kill_tree(process)
+            logger.warning("💀 Agron process tree killed by the watchdog.")
+        except Exception as e:
+            logger.error(f"❌ Failed to kill the Agron process tree: {e}")
+
+    def relaunch(self):
+        self.close()
+        self.launch()
+
+    def search(self, id_number: str, cancel: CancelToken | None = None):
+        """
+        Run one search on the already-loaded filter screen and return the result screenshot.
+        `cancel` is checked between steps; a cancelled search closes the windows it opened
+        (leaving Agron on the main window) and raises Cancelled.
+        """
+        cancel = cancel or CancelToken()
+        with self._lock:
+            cancel.check()
+            self.ensure_ready()
+            self._open_regions = []
+            try:
+                return self._run_search(id_number, cancel)
+            except RecordNotFound:
+                # Agron is back on the main window – nothing to recover
+                raise
+            except Cancelled:
+                self._abandon_search()
+                raise
+            except Exception:
+                # Unknown dialog state – start from a fresh instance next time
+                self.close()
+                raise
+
+    def _run_search(self, id_number: str, cancel: CancelToken):
+        cancel.check()
+        self._focus()
+
+        with self._step("filter"):
+            self._click_and_wait(self.locator.locate("filter_button"),
+                                 self.locator.shift_region(FILTER_DIALOG_REGION), "filter_open")
+            self._open_regions = [FILTER_DIALOG_REGION]
+            log_search_step("🔍 Clicked filter button.")
+            cancel.check()
+
+            self.backend.write(id_number, interval=0.05)
+            log_search_step("⌨️ Entered ID number.")
+        cancel.check()
+
+        with self._step("search"):
+            # A slow search just keeps the grid unchanged, so only a positive signal means "no record":
+            # the grid switched to an empty one, or it stayed empty for the whole step timeout
+            results = self._click_and_wait(self.locator.locate("search_button"),
+                                           self.locator.shift_region(RESULT_ROW_REGION), "results_shown",
+                                           required=False)
+            log_search_step("🔎 Clicked search button.")
+            if not results.changed:
+                if not is_blank(results.baseline):
+                    # Still showing an earlier row – opening it would return the wrong record
+                    raise RuntimeError("❌ Agron results did not update after the search.")
+                self._not_found(id_number, [FILTER_DIALOG_REGION])
+            if is_blank(results.frame):
+                self._not_found(id_number, [FILTER_DIALOG_REGION])
+        cancel.check()
+
+        with self._step("open_result"):
+            self._click_and_wait(self.locator.locate("result_row"),
+                                 self.locator.shift_region(RESULT_REGION), "result_open", double=True)
+            self._open_regions = [RESULT_REGION, FILTER_DIALOG_REGION]
+            log_search_step("📂 Opened result.")
+        cancel.check()
+
+        with self._step("screenshot"):
+            image = self.backend.screenshot(region=self.locator.shift_region(RESULT_REGION))
+            log_search_step("📸 Screenshot captured.")
+
+        with self._step("close"):
+            self._return_to_main()
+        return image
+
+    @contextmanager
+    def _step(self, name: str):
+        """A traced automation step, also marked on the watchdog's step clock."""
+        self.clock.enter(name)
+        try:
+            with span(name):
+                yield
+        finally:
+            self.clock.leave()
+
+    def _abandon_search(self):
+        """Close whatever the cancelled search left open, so the next job starts on the main window."""
+        log_search_step(f"🛑 Search cancelled – closing {len(self._open_regions)} Agron window(s).")
+        if not self._open_regions:
+            return
+        try:
+            with self._step("close"):
+                self._return_to_main(self._open_regions)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not close Agron windows after cancellation ({e}) – restarting Agron.")
+            self.close()
+
+    def _not_found(self, id_number: str, open_regions: list):
+        log_search_step(f"🚫 No matching record for ID {id_number}.")
+        with self._step("close"):
+            self._return_to_main(open_regions)
+        raise RecordNotFound(id_number)
+
+    def _click_and_wait(self, point: tuple[int, int], watch_region: tuple[int, int, int, int],
+                        step: str, double: bool = False, required: bool = True) -> ReadinessDetector:
+        """
+        Click `point` and wait until `watch_region` has changed and stopped changing.
+        With `required` False a timeout is not an error; the caller inspects the detector.
+        """
+        ready = ReadinessDetector(self.backend, watch_region)
+        if double:
+            self.backend.double_click(*point)
+        else:
+            self.backend.click(*point)
+        # Stop waiting early if Agron exits instead of reacting
+        responded = wait_until(lambda: ready() or not self._alive(), STEP_TIMEOUTS[step], step, max_interval=0.2)
+        if not responded and required:
+            raise RuntimeError(f"❌ Agron did not respond in step '{step}'.")
+        if not self._alive():
+            raise RuntimeError(f"❌ Agron exited during step '{step}'.")
+        return ready
+
+    def _alive(self) -> bool:
+        return self.backend.is_process_alive(self.process)
+
+    def _return_to_main(self, open_regions: list | None = None):
+        """Close the result and filter windows so the next search starts from the main window."""
+        open_regions = open_regions or [RESULT_REGION, FILTER_DIALOG_REGION]
+        for i, region in enumerate(open_regions):
+            region = self.locator.shift_region(region)
+            baseline = region_signature(self.backend, region)
+            self.backend.hotkey("alt", "f4")
+            log_search_step(f"❌ Closed window {i+1}/{len(open_regions)}")
+            if not wait_until(region_changed(self.backend, region, baseline),
+                              STEP_TIMEOUTS["window_closed"], "window_closed"):
+                raise RuntimeError("❌ Agron window did not close.")
+
+    def _focus(self):
+        try:
+            self.backend.focus(self.main_window)
+            log_search_step("🪟 Focused on Agron window.")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not focus window: {str(e)}")
+
+    def _wait_for_window(self, title_substring: str, step: str):
+        """Wait for a window containing specific title text."""
+        window = wait_until(window_present(self.backend, title_substring), STEP_TIMEOUTS[step], step)
+        if window:
+            log_search_step(f"✅ Found window: {window.title}")
+        return window
@@ -0,0 +1,97 @@
+# automation.py – thin wrapper over the GUI automation libraries used to drive Agron
+import os
+import subprocess
+
+AGRON_BACKEND = os.getenv("AGRON_BACKEND", "pyautogui")
+
+
+class PyAutoGuiBackend:
+    """Real backend: drives the Agron window with pyautogui / pygetwindow (Windows only)."""
+
+    def __init__(self):
+        # Imported lazily so the rest of the bot can be loaded on machines without a desktop
+        import pyautogui
+        import pygetwindow
+
+        self._gui = pyautogui
+        self._gw = pygetwindow
+
+    def launch(self, exe_path: str, cwd: str):
+        return subprocess.Popen(exe_path, cwd=cwd)
+
+    def is_process_alive(self, process) -> bool:
+        return process is not None and process.poll() is None
+
+    def kill(self, process):
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait(timeout=5)
+
+    def kill_tree(self, process):
+        """Force-kill ap2006.exe and every process it started (a hung instance may hold child dialogs)."""
+        if process is None or process.poll() is not None:
+            return
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/PID", str(process.pid), "/T", "/F"], capture_output=True, timeout=15)
+        else:
+            process.kill()
+        process.wait(timeout=5)
+
+    def find_window(self, title_substring: str):
+        windows = self._gw.getWindowsWithTitle(title_substring)
+        return windows[0] if windows else None
+
+    def is_window_responsive(self, window) -> bool:
+        """Return False if Windows reports the window as hung (not pumping messages)."""
+        try:
+            import ctypes
+            return not ctypes.windll.user32.IsHungAppWindow(window._hWnd)
+        except Exception:
+            return True
+
+    def focus(self, window):
+        window.activate()
+        window.maximize()
+
+    def write(self, text: str, interval: float = 0.0):
+        self._gui.write(text, interval=interval)
+
+    def press(self, key: str):
+        self._gui.press(key)
+
+    def hotkey(self, *keys: str):
+        self._gui.hotkey(*keys)
+
+    def click(self, x: int, y: int):
+        self._gui.click(x=x, y=y)
+
+    def double_click(self, x: int, y: int):
+        self._gui.doubleClick(x=x, y=y)
+
+    def screenshot(self, region: tuple[int, int, int, int] | None = None):
+        return self._gui.screenshot(region=region)
+
+
+def _create_fake_backend():
+    from agron_bot.core.fake_automation import FakeAgronBackend
+    return FakeAgronBackend()
+
+
+# Backend kinds that automation targets can be built from, by name
+BACKEND_FACTORIES = {
+    "pyautogui": PyAutoGuiBackend,
+    "fake": _create_fake_backend,
+}
+
+
+def register_backend(kind: str, factory):
+    """Register a new backend kind (e.g. a remote desktop driver) usable in AGRON_TARGETS."""
+    BACKEND_FACTORIES[kind.lower()] = factory
+
+
+def create_backend(name: str | None = None):
+    """Build the automation backend selected by AGRON_BACKEND ("pyautogui" or "fake")."""
+    name = (name or AGRON_BACKEND).lower()
+    if name not in BACKEND_FACTORIES:
+        raise ValueError(f"Unknown automation backend: {name}")
+    return BACKEND_FACTORIES[name]()
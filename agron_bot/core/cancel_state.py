@@ -1,19 +1,29 @@
-# cancel_state.py
-from collections import defaultdict
+# cancel_state.py – per-job cancellation tokens, checked between Agron automation steps
 import threading
 
-cancel_flags = defaultdict(threading.Event)
-in_progress_flags = defaultdict(threading.Event)
 
-def mark_cancel(user_id: int):
-    cancel_flags[user_id].set()
+class Cancelled(Exception):
+    """Raised at an automation checkpoint once the job's token was cancelled."""
 
-def should_cancel(user_id: int) -> bool:
-    return cancel_flags[user_id].is_set()
 
-def clear_cancel(user_id: int):
-    cancel_flags[user_id].clear()
-    in_progress_flags[user_id].clear()
+class CancelToken:
+    """
+    Cancellation flag owned by one job. Set from the event loop (/cancel), read on the
+    automation thread at every checkpoint; nothing is keyed by user, so a user's jobs
+    cancel independently and nothing outlives the job.
+    """
 
-def mark_in_progress(user_id: int):
-    in_progress_flags[user_id].set()
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """Checkpoint: raise Cancelled if the job was cancelled."""
+        if self._event.is_set():
+            raise Cancelled()
@@ -0,0 +1,86 @@
+# delivery.py – bounded upload stage, so automation targets are free again as soon as a result is captured
+import asyncio
+import os
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from agron_bot.logger import logger
+
+DELIVERY_CONCURRENCY = int(os.getenv("DELIVERY_CONCURRENCY", "3"))
+# Captured results waiting for upload; when full, the worker waits before taking more
+DELIVERY_MAX_PENDING = int(os.getenv("DELIVERY_MAX_PENDING", "20"))
+DELIVERY_RETRIES = int(os.getenv("DELIVERY_RETRIES", "3"))
+DELIVERY_BACKOFF = float(os.getenv("DELIVERY_BACKOFF", "1.0"))
+
+
+async def send_with_retry(send, *args, attempts: int = DELIVERY_RETRIES, **kwargs):
+    """
+    Call a bot send method, retrying flood limits (RetryAfter) and transient network
+    errors (NetworkError / TimedOut) with exponential backoff. BadRequest is not retried.
+    """
+    delay = DELIVERY_BACKOFF
+    for attempt in range(1, attempts + 1):
+        try:
+            return await send(*args, **kwargs)
+        except RetryAfter as e:
+            if attempt == attempts:
+                raise
+            wait = float(e.retry_after)
+        except NetworkError as e:
+            if isinstance(e, BadRequest) or attempt == attempts:
+                raise
+            wait = delay
+            delay *= 2
+        logger.warning(f"⚠️ {getattr(send, '__name__', 'send')} failed (attempt {attempt}/{attempts}), retrying in {wait:.1f}s")
+        await asyncio.sleep(wait)
+
+
+class DeliveryStage:
+    """
+    Runs upload coroutines on a fixed number of consumer tasks. submit() waits while
+    DELIVERY_MAX_PENDING deliveries are already queued, which bounds the memory held by
+    captured-but-unsent results.
+    """
+
+    def __init__(self, concurrency: int = DELIVERY_CONCURRENCY, max_pending: int = DELIVERY_MAX_PENDING):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.delivered = 0
+        self.failed = 0
+        self._queue: asyncio.Queue | None = None
+        self._consumers: list[asyncio.Task] = []
+
+    async def submit(self, func, *args):
+        """Queue `func(*args)` (a coroutine function) for delivery."""
+        self._ensure_started()
+        await self._queue.put((func, args))
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def drain(self):
+        """Wait until every submitted delivery has finished."""
+        if self._queue:
+            await self._queue.join()
+
+    def _ensure_started(self):
+        # Created lazily so the queue and tasks belong to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+
+    async def _consume(self):
+        while True:
+            func, args = await self._queue.get()
+            try:
+                await func(*args)
+                self.delivered += 1
+            except Exception:
+                self.failed += 1
+                logger.exception(f"❌ Delivery '{func.__name__}' failed")
+            finally:
+                self._queue.task_done()
+
+
+delivery = DeliveryStage()
@@ -0,0 +1,253 @@
+# eta.py – online model of how long a search takes, used for the wait estimates shown to users
+import asyncio
+import json
+import os
+import threading
+import time
+
+from agron_bot.logger import logger
+
+ETA_STATE_FILE = os.getenv("ETA_STATE_FILE", os.path.join("logs", "eta.json"))
+ETA_ALPHA = float(os.getenv("ETA_ALPHA", "0.2"))
+# Used only until the first run is observed (or bootstrapped from history)
+ETA_DEFAULT_SECONDS = float(os.getenv("ETA_DEFAULT_SECONDS", "27"))
+# The model is written to ETA_STATE_FILE at most this often (and once more at exit)
+ETA_SAVE_INTERVAL = float(os.getenv("ETA_SAVE_INTERVAL", "30"))
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate in O(1) memory (the P² algorithm, Jain & Chlamtac 1985).
+    Five markers track the min, max, the target quantile and two midpoints.
+    """
+
+    def __init__(self, q: float):
+        self.q = q
+        self.heights: list[float] = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0, 2 * q, 4 * q, 2 + 2 * q, 4]
+        self.increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, x: float):
+        h = self.heights
+        if len(h) < 5:
+            h.append(x)
+            h.sort()
+            return
+
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= x < h[i + 1])
+
+        for i in range(k + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        n = self.positions
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if not h[i - 1] < candidate < h[i + 1]:
+                    candidate = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = candidate
+                n[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        h, n = self.heights, self.positions
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> float | None:
+        h = self.heights
+        if not h:
+            return None
+        if len(h) < 5:
+            return h[min(len(h) - 1, round(self.q * (len(h) - 1)))]
+        return h[2]
+
+    def to_dict(self) -> dict:
+        # Copies: the dict is serialised off the event loop while new runs keep updating the sketch
+        return {"q": self.q, "heights": list(self.heights), "positions": list(self.positions),
+                "desired": list(self.desired)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "P2Quantile":
+        sketch = cls(data["q"])
+        sketch.heights = list(data["heights"])
+        sketch.positions = list(data["positions"])
+        sketch.desired = list(data["desired"])
+        return sketch
+
+
+class EtaModel:
+    """
+    Learns how long a job holds a target from completed runs (EWMA + streaming p50/p90) and
+    turns a queue position into a wait estimate, given how many targets are working and how
+    far along the running jobs are. That is the Agron search only: uploads run afterwards in
+    the delivery stage, with the target already free. Work is counted in searches, so a
+    batch of n IDs weighs n. save_loop() writes the state to ETA_STATE_FILE off the event loop.
+    """
+
+    def __init__(self, path: str = ETA_STATE_FILE, alpha: float = ETA_ALPHA, default: float = ETA_DEFAULT_SECONDS):
+        self.path = path
+        self.alpha = alpha
+        self.default = default
+        self.mean: float | None = None
+        self.count = 0
+        self.p50 = P2Quantile(0.5)
+        self.p90 = P2Quantile(0.9)
+        self.workers = lambda: 1
+        self._running: dict[int, tuple[float, int]] = {}   # job_id -> (monotonic start time, weight)
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def bind_workers(self, count_func):
+        """`count_func()` returns how many targets are currently processing jobs in parallel."""
+        self.workers = count_func
+
+    def job_started(self, job_id: int, weight: int = 1):
+        """Track a running job of `weight` searches."""
+        with self._lock:
+            self._running[job_id] = (time.monotonic(), weight)
+
+    def job_finished(self, job_id: int, duration: float | None = None):
+        """Stop tracking a job; pass `duration` (of one search) only for runs that completed normally."""
+        with self._lock:
+            self._running.pop(job_id, None)
+            if duration is not None:
+                self._add(duration)
+                self._dirty = True
+
+    @property
+    def expected(self) -> float:
+        return self.mean if self.mean is not None else self.default
+
+    @property
+    def pessimistic(self) -> float:
+        value = self.p90.value()
+        return max(value, self.expected) if value is not None else self.expected * 1.5
+
+    def estimate_wait(self, position: int, work_ahead: int | None = None, weight: int = 1,
+                      pessimistic: bool = False) -> float:
+        """
+        Seconds until the job at 1-based `position` is done (upload not included). `work_ahead`
+        is the searches queued in front of it (default: one per job) and `weight` its own.
+        """
+        per_search = self.pessimistic if pessimistic else self.expected
+        workers = max(1, self.workers())
+        now = time.monotonic()
+        with self._lock:
+            remaining = sum(max(0.0, w * per_search - (now - started)) for started, w in self._running.values())
+            busy = len(self._running)
+        if work_ahead is None:
+            work_ahead = max(0, position - 1)
+        # Running jobs and the ones ahead of us are shared between the workers; ours runs after them
+        ahead = remaining + work_ahead * per_search
+        if busy < workers and position <= workers - busy:
+            ahead = 0.0
+        return ahead / workers + weight * per_search
+
+    def running_left(self) -> float:
+        """Seconds until the longest-running job in progress is expected to finish."""
+        now = time.monotonic()
+        with self._lock:
+            return max((max(0.0, w * self.expected - (now - started)) for started, w in self._running.values()),
+                       default=0.0)
+
+    async def save_loop(self, interval: float = ETA_SAVE_INTERVAL):
+        """Write the model to disk when it changed, off the event loop."""
+        while True:
+            await asyncio.sleep(interval)
+            data = self._dump()
+            if data is not None:
+                await asyncio.to_thread(self._write, data)
+
+    def save(self):
+        """Write pending changes now (at exit)."""
+        data = self._dump()
+        if data is not None:
+            self._write(data)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "mean": round(self.expected, 2),
+                "p50": self.p50.value(),
+                "p90": self.p90.value(),
+                "count": self.count,
+                "running": len(self._running),
+                "workers": self.workers(),
+            }
+
+    # === Internals ===
+    def _add(self, duration: float):
+        self.mean = duration if self.mean is None else self.alpha * duration + (1 - self.alpha) * self.mean
+        self.p50.add(duration)
+        self.p90.add(duration)
+        self.count += 1
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.mean = data["mean"]
+            self.count = data["count"]
+            self.p50 = P2Quantile.from_dict(data["p50"])
+            self.p90 = P2Quantile.from_dict(data["p90"])
+            logger.info(f"⏱️ Loaded ETA model: mean {self.mean:.1f}s over {self.count} runs")
+        except FileNotFoundError:
+            self._bootstrap_from_history()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Could not load ETA model from {self.path}, starting fresh: {e}")
+
+    def _bootstrap_from_history(self):
+        from agron_bot.core.history import get_recent_durations
+
+        try:
+            durations = get_recent_durations()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read run durations from history: {e}")
+            return
+        for duration in durations:
+            self._add(duration)
+        if durations:
+            logger.info(f"⏱️ ETA model bootstrapped from {len(durations)} past runs: mean {self.mean:.1f}s")
+            self._dirty = True
+
+    def _dump(self) -> dict | None:
+        """The state to save, or None if nothing changed since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            return {"mean": self.mean, "count": self.count, "p50": self.p50.to_dict(), "p90": self.p90.to_dict()}
+
+    def _write(self, data: dict):
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not save ETA model: {e}")
+
+
+def format_wait(seconds: float) -> str:
+    seconds = int(round(seconds))
+    minutes, seconds = divmod(seconds, 60)
+    return f"{minutes} min {seconds} sec" if minutes else f"{seconds} seconds"
+
+
+eta_model = EtaModel()
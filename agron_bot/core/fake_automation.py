@@ -0,0 +1,270 @@
+# fake_automation.py – in-process stand-in for Agron + pyautogui, for running the bot on Linux
+import os
+import random
+import threading
+import time
+import zlib
+
+from PIL import Image, ImageDraw
+
+REGISTRATION_TITLE = "רישום"
+MAIN_TITLE = "אגרון פלוס 2006"
+
+STEPS = ("launch", "load", "filter", "search", "open_result", "close")
+
+# Where the real Agron shows its filter button (1920x1080, maximized); drawn from the bundled template
+FILTER_BUTTON_AT = (323, 44)
+FILTER_BUTTON_TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "filter_button.png")
+# Where the results grid shows the matching row (left, top, width, height); cleared to an empty grid when nothing matches
+RESULT_ROW_AT = (1029, 450, 400, 40)
+
+# Each screen is painted a different colour so region-change waits can see transitions
+STATE_COLORS = {
+    "empty": "black",
+    REGISTRATION_TITLE: "gray",
+    MAIN_TITLE: "lightblue",
+    "filter": "lightyellow",
+    "results": "lightgreen",
+    "no_results": "lightgray",
+    "result": "white",
+}
+
+
+class FakeWindow:
+    def __init__(self, title: str):
+        self.title = title
+
+
+class FakeProcess:
+    def __init__(self):
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        self.returncode = -9
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+class FakeAgronBackend:
+    """
+    Simulates the Agron GUI as a stack of windows:
+    registration → main → filter → result. Closing the main window ends the process.
+
+    `latencies` sets how long (seconds) each step takes to show on screen:
+    launch, load, filter, search, open_result, close. `failure_rate` is the chance that
+    a click crashes Agron and `hang_rate` the chance that it freezes it. `stall_rate` is the
+    chance that a click blocks the calling thread until Agron is killed, like a GUI call stuck
+    behind a modal dialog.
+    `layout_offset` moves the filter button, as a different resolution or toolbar layout would;
+    clicks on the main window only open the filter when they hit the button.
+    IDs in `missing_ids`, plus a deterministic `missing_rate` share of all IDs, have no record:
+    searching them clears the results grid to an empty one.
+    """
+
+    def __init__(self, latencies: dict | None = None, failure_rate: float = 0.0, hang_rate: float = 0.0,
+                 seed: int | None = None, layout_offset: tuple[int, int] = (0, 0),
+                 missing_ids: set[str] | None = None, missing_rate: float = 0.0, stall_rate: float = 0.0):
+        self.latencies = {step: 0.0 for step in STEPS}
+        self.latencies.update(latencies or {})
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.stall_rate = stall_rate
+        self.stall_count = 0
+        self.launch_count = 0
+        self.search_count = 0
+        self.crash_count = 0
+        self.missed_clicks = 0
+        self.missing_ids = set(missing_ids or ())
+        self.missing_rate = missing_rate
+        self._button = Image.open(FILTER_BUTTON_TEMPLATE).convert("RGB")
+        self._button_at = (FILTER_BUTTON_AT[0] + layout_offset[0], FILTER_BUTTON_AT[1] + layout_offset[1])
+        self._row_at = (RESULT_ROW_AT[0] + layout_offset[0], RESULT_ROW_AT[1] + layout_offset[1], *RESULT_ROW_AT[2:])
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._process = None
+        self._windows = []
+        self._ready_at = 0.0
+        self._typed = ""
+        self._searched_id = None
+        self._found = False
+        self._responsive = True
+        # The screen keeps showing the previous state until the current step's latency has passed
+        self._shown_state = "empty"
+        self._visible_at = 0.0
+
+    # --- simulation controls ---
+    def crash(self):
+        """Simulate Agron dying: the process exits and all windows disappear."""
+        with self._lock:
+            self._crash()
+
+    def _crash(self):
+        if self._process:
+            self._process.returncode = 1
+        self._windows = []
+        self.crash_count += 1
+
+    def hang(self):
+        """Simulate Agron hanging: windows stay visible but stop responding."""
+        self._responsive = False
+
+    def _transition(self, step: str):
+        """Start a UI change that becomes visible after the step's latency. Called with the lock held."""
+        self._shown_state = self._screen_state(now=time.monotonic())
+        self._visible_at = time.monotonic() + self.latencies.get(step, 0.0)
+
+    def _maybe_fail(self) -> bool:
+        roll = self._random.random()
+        if roll < self.failure_rate:
+            self._crash()
+            return True
+        if roll < self.failure_rate + self.hang_rate:
+            self._responsive = False
+            return True
+        return False
+
+    # --- backend API ---
+    def launch(self, exe_path: str, cwd: str):
+        with self._lock:
+            self._reset()
+            self._process = FakeProcess()
+            self._windows = [REGISTRATION_TITLE]
+            self._ready_at = time.monotonic() + self.latencies["launch"]
+            self.launch_count += 1
+            return self._process
+
+    def is_process_alive(self, process) -> bool:
+        return process is not None and process.poll() is None
+
+    def kill(self, process):
+        with self._lock:
+            if process is not None:
+                process.kill()
+            if process is self._process:
+                self._windows = []
+
+    def kill_tree(self, process):
+        self.kill(process)
+
+    def _maybe_stall(self):
+        """With `stall_rate`, block (outside the lock) until the current process is killed."""
+        with self._lock:
+            if not self.stall_rate or self._random.random() >= self.stall_rate:
+                return
+            self.stall_count += 1
+            process = self._process
+        while self.is_process_alive(process):
+            time.sleep(0.05)
+
+    def find_window(self, title_substring: str):
+        with self._lock:
+            if time.monotonic() < self._ready_at:
+                return None
+            for title in reversed(self._windows):
+                if title_substring in title:
+                    return FakeWindow(title)
+            return None
+
+    def is_window_responsive(self, window) -> bool:
+        return self._responsive
+
+    def focus(self, window):
+        pass
+
+    def write(self, text: str, interval: float = 0.0):
+        # Typing takes as long as pyautogui's per-character interval
+        time.sleep(len(text) * interval)
+        with self._lock:
+            if self._responsive:
+                self._typed += text
+
+    def press(self, key: str):
+        with self._lock:
+            if key == "enter" and self._top() == REGISTRATION_TITLE:
+                self._windows = [MAIN_TITLE]
+                self._ready_at = time.monotonic() + self.latencies["load"]
+            self._typed = ""
+
+    def hotkey(self, *keys: str):
+        with self._lock:
+            if keys == ("alt", "f4") and self._windows and self._responsive:
+                self._transition("close")
+                self._windows.pop()
+                if not self._windows and self._process:
+                    self._process.returncode = 0
+
+    def click(self, x: int, y: int):
+        self._maybe_stall()
+        with self._lock:
+            if not self._responsive or self._maybe_fail():
+                return
+            top = self._top()
+            if top == MAIN_TITLE:
+                if not self._hits_button(x, y):
+                    self.missed_clicks += 1
+                    return
+                self._transition("filter")
+                self._windows.append("filter")
+                self._typed = ""
+                self._searched_id = None
+            elif top == "filter":
+                self._transition("search")
+                self._searched_id = self._typed
+                self._found = self.has_record(self._typed)
+                self.search_count += 1
+
+    def double_click(self, x: int, y: int):
+        with self._lock:
+            if not self._responsive or self._maybe_fail():
+                return
+            if self._top() == "filter" and self._searched_id and self._found:
+                self._transition("open_result")
+                self._windows.append("result")
+
+    def screenshot(self, region: tuple[int, int, int, int] | None = None):
+        width, height = (region[2], region[3]) if region else (1920, 1080)
+        with self._lock:
+            state = self._screen_state(now=time.monotonic())
+            image = Image.new("RGB", (width, height), STATE_COLORS[state])
+            if state in (MAIN_TITLE, "filter", "results", "no_results"):
+                # The main window's toolbar stays visible behind the filter dialog
+                left, top = region[:2] if region else (0, 0)
+                bx = self._button_at[0] - self._button.width // 2 - left
+                by = self._button_at[1] - self._button.height // 2 - top
+                image.paste(self._button, (bx, by))
+            if state == "results":
+                left, top = region[:2] if region else (0, 0)
+                x, y, w, h = self._row_at
+                draw = ImageDraw.Draw(image)
+                draw.rectangle((x - left, y - top, x - left + w - 1, y - top + h - 1), fill="navy")
+                draw.text((x - left + 10, y - top + 12), self._searched_id, fill="white")
+            if state == "result":
+                ImageDraw.Draw(image).text((20, 20), f"Agron record {self._searched_id}", fill="black")
+        return image
+
+    def has_record(self, id_number: str) -> bool:
+        if id_number in self.missing_ids:
+            return False
+        return zlib.crc32(id_number.encode()) % 1000 >= self.missing_rate * 1000
+
+    def _hits_button(self, x: int, y: int) -> bool:
+        return (abs(x - self._button_at[0]) <= self._button.width // 2
+                and abs(y - self._button_at[1]) <= self._button.height // 2)
+
+    def _screen_state(self, now: float) -> str:
+        if now < self._visible_at:
+            return self._shown_state
+        top = self._top()
+        if top == "filter" and self._searched_id:
+            return "results" if self._found else "no_results"
+        return top if top in STATE_COLORS else "empty"
+
+    def _top(self):
+        return self._windows[-1] if self._windows else None
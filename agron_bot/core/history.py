@@ -1,73 +1,150 @@
 import json
 import os
+import sqlite3
 from datetime import datetime
 from threading import Lock
 
+HISTORY_DB = os.getenv("HISTORY_DB", "logs/history.db")
+# Legacy JSON history, imported automatically the first time the database is created
 HISTORY_FILE = "logs/history.json"
+
 history_lock = Lock()
+_conn: sqlite3.Connection | None = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    id_number TEXT,
+    timestamp TEXT NOT NULL,
+    duration_sec REAL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_user_ts ON runs (user_id, timestamp);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    imported_at TEXT NOT NULL,
+    row_count INTEGER NOT NULL
+);
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(HISTORY_DB) or ".", exist_ok=True)
+        is_new = not os.path.exists(HISTORY_DB)
+        _conn = sqlite3.connect(HISTORY_DB, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.executescript(SCHEMA)
+        if is_new and os.path.exists(HISTORY_FILE):
+            _import_json(_conn, HISTORY_FILE)
+    return _conn
+
+
+def _normalize_timestamp(value: str) -> str:
+    # Older entries use ISO format ("2025-08-03T00:32:00") – store everything as "%Y-%m-%d %H:%M:%S"
+    return (value or "").replace("T", " ")[:19]
+
+
+def _iter_json_records(data):
+    """Yield (user_id, record) from either legacy history.json layout."""
+    if isinstance(data, list):
+        # Oldest format: flat list with user_id inside each record
+        for record in data:
+            if record.get("user_id") is not None:
+                yield int(record["user_id"]), record
+    else:
+        for user_id, records in data.items():
+            for record in records:
+                yield int(user_id), record
+
+
+def _import_json(conn: sqlite3.Connection, path: str) -> int:
+    source = os.path.abspath(path)
+    if conn.execute("SELECT 1 FROM imports WHERE source = ?", (source,)).fetchone():
+        return 0
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    rows = []
+    for user_id, record in _iter_json_records(data):
+        rows.append((
+            user_id,
+            record.get("id_number"),
+            _normalize_timestamp(record.get("timestamp", "")),
+            record.get("duration_sec", record.get("duration")),
+            record.get("status", "completed"),
+        ))
+    with conn:
+        conn.executemany(
+            "INSERT INTO runs (user_id, id_number, timestamp, duration_sec, status) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.execute(
+            "INSERT INTO imports (source, imported_at, row_count) VALUES (?, ?, ?)",
+            (source, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), len(rows)),
+        )
+    return len(rows)
 
-def log_run(user_id: int, id_number: str, duration: float | None, status: str):
-    entry = {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "id_number": id_number,
-        "duration_sec": duration,
-        "status": status
-    }
 
+def import_json_history(path: str = HISTORY_FILE) -> int:
+    """
+    Import a legacy history.json (any format) into the database.
+    Each file is imported only once; returns the number of rows added.
+    """
     with history_lock:
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        else:
-            data = {}
+        return _import_json(_connect(), path)
 
-        uid_str = str(user_id)
-        data.setdefault(uid_str, []).append(entry)
 
-        os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+def log_run(user_id: int, id_number: str, duration: float | None, status: str):
+    with history_lock:
+        conn = _connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO runs (user_id, id_number, timestamp, duration_sec, status) VALUES (?, ?, ?, ?, ?)",
+                (user_id, id_number, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), duration, status),
+            )
 
 def get_user_history(user_id: int, limit=5) -> list:
     with history_lock:
-        if not os.path.exists(HISTORY_FILE):
-            return []
+        rows = _connect().execute(
+            "SELECT timestamp, id_number, duration_sec, status FROM runs "
+            "WHERE user_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (user_id, limit),
+        ).fetchall()
 
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    # Oldest first, like the original list slice
+    return [dict(row) for row in reversed(rows)]
 
-        return data.get(str(user_id), [])[-limit:]
+def get_recent_durations(limit: int = 200) -> list[float]:
+    """Durations of the latest completed runs across all users, oldest first."""
+    with history_lock:
+        rows = _connect().execute(
+            "SELECT duration_sec FROM runs WHERE status = 'completed' AND duration_sec IS NOT NULL "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    return [row["duration_sec"] for row in reversed(rows)]
 
 def get_user_stats(user_id: int) -> dict:
     with history_lock:
-        if not os.path.exists(HISTORY_FILE):
-            return {}
-
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        records = data.get(str(user_id), [])
-        if not records:
-            return {}
-
-        total_runs = len(records)
-
-        completed = [
-            r for r in records
-            if r.get("status") == "completed" and r.get("duration_sec") is not None
-        ]
-
-        total_cancelled = sum(
-            1 for r in records if r.get("status") == "cancelled"
-        )
-
-        avg_runtime = round(
-            sum(r["duration_sec"] for r in completed),
-            2
-        ) / len(completed) if completed else 0
-
-        return {
-            "total_runs": total_runs,
-            "avg_runtime": avg_runtime,
-            "total_cancelled": total_cancelled
-        }
\ No newline at end of file
+        row = _connect().execute(
+            "SELECT COUNT(*) AS total_runs, "
+            "AVG(CASE WHEN status = 'completed' THEN duration_sec END) AS avg_runtime, "
+            "SUM(status = 'cancelled') AS total_cancelled "
+            "FROM runs WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+
+    if not row["total_runs"]:
+        return {}
+
+    return {
+        "total_runs": row["total_runs"],
+        "avg_runtime": round(row["avg_runtime"], 2) if row["avg_runtime"] is not None else 0,
+        "total_cancelled": row["total_cancelled"]
+    }
@@ -0,0 +1,124 @@
+# instance_lock.py – OS-level single-instance lock (a crash can never leave it stuck)
+import os
+import sys
+import time
+
+from agron_bot.logger import logger
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+# Byte locked on Windows. Byte-range locks there are mandatory, so the lock sits
+# past the PID text at the start of the file, which stays readable.
+LOCK_OFFSET = 64
+
+
+class AlreadyRunning(RuntimeError):
+    def __init__(self, pid: int | None):
+        self.pid = pid
+        super().__init__(f"Another bot instance holds the lock (PID {pid or 'unknown'}).")
+
+
+def pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if sys.platform == "win32":
+        import ctypes
+
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class InstanceLock:
+    """
+    Advisory lock on `path` (fcntl.flock / msvcrt.locking) that holds the owner's PID.
+    The OS drops the lock when the process dies, so a leftover file from a crash does
+    not block the next start – it is only reported.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self, wait: float = 0.0):
+        """Take the lock, retrying for up to `wait` seconds. Raises AlreadyRunning."""
+        f = open(self.path, "a+")
+        deadline = time.monotonic() + wait
+        while not self._try_lock(f):
+            if time.monotonic() >= deadline:
+                pid = self._read_pid(f)
+                f.close()
+                if pid and not pid_alive(pid):
+                    # The recorded owner is gone but the lock is still held, e.g. by a child process
+                    logger.error(f"⛔ Lock {self.path} is held although PID {pid} is no longer running.")
+                raise AlreadyRunning(pid)
+            time.sleep(0.5)
+
+        previous = self._read_pid(f)
+        if previous and previous != os.getpid():
+            state = "alive but no longer holding it" if pid_alive(previous) else "no longer running"
+            logger.warning(f"🔓 Took over lock left by PID {previous} ({state}).")
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            # Emptied rather than deleted: removing the file would let a waiting instance lock a stale inode
+            self._file.seek(0)
+            self._file.truncate()
+            self._unlock(self._file)
+        finally:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def _try_lock(f) -> bool:
+        try:
+            if sys.platform == "win32":
+                f.seek(LOCK_OFFSET)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _unlock(f):
+        if sys.platform == "win32":
+            f.seek(LOCK_OFFSET)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_pid(f) -> int | None:
+        try:
+            f.seek(0)
+            text = f.read(LOCK_OFFSET).strip()
+            return int(text) if text.isdigit() else None
+        except (OSError, ValueError):
+            return None
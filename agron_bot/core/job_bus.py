@@ -0,0 +1,219 @@
+# job_bus.py – local SQLite job bus between the bot front-end and Agron runner processes
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from agron_bot.logger import logger
+
+JOB_BUS_DB = os.getenv("JOB_BUS_DB", "logs/bus.db")
+# A claimed job belongs to its runner for this long; heartbeats extend it
+JOB_BUS_LEASE = float(os.getenv("JOB_BUS_LEASE", "15"))
+# Runners heartbeat (and pick up cancellation) this often
+JOB_BUS_HEARTBEAT = float(os.getenv("JOB_BUS_HEARTBEAT", "3"))
+# Times a job may be claimed before a lost lease fails it instead of re-dispatching it
+JOB_BUS_MAX_ATTEMPTS = int(os.getenv("JOB_BUS_MAX_ATTEMPTS", "2"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bus_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    runner TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel INTEGER NOT NULL DEFAULT 0,
+    outcome TEXT,
+    raw_png BLOB,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bus_open ON bus_jobs (id) WHERE status IN ('queued', 'leased');
+CREATE TABLE IF NOT EXISTS runners (
+    name TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    job_id INTEGER,
+    heartbeat REAL NOT NULL
+);
+"""
+
+
+class LeaseLost(Exception):
+    """The runner's lease on a job expired and the job went to another runner (or failed)."""
+
+
+class JobBus:
+    """
+    Job records as plain JSON between processes on one machine (or a shared disk).
+
+    queued → leased (claim, lease_until = now + lease) → done (finish). A runner keeps
+    its lease alive with heartbeat(); a job whose lease ran out is claimed again by the
+    next free runner, up to JOB_BUS_MAX_ATTEMPTS claims, then fails with "runner lost".
+    finish() from a runner that no longer holds the lease is ignored, so a job that was
+    re-dispatched is answered exactly once.
+    """
+
+    def __init__(self, path: str = JOB_BUS_DB, lease: float = JOB_BUS_LEASE,
+                 max_attempts: int = JOB_BUS_MAX_ATTEMPTS):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    # --- front-end side ---
+
+    def submit(self, payload: dict) -> int:
+        with self._lock:
+            cursor = self._connect().execute("INSERT INTO bus_jobs (payload, created_at) VALUES (?, ?)",
+                                             (json.dumps(payload), time.time()))
+            return cursor.lastrowid
+
+    def cancel(self, bus_id: int):
+        """Ask for a job to stop: a queued job is dropped, a running one is told on its next heartbeat."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE bus_jobs SET cancel = 1 WHERE id = ?", (bus_id,))
+            conn.execute("UPDATE bus_jobs SET status = 'done', outcome = ? WHERE id = ? AND status = 'queued'",
+                         (json.dumps({"status": "cancelled"}), bus_id))
+
+    def take_result(self, bus_id: int) -> tuple[dict, bytes | None] | None:
+        """The finished job's outcome and screenshot, removing it from the bus; None while it runs."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT outcome, raw_png FROM bus_jobs WHERE id = ? AND status = 'done'",
+                               (bus_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM bus_jobs WHERE id = ?", (bus_id,))
+        return json.loads(row[0]), row[1]
+
+    def orphaned(self, bus_id: int) -> bool:
+        """True if the job's lease ran out and no runner is alive to pick it up again."""
+        with self._transaction("DEFERRED") as conn:
+            now = time.time()
+            row = conn.execute("SELECT status, lease_until FROM bus_jobs WHERE id = ?", (bus_id,)).fetchone()
+            if row is None or row[0] != "leased" or row[1] >= now:
+                return False
+            live = conn.execute("SELECT COUNT(*) FROM runners WHERE heartbeat >= ?", (now - self.lease,)).fetchone()[0]
+            return live == 0
+
+    def abandon(self, bus_id: int):
+        """Give up on a job from the front-end; a runner still working on it loses its lease."""
+        with self._lock:
+            self._connect().execute("DELETE FROM bus_jobs WHERE id = ?", (bus_id,))
+
+    def live_runners(self, within: float | None = None) -> int:
+        """Runners that heartbeated within `within` seconds (default: one lease)."""
+        with self._lock:
+            cutoff = time.time() - (within or self.lease)
+            return self._connect().execute("SELECT COUNT(*) FROM runners WHERE heartbeat >= ?",
+                                           (cutoff,)).fetchone()[0]
+
+    def cancel_all(self) -> int:
+        """Drop jobs left by a previous front-end; their requests are resumed from the job journal."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE bus_jobs SET cancel = 1 WHERE status = 'leased'")
+            cursor = conn.execute("DELETE FROM bus_jobs WHERE status != 'leased'")
+        return cursor.rowcount
+
+    # --- runner side ---
+
+    def register(self, runner: str):
+        with self._lock:
+            self._connect().execute("INSERT OR REPLACE INTO runners (name, host, pid, job_id, heartbeat) "
+                                    "VALUES (?, ?, ?, NULL, ?)", (runner, socket.gethostname(), os.getpid(), time.time()))
+
+    def unregister(self, runner: str):
+        with self._lock:
+            self._connect().execute("DELETE FROM runners WHERE name = ?", (runner,))
+
+    def claim(self, runner: str) -> tuple[int, dict] | None:
+        """Lease the oldest queued job (or one whose runner stopped heartbeating)."""
+        with self._transaction() as conn:
+            now = time.time()
+            # Jobs whose runner died on the last allowed attempt are failed, not retried
+            conn.execute(
+                "UPDATE bus_jobs SET status = 'done', outcome = ? "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (json.dumps({"status": "error", "error": "Agron runner stopped responding"}), now,
+                 self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id, payload, status, runner, attempts FROM bus_jobs "
+                "WHERE (status = 'queued' OR (status = 'leased' AND lease_until < ?)) AND cancel = 0 "
+                "ORDER BY id LIMIT 1", (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE bus_jobs SET status = 'leased', runner = ?, lease_until = ?, "
+                             "attempts = attempts + 1 WHERE id = ?", (runner, now + self.lease, row[0]))
+            conn.execute("UPDATE runners SET job_id = ?, heartbeat = ? WHERE name = ?",
+                         (row[0] if row else None, now, runner))
+        if row is None:
+            return None
+        if row[2] == "leased":
+            logger.warning(f"♻️ Bus job {row[0]} re-dispatched to '{runner}' (lease of '{row[3]}' expired, "
+                           f"attempt {row[4] + 1})")
+        return row[0], json.loads(row[1])
+
+    def heartbeat(self, runner: str, bus_id: int | None = None) -> bool:
+        """Keep the runner (and its job's lease) alive. Returns True if the job was cancelled."""
+        with self._transaction() as conn:
+            now = time.time()
+            conn.execute("UPDATE runners SET heartbeat = ? WHERE name = ?", (now, runner))
+            if bus_id is None:
+                return False
+            cursor = conn.execute("UPDATE bus_jobs SET lease_until = ? "
+                                  "WHERE id = ? AND runner = ? AND status = 'leased'",
+                                  (now + self.lease, bus_id, runner))
+            held = cursor.rowcount == 1
+            cancelled = held and bool(conn.execute("SELECT cancel FROM bus_jobs WHERE id = ?",
+                                                   (bus_id,)).fetchone()[0])
+        # Raised after the commit, so the runner's own heartbeat still counts
+        if not held:
+            raise LeaseLost(f"Lease on bus job {bus_id} was lost by '{runner}'")
+        return cancelled
+
+    def finish(self, runner: str, bus_id: int, outcome: dict, raw_png: bytes | None = None) -> bool:
+        """Post a job's result. False if the lease was lost meanwhile (the result is discarded)."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE bus_jobs SET status = 'done', outcome = ?, raw_png = ?, lease_until = NULL "
+                "WHERE id = ? AND runner = ? AND status = 'leased'",
+                (json.dumps(outcome), raw_png, bus_id, runner),
+            )
+            conn.execute("UPDATE runners SET job_id = NULL WHERE name = ?", (runner,))
+        return cursor.rowcount == 1
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def _transaction(self, mode: str = "IMMEDIATE"):
+        """
+        Run the block as one transaction. The connection is in autocommit mode, so `with conn:`
+        would not open one; IMMEDIATE takes the write lock up front so runners cannot interleave.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"BEGIN {mode}")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Autocommit mode; multi-statement operations go through _transaction()
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
@@ -0,0 +1,194 @@
+# job_journal.py – durable record of accepted jobs, so queued requests survive a restart
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from agron_bot.logger import logger
+
+JOB_JOURNAL_DB = os.getenv("JOB_JOURNAL_DB", "logs/jobs.db")
+# A job that was picked up this many times without completing is dropped on recovery
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Completion markers are kept this long (seconds) before they are pruned
+JOB_KEEP_DONE = int(os.getenv("JOB_KEEP_DONE", str(24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    id_numbers TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status TEXT,
+    done_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs (id) WHERE done_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_jobs_done ON jobs (done_at) WHERE done_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS subscribers (
+    job_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    user_name TEXT NOT NULL,
+    message_id INTEGER,
+    PRIMARY KEY (job_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS last_ids (
+    user_id INTEGER PRIMARY KEY,
+    id_number TEXT NOT NULL
+);
+"""
+
+
+class JobJournal:
+    """
+    SQLite journal of jobs as plain data (ID numbers plus chat id, user id, name and
+    message id of every subscriber). A job stays pending until complete() sets its
+    completion marker, which happens only once the result was delivered – so a crash
+    at any point means the job is run again (at-least-once), never lost.
+    """
+
+    def __init__(self, path: str = JOB_JOURNAL_DB):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def add(self, job):
+        """Journal a newly created job with its subscribers; sets `job.journal_id`."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO jobs (kind, id_numbers, created_at) VALUES (?, ?, ?)",
+                    (job.kind, json.dumps(job.id_numbers), time.time()),
+                )
+                job.journal_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT OR REPLACE INTO subscribers (job_id, chat_id, user_id, user_name, message_id) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [self._subscriber_row(job.journal_id, s) for s in job.subscribers],
+                )
+
+    def add_subscriber(self, job, subscriber):
+        if job.journal_id is None:
+            return
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO subscribers (job_id, chat_id, user_id, user_name, message_id) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    self._subscriber_row(job.journal_id, subscriber),
+                )
+
+    def remove_subscriber(self, job, user_id: int):
+        if job.journal_id is None:
+            return
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM subscribers WHERE job_id = ? AND user_id = ?", (job.journal_id, user_id))
+
+    def started(self, job):
+        """Count a pickup; jobs that keep crashing the bot are dropped after JOB_MAX_ATTEMPTS."""
+        if job.journal_id is None:
+            return
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("UPDATE jobs SET attempts = attempts + 1 WHERE id = ?", (job.journal_id,))
+
+    def complete(self, job, status: str) -> bool:
+        """
+        Set the job's completion marker. Returns False if it was already set, so callers
+        can tell a first completion from a repeated one.
+        """
+        if job.journal_id is None:
+            return True
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, done_at = ? WHERE id = ? AND done_at IS NULL",
+                    (status, time.time(), job.journal_id),
+                )
+        return cursor.rowcount == 1
+
+    def pending(self) -> list[dict]:
+        """
+        Jobs without a completion marker, oldest first, each as
+        {"journal_id", "kind", "id_numbers", "attempts", "subscribers": [dict, ...]}.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT j.id, j.kind, j.id_numbers, j.attempts, s.chat_id, s.user_id, s.user_name, s.message_id "
+                "FROM jobs j LEFT JOIN subscribers s ON s.job_id = j.id "
+                "WHERE j.done_at IS NULL ORDER BY j.id, s.rowid"
+            ).fetchall()
+
+        jobs: dict[int, dict] = {}
+        for row in rows:
+            job = jobs.setdefault(row["id"], {
+                "journal_id": row["id"],
+                "kind": row["kind"],
+                "id_numbers": json.loads(row["id_numbers"]),
+                "attempts": row["attempts"],
+                "subscribers": [],
+            })
+            if row["user_id"] is not None:
+                job["subscribers"].append({
+                    "chat_id": row["chat_id"],
+                    "user_id": row["user_id"],
+                    "user_name": row["user_name"],
+                    "message_id": row["message_id"],
+                })
+        return list(jobs.values())
+
+    def prune(self, keep: float = JOB_KEEP_DONE) -> int:
+        """Delete completion markers older than `keep` seconds. Returns the number of jobs removed."""
+        cutoff = time.time() - keep
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "DELETE FROM subscribers WHERE job_id IN (SELECT id FROM jobs WHERE done_at < ?)", (cutoff,)
+                )
+                cursor = conn.execute("DELETE FROM jobs WHERE done_at < ?", (cutoff,))
+        return cursor.rowcount
+
+    def set_last_id(self, user_id: int, id_number: str):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO last_ids (user_id, id_number) VALUES (?, ?)", (user_id, id_number))
+
+    def get_last_id(self, user_id: int) -> str | None:
+        with self._lock:
+            row = self._connect().execute("SELECT id_number FROM last_ids WHERE user_id = ?", (user_id,)).fetchone()
+        return row["id_number"] if row else None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # === Internals ===
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL survives process crashes; only an OS crash can lose the last commits
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            logger.info(f"🗃️ Job journal opened at {self.path}")
+        return self._conn
+
+    @staticmethod
+    def _subscriber_row(journal_id: int, subscriber) -> tuple:
+        return journal_id, subscriber.chat_id, subscriber.user_id, subscriber.user_name, subscriber.message_id
+
+
+job_journal = JobJournal()
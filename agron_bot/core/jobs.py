@@ -0,0 +1,200 @@
+# jobs.py – search jobs and single-flight coalescing of requests for the same ID
+import itertools
+import threading
+
+from agron_bot.core.cancel_state import CancelToken
+from agron_bot.core.job_journal import JobJournal, job_journal
+from agron_bot.core.tracing import Trace
+
+_job_ids = itertools.count(1)
+
+
+class Subscriber:
+    """
+    One chat waiting for a job's result. Held as plain data rather than the PTB update,
+    so it can be journaled and recreated after a restart with nothing but the bot.
+    """
+
+    def __init__(self, bot, chat_id: int, user_id: int, user_name: str, message_id: int | None = None):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.user_name = user_name
+        self.message_id = message_id
+
+    @classmethod
+    def from_update(cls, update, context) -> "Subscriber":
+        message = update.message or (update.callback_query and update.callback_query.message)
+        return cls(
+            context.bot,
+            update.effective_chat.id,
+            update.effective_user.id,
+            update.effective_user.full_name,
+            message.message_id if message else None,
+        )
+
+
+class Job:
+    """
+    A single Agron search for one ID number. Several users may subscribe to it;
+    the search is only cancelled once every subscriber has cancelled.
+    """
+
+    kind = "search"
+
+    def __init__(self, id_number: str):
+        self.job_id = next(_job_ids)
+        self.id_number = id_number
+        self.id_numbers = [id_number]
+        self.subscribers: list[Subscriber] = []
+        self.owner: Subscriber | None = None
+        self.trace: Trace | None = None
+        self.started = False
+        # Last queue position pushed to the subscribers ("you are now #2")
+        self.notified_position: int | None = None
+        # Row in the job journal (None for jobs that are not journaled)
+        self.journal_id: int | None = None
+        # Shared with the automation thread, which checks it between steps
+        self.cancel_token = CancelToken()
+        self._lock = threading.Lock()
+
+    def subscribe(self, subscriber: Subscriber) -> Subscriber | None:
+        """Add a waiting chat. Returns None if the job was already cancelled."""
+        with self._lock:
+            if self.cancelled:
+                return None
+            self.subscribers.append(subscriber)
+            if self.owner is None:
+                self.owner = subscriber
+                self.trace = Trace(self.job_id, subscriber.user_id, self.id_number)
+            return subscriber
+
+    def unsubscribe(self, user_id: int) -> bool:
+        """
+        Drop a user's subscription. Returns True if that left the job with no subscribers.
+        If the owner leaves, the longest-waiting remaining subscriber becomes the owner.
+        Use InFlightRegistry.detach() instead so the per-user index stays in sync.
+        """
+        with self._lock:
+            self.subscribers = [s for s in self.subscribers if s.user_id != user_id]
+            if not self.subscribers:
+                self.cancel_token.cancel()
+            elif self.owner.user_id == user_id:
+                self.owner = self.subscribers[0]
+            return self.cancelled
+
+    def has_subscriber(self, user_id: int) -> bool:
+        return any(s.user_id == user_id for s in self.subscribers)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.cancelled
+
+    @property
+    def label(self) -> str:
+        return f"ID {self.id_number}"
+
+    @property
+    def weight(self) -> int:
+        """Searches this job runs on its target (what wait estimates count)."""
+        return len(self.id_numbers)
+
+
+class BatchJob(Job):
+    """Several IDs searched one after another on one target, delivered as one document."""
+
+    kind = "batch"
+
+    def __init__(self, id_numbers: list[str]):
+        super().__init__(id_numbers[0])
+        self.id_numbers = list(id_numbers)
+        # Not a real ID – keeps batches out of single-ID coalescing and the result cache
+        self.id_number = f"batch-{self.job_id}"
+
+    @property
+    def label(self) -> str:
+        return f"batch of {len(self.id_numbers)} IDs"
+
+
+class InFlightRegistry:
+    """
+    Tracks queued/running jobs by ID number so duplicate requests share one search,
+    and by user so /status and /cancel find all of a user's jobs without scanning.
+    New jobs, joins and cancellations are written to `journal` as they happen.
+    """
+
+    def __init__(self, journal: JobJournal | None = None):
+        self.journal = journal
+        self._jobs: dict[str, Job] = {}
+        self._by_user: dict[int, set[Job]] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, id_number: str, subscriber: Subscriber) -> tuple[Job, bool]:
+        """Subscribe to the pending job for `id_number`, creating it if needed. Returns (job, created)."""
+        with self._lock:
+            job = self._jobs.get(id_number)
+            created = job is None or not job.subscribe(subscriber)
+            if created:
+                job = Job(id_number)
+                job.subscribe(subscriber)
+                self._jobs[id_number] = job
+            self._by_user.setdefault(subscriber.user_id, set()).add(job)
+        if self.journal:
+            if created:
+                self.journal.add(job)
+            else:
+                self.journal.add_subscriber(job, subscriber)
+        return job, created
+
+    def attach_batch(self, id_numbers: list[str], subscriber: Subscriber) -> BatchJob:
+        """Register a new batch job owned by the sending user (batches are never shared)."""
+        job = BatchJob(id_numbers)
+        job.subscribe(subscriber)
+        with self._lock:
+            self._jobs[job.id_number] = job
+            self._by_user.setdefault(subscriber.user_id, set()).add(job)
+        if self.journal:
+            self.journal.add(job)
+        return job
+
+    def restore(self, job: Job):
+        """Register a job recovered from the journal (already journaled, so nothing is written)."""
+        with self._lock:
+            self._jobs[job.id_number] = job
+            for subscriber in job.subscribers:
+                self._by_user.setdefault(subscriber.user_id, set()).add(job)
+
+    def detach(self, job: Job, user_id: int) -> bool:
+        """Remove a user's subscription. Returns True if the job is now cancelled (no subscribers left)."""
+        with self._lock:
+            self._unindex(job, user_id)
+        cancelled = job.unsubscribe(user_id)
+        if self.journal:
+            self.journal.remove_subscriber(job, user_id)
+            if cancelled:
+                self.journal.complete(job, "cancelled")
+        return cancelled
+
+    def finish(self, job: Job):
+        with self._lock:
+            if self._jobs.get(job.id_number) is job:
+                del self._jobs[job.id_number]
+            for subscriber in job.subscribers:
+                self._unindex(job, subscriber.user_id)
+
+    def __contains__(self, id_number: str) -> bool:
+        return id_number in self._jobs
+
+    def jobs_for_user(self, user_id: int) -> list[Job]:
+        with self._lock:
+            return sorted(self._by_user.get(user_id, ()), key=lambda job: job.job_id)
+
+    def _unindex(self, job: Job, user_id: int):
+        jobs = self._by_user.get(user_id)
+        if jobs is not None:
+            jobs.discard(job)
+            if not jobs:
+                del self._by_user[user_id]
+
+
+inflight = InFlightRegistry(job_journal)
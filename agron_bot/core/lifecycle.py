@@ -0,0 +1,68 @@
+# lifecycle.py – background tasks and graceful drain on shutdown
+import asyncio
+import os
+import time
+
+from agron_bot.core.delivery import delivery
+from agron_bot.logger import logger
+
+# How long a drain may wait for the running search and pending uploads
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "60"))
+
+
+class Lifecycle:
+    """
+    Owns the long-running loops (worker, health checks) and the per-job tasks.
+    drain() stops new work – handlers check `draining`, the dispatcher is cancelled –
+    then waits for running jobs and their uploads until the deadline. Jobs still
+    queued stay in the job journal and are resumed by the next start.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self._loops: list[asyncio.Task] = []
+        self._jobs: set[asyncio.Task] = set()
+
+    def start(self, coroutine) -> asyncio.Task:
+        """Run a background loop that is cancelled when draining starts."""
+        task = asyncio.create_task(coroutine)
+        self._loops.append(task)
+        return task
+
+    def track(self, task: asyncio.Task) -> asyncio.Task:
+        """Register a job task that a drain should wait for."""
+        self._jobs.add(task)
+        task.add_done_callback(self._jobs.discard)
+        return task
+
+    @property
+    def running_jobs(self) -> int:
+        return len(self._jobs)
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT) -> bool:
+        """Stop taking work and finish what is in flight. Returns True if everything finished in time."""
+        if not self.draining:
+            self.draining = True
+            logger.info(f"🚰 Draining: {len(self._jobs)} running job(s), {delivery.pending} upload(s) pending")
+        for task in self._loops:
+            task.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops.clear()
+
+        deadline = time.monotonic() + timeout
+        if self._jobs:
+            _, still_running = await asyncio.wait(set(self._jobs), timeout=timeout)
+            if still_running:
+                logger.warning(f"⏰ Drain deadline reached with {len(still_running)} job(s) running – "
+                               f"they stay in the job journal and will run again after restart")
+                return False
+        try:
+            await asyncio.wait_for(delivery.drain(), max(0.1, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            logger.warning(f"⏰ Drain deadline reached with {delivery.pending} upload(s) pending")
+            return False
+        logger.info("✅ Drain complete")
+        return True
+
+
+lifecycle = Lifecycle()
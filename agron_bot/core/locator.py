@@ -0,0 +1,148 @@
+# locator.py – find Agron's buttons on screen by template matching instead of fixed pixels
+import os
+import threading
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from agron_bot.logger import logger, log_search_step
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Templates are looked up as <element>.png (filter_button.png ships with the bot)
+LOCATOR_TEMPLATE_DIR = os.getenv("LOCATOR_TEMPLATE_DIR", PACKAGE_DIR)
+# Captures and templates are downscaled by this factor before matching
+LOCATOR_SCALE = float(os.getenv("LOCATOR_SCALE", "0.5"))
+LOCATOR_THRESHOLD = float(os.getenv("LOCATOR_THRESHOLD", "0.8"))
+# Margin (pixels) around the last known position for the cheap first lookup
+LAST_KNOWN_MARGIN = 24
+# Template sizes tried when the element is not found at its usual size (DPI / resolution changes)
+FULL_SEARCH_FACTORS = (1.0, 0.75, 1.25, 1.5)
+
+
+class Element:
+    """A UI element: where it was on the reference layout and the screen area it is searched in."""
+
+    def __init__(self, default: tuple[int, int], roi: tuple[int, int, int, int]):
+        self.default = default
+        self.roi = roi
+
+
+# Reference layout (1920x1080, Agron maximized) – also the fallback when matching fails
+ELEMENTS = {
+    "filter_button": Element(default=(323, 44), roi=(0, 0, 960, 200)),
+    "search_button": Element(default=(914, 808), roi=(480, 540, 960, 540)),
+    "result_row": Element(default=(1229, 470), roi=(480, 200, 1440, 600)),
+}
+
+
+class Locator:
+    """
+    Resolves element positions, cheapest lookup first: a small region around the last
+    known position, then the element's region of interest, then the whole screen at a few
+    template sizes, and finally the reference coordinates. Elements without a template
+    use their reference position moved by the offset at which the last template was found.
+    """
+
+    def __init__(self, backend, elements: dict[str, Element] = ELEMENTS, template_dir: str = LOCATOR_TEMPLATE_DIR,
+                 scale: float = LOCATOR_SCALE, threshold: float = LOCATOR_THRESHOLD):
+        self.backend = backend
+        self.elements = elements
+        self.template_dir = template_dir
+        self.scale = scale
+        self.threshold = threshold
+        self.offset = (0, 0)
+        self.stats = Counter()
+        self._last: dict[str, tuple[int, int, int, int]] = {}   # name -> region it was last found in
+        self._templates: dict[tuple[str, float], np.ndarray | None] = {}
+        self._lock = threading.Lock()
+
+    def locate(self, name: str) -> tuple[int, int]:
+        """Screen coordinates to click for element `name`."""
+        element = self.elements[name]
+        if self._template(name) is None:
+            self.stats[f"{name}:layout"] += 1
+            return self.shift_point(element.default)
+
+        last = self._last.get(name)
+        if last:
+            found = self._match(name, self._grow(last, LAST_KNOWN_MARGIN))
+            if found:
+                return self._found(name, found, "cached")
+
+        found = self._match(name, self.shift_region(element.roi))
+        if found:
+            return self._found(name, found, "roi")
+
+        for factor in FULL_SEARCH_FACTORS:
+            found = self._match(name, None, factor)
+            if found:
+                return self._found(name, found, "screen")
+
+        self.stats[f"{name}:fallback"] += 1
+        logger.warning(f"⚠️ Locator: '{name}' not found on screen, using reference coordinates.")
+        return self.shift_point(element.default)
+
+    def shift_point(self, point: tuple[int, int]) -> tuple[int, int]:
+        return point[0] + self.offset[0], point[1] + self.offset[1]
+
+    def shift_region(self, region: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
+        x, y = self.shift_point(region[:2])
+        return max(0, x), max(0, y), region[2], region[3]
+
+    # === Internals ===
+    def _found(self, name: str, match: tuple[tuple[int, int], tuple[int, int, int, int]], tier: str):
+        center, box = match
+        element = self.elements[name]
+        self._last[name] = box
+        self.offset = (center[0] - element.default[0], center[1] - element.default[1])
+        self.stats[f"{name}:{tier}"] += 1
+        if tier != "cached":
+            log_search_step(f"🎯 Located '{name}' at {center} ({tier}, layout offset {self.offset})")
+        return center
+
+    def _match(self, name: str, region: tuple[int, int, int, int] | None, factor: float = 1.0):
+        """Best match of the template inside `region` (None = full screen) as (center, box), or None."""
+        template = self._template(name, factor)
+        if template is None:
+            return None
+        capture = self.backend.screenshot(region=region)
+        gray = cv2.cvtColor(np.asarray(capture.convert("RGB")), cv2.COLOR_RGB2GRAY)
+        if self.scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        th, tw = template.shape
+        if gray.shape[0] < th or gray.shape[1] < tw:
+            return None
+        scores = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (mx, my) = cv2.minMaxLoc(scores)
+        if best < self.threshold:
+            return None
+        left, top = region[:2] if region else (0, 0)
+        x, y = left + round(mx / self.scale), top + round(my / self.scale)
+        w, h = round(tw / self.scale), round(th / self.scale)
+        return (x + w // 2, y + h // 2), (x, y, w, h)
+
+    def _template(self, name: str, factor: float = 1.0) -> np.ndarray | None:
+        """Grayscale template downscaled like the captures, loaded once per size."""
+        key = (name, factor)
+        with self._lock:
+            if key not in self._templates:
+                self._templates[key] = self._load_template(name, factor)
+            return self._templates[key]
+
+    def _load_template(self, name: str, factor: float) -> np.ndarray | None:
+        path = os.path.join(self.template_dir, f"{name}.png")
+        if not os.path.exists(path):
+            return None
+        image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            logger.warning(f"⚠️ Locator: could not read template {path}")
+            return None
+        size = self.scale * factor
+        return cv2.resize(image, None, fx=size, fy=size, interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def _grow(box: tuple[int, int, int, int], margin: int) -> tuple[int, int, int, int]:
+        x, y, w, h = box
+        left, top = max(0, x - margin), max(0, y - margin)
+        return left, top, x + w + margin - left, y + h + margin - top
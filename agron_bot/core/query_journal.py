@@ -0,0 +1,135 @@
+# query_journal.py – append-only JSONL log of executed Agron queries
+import atexit
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from agron_bot.logger import logger
+
+QUERY_LOG_DIR = "logs"
+QUERY_LOG_NAME = "queries"
+# Rotate when the active file grows past this size, or when the day changes
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+QUERY_LOG_COMPRESS = os.getenv("QUERY_LOG_COMPRESS", "1") == "1"
+# fsync after this many records or this many seconds, whichever comes first
+FSYNC_BATCH = int(os.getenv("QUERY_LOG_FSYNC_BATCH", "10"))
+FSYNC_INTERVAL = float(os.getenv("QUERY_LOG_FSYNC_INTERVAL", "5"))
+
+
+class QueryJournal:
+    """
+    One JSON object per line, appended and never rewritten. A crash can at worst
+    leave a truncated last line, which readers skip.
+    """
+
+    def __init__(self, directory: str = QUERY_LOG_DIR, name: str = QUERY_LOG_NAME,
+                 max_bytes: int = QUERY_LOG_MAX_BYTES, compress: bool = QUERY_LOG_COMPRESS):
+        self.directory = directory
+        self.name = name
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        self._file = None
+        self._opened_day = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._rotate_if_needed()
+            f = self._open()
+            f.write(line)
+            f.flush()
+            self._unsynced += 1
+            if self._unsynced >= FSYNC_BATCH or time.monotonic() - self._last_sync >= FSYNC_INTERVAL:
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.path, "a+", encoding="utf-8")
+            # Terminate a line left half-written by a crash so the next record starts clean
+            if self._file.tell() > 0:
+                self._file.seek(self._file.tell() - 1)
+                if self._file.read(1) != "\n":
+                    self._file.write("\n")
+            self._opened_day = datetime.now().date()
+        return self._file
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _rotate_if_needed(self):
+        if not os.path.exists(self.path):
+            return
+        if self._file is None:
+            file_day = datetime.fromtimestamp(os.path.getmtime(self.path)).date()
+        else:
+            file_day = self._opened_day
+        too_big = os.path.getsize(self.path) >= self.max_bytes
+        if not too_big and file_day == datetime.now().date():
+            return
+
+        if self._file:
+            self._sync()
+            self._file.close()
+            self._file = None
+        rotated = os.path.join(self.directory, f"{self.name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl")
+        os.replace(self.path, rotated)
+        if self.compress:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        logger.info(f"🗂️ Rotated query journal to {rotated}{'.gz' if self.compress else ''}")
+
+
+def journal_files(directory: str = QUERY_LOG_DIR, name: str = QUERY_LOG_NAME) -> list[str]:
+    """All journal files, oldest first (rotated files, then the active one)."""
+    rotated = glob.glob(os.path.join(directory, f"{name}-*.jsonl")) + glob.glob(os.path.join(directory, f"{name}-*.jsonl.gz"))
+    files = sorted(rotated, key=lambda p: os.path.basename(p).split(".")[0])
+    active = os.path.join(directory, f"{name}.jsonl")
+    if os.path.exists(active):
+        files.append(active)
+    return files
+
+
+def iter_queries(directory: str = QUERY_LOG_DIR, name: str = QUERY_LOG_NAME, since: str | None = None):
+    """
+    Lazily yield query records across all journal files.
+    `since` ("%Y-%m-%d ...") skips older records by their timestamp field.
+    """
+    for path in journal_files(directory, name):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️ Skipping corrupt line {line_no} in {path}")
+                    continue
+                if since and record.get("timestamp", "") < since:
+                    continue
+                yield record
+
+
+journal = QueryJournal()
+atexit.register(journal.close)
@@ -0,0 +1,175 @@
+# rate_limit.py – per-user token buckets at the handler edge
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from agron_bot.core.state import DEVELOPER_ID
+from agron_bot.logger import logger
+from agron_bot.utils import take_tokens
+
+# "<class>=<tokens>/<seconds>,...": each class holds up to <tokens> and refills them over <seconds>
+RATE_LIMITS = os.getenv("RATE_LIMITS", "search=10/60,command=20/60,heavy=5/60")
+# "memory" (this process only) or "sqlite:<path>" to share the limits between bot processes
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+# Buckets kept in memory; the least recently used are dropped beyond this
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+
+
+class Budget:
+    """`capacity` tokens, refilled continuously at capacity / period per second."""
+
+    def __init__(self, capacity: float, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+
+    @property
+    def idle_after(self) -> float:
+        # An idle bucket is full again after this long, so forgetting it changes nothing
+        return self.capacity / self.rate
+
+
+def parse_budgets(spec: str) -> dict[str, Budget]:
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            name, _, value = item.partition("=")
+            tokens, _, period = value.partition("/")
+            tokens, period = float(tokens), float(period)
+            if tokens <= 0 or period <= 0:
+                raise ValueError("tokens and period must be positive")
+            budgets[name.strip()] = Budget(tokens, period)
+        except ValueError:
+            logger.warning(f"⚠️ Ignoring invalid RATE_LIMITS entry '{item}'")
+    return budgets
+
+
+class MemoryBucketStore:
+    """Buckets for this process, in an LRU of at most `max_keys` entries."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()   # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, budget: Budget, now: float, cost: float = 1.0) -> float:
+        """Spend `cost` tokens. Returns 0 if allowed, otherwise seconds until it would be."""
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (budget.capacity, now))
+            tokens, wait = take_tokens(tokens, now - updated, budget.rate, budget.capacity, cost)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def expire(self, now: float, idle_after: float) -> int:
+        """Drop buckets untouched for `idle_after` seconds (they would be full anyway)."""
+        with self._lock:
+            expired = 0
+            # Oldest first – stop at the first bucket that is still in use
+            while self._buckets:
+                key, (_, updated) = next(iter(self._buckets.items()))
+                if now - updated < idle_after:
+                    break
+                del self._buckets[key]
+                expired += 1
+            return expired
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SqliteBucketStore:
+    """
+    Buckets in a SQLite file, so several bot processes on one machine share the limits.
+    Each take() is one short write transaction.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def take(self, key: str, budget: Budget, now: float, cost: float = 1.0) -> float:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (budget.capacity, now)
+                tokens, wait = take_tokens(tokens, now - updated, budget.rate, budget.capacity, cost)
+                conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return wait
+
+    def expire(self, now: float, idle_after: float) -> int:
+        with self._lock:
+            cursor = self._connect().execute("DELETE FROM buckets WHERE updated < ?", (now - idle_after,))
+            return cursor.rowcount
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Autocommit mode; take() manages its own transaction
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+        return self._conn
+
+
+def create_store(spec: str = RATE_LIMIT_STORE):
+    if spec.startswith("sqlite:"):
+        return SqliteBucketStore(spec.split(":", 1)[1])
+    return MemoryBucketStore()
+
+
+class RateLimiter:
+    """
+    Token bucket per (class, user). check() returns how long the user has to wait,
+    0 if the action is allowed. Users in `exempt` are never limited.
+    """
+
+    # Idle buckets are swept at most this often
+    EXPIRE_INTERVAL = 60.0
+
+    def __init__(self, budgets: dict[str, Budget], store=None, exempt: set[int] | None = None):
+        self.budgets = budgets
+        self.store = store if store is not None else MemoryBucketStore()
+        self.exempt = exempt or set()
+        self.throttled = 0
+        self._idle_after = max((b.idle_after for b in budgets.values()), default=0.0)
+        self._next_expire = 0.0
+        # Users already told to wait, until when – further throttled updates are dropped silently
+        self._warned: dict[tuple[str, int], float] = {}
+
+    def check(self, user_id: int, kind: str) -> float:
+        budget = self.budgets.get(kind)
+        if budget is None or user_id in self.exempt:
+            return 0.0
+        now = time.time()
+        if now >= self._next_expire:
+            self._next_expire = now + self.EXPIRE_INTERVAL
+            self.store.expire(now, self._idle_after)
+            self._warned = {k: until for k, until in self._warned.items() if until > now}
+        wait = self.store.take(f"{kind}:{user_id}", budget, now)
+        if wait:
+            self.throttled += 1
+        return wait
+
+    def should_warn(self, user_id: int, kind: str, wait: float) -> bool:
+        """True the first time a user hits the limit; later hits until it resets are not answered."""
+        key = (kind, user_id)
+        now = time.time()
+        if self._warned.get(key, 0.0) > now:
+            return False
+        self._warned[key] = now + wait
+        return True
+
+
+rate_limiter = RateLimiter(parse_budgets(RATE_LIMITS), create_store(), exempt={DEVELOPER_ID})
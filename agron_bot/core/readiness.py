@@ -0,0 +1,62 @@
+# readiness.py – frame differencing to tell when a screen region has finished updating
+import os
+
+import numpy as np
+from PIL import Image
+
+# Mean absolute difference (0–255 grayscale) above which two low-res frames count as different
+READY_DIFF_THRESHOLD = float(os.getenv("READY_DIFF_THRESHOLD", "3"))
+# Consecutive matching frames required before a changed region counts as settled
+READY_STABLE_FRAMES = int(os.getenv("READY_STABLE_FRAMES", "3"))
+# A region whose pixel standard deviation is below this is treated as empty (e.g. an empty results grid)
+BLANK_STD_THRESHOLD = float(os.getenv("BLANK_STD_THRESHOLD", "4"))
+# Frames are compared at 1/FRAME_DOWNSCALE of the capture size
+FRAME_DOWNSCALE = 4
+
+
+def capture_frame(backend, region: tuple[int, int, int, int]) -> np.ndarray:
+    """Low-res grayscale capture of `region` as an int16 array (room for signed differences)."""
+    image = backend.screenshot(region=region).convert("L")
+    size = (max(8, image.width // FRAME_DOWNSCALE), max(8, image.height // FRAME_DOWNSCALE))
+    return np.asarray(image.resize(size, Image.BILINEAR), dtype=np.int16)
+
+
+def frame_diff(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.abs(a - b).mean())
+
+
+def is_blank(frame: np.ndarray) -> bool:
+    return float(frame.std()) < BLANK_STD_THRESHOLD
+
+
+class ReadinessDetector:
+    """
+    wait_until() condition that is met once the region has changed from the baseline taken
+    at construction (i.e. before the click) and then stayed the same for `stable_frames` frames.
+    The last frame is kept in `frame` for classification (see is_blank()); `changed` tells
+    whether the region reacted at all.
+    """
+
+    def __init__(self, backend, region: tuple[int, int, int, int], stable_frames: int = READY_STABLE_FRAMES,
+                 threshold: float = READY_DIFF_THRESHOLD):
+        self.backend = backend
+        self.region = region
+        self.stable_frames = stable_frames
+        self.threshold = threshold
+        self.baseline = capture_frame(backend, region)
+        self.changed = False
+        self.frame = self.baseline
+        self._stable = 1
+
+    def __call__(self) -> bool:
+        frame = capture_frame(self.backend, self.region)
+        if not self.changed and frame_diff(frame, self.baseline) > self.threshold:
+            self.changed = True
+            self._stable = 0
+        if frame_diff(frame, self.frame) <= self.threshold:
+            self._stable += 1
+        else:
+            self._stable = 1
+        self.frame = frame
+
+        return self.changed and self._stable >= self.stable_frames
@@ -0,0 +1,67 @@
+# result_cache.py – recent search results by ID number, so repeats skip Agron entirely
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "200"))
+
+
+class ResultCache:
+    """
+    LRU cache with per-entry expiry. An entry holds the raw (unwatermarked) screenshot
+    plus, per chat, the Telegram file_ids of the watermarked photo/PDF already sent there.
+    """
+
+    def __init__(self, ttl: int = RESULT_CACHE_TTL, max_entries: int = RESULT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, id_number: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(id_number)
+            if entry is None or time.time() - entry["cached_at"] > self.ttl:
+                if entry is not None:
+                    del self._entries[id_number]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(id_number)
+            self.hits += 1
+            return entry
+
+    def put(self, id_number: str, **fields) -> dict:
+        with self._lock:
+            entry = {**fields, "file_ids": {}, "cached_at": time.time()}
+            self._entries[id_number] = entry
+            self._entries.move_to_end(id_number)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    def remember_upload(self, id_number: str, chat_id: int, photo_file_id: str | None, document_file_id: str | None):
+        """
+        Record what Telegram returned for an upload to `chat_id` so resending it costs no bandwidth.
+        A file that failed to send (None) keeps the file_id recorded for it before, if any.
+        """
+        with self._lock:
+            entry = self._entries.get(id_number)
+            if entry is None:
+                return
+            uploaded = entry["file_ids"].setdefault(chat_id, {"photo": None, "document": None})
+            uploaded["photo"] = photo_file_id or uploaded["photo"]
+            uploaded["document"] = document_file_id or uploaded["document"]
+
+    def invalidate(self, id_number: str):
+        with self._lock:
+            self._entries.pop(id_number, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+result_cache = ResultCache()
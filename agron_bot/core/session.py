@@ -1,9 +1,17 @@
 # session.py
+from agron_bot.core.job_journal import job_journal
 
+# Read-through cache of the last searched ID per user; the job journal keeps it across restarts
 _user_last_id = {}
 
 def set_last_id(user_id: int, id_number: str):
     _user_last_id[user_id] = id_number
+    job_journal.set_last_id(user_id, id_number)
 
 def get_last_id(user_id: int) -> str | None:
-    return _user_last_id.get(user_id)
+    if user_id not in _user_last_id:
+        id_number = job_journal.get_last_id(user_id)
+        if id_number is None:
+            return None
+        _user_last_id[user_id] = id_number
+    return _user_last_id[user_id]
@@ -1,3 +1,436 @@
 import asyncio
+import os
+import time
+from collections import Counter, OrderedDict, deque
+from itertools import islice
 
-queue = asyncio.Queue()
+from agron_bot.utils import percentile
+
+# Which scheduler sits between handle_message and the worker: "fair" or "fifo"
+AGRON_SCHEDULER = os.getenv("AGRON_SCHEDULER", "fair")
+# Queued + running jobs one user may own at a time (replaces the old global "qsize() > 10" cutoff)
+MAX_JOBS_PER_USER = int(os.getenv("MAX_JOBS_PER_USER", "5"))
+# Jobs of one user that may run at the same time (only matters with several automation targets)
+MAX_RUNNING_PER_USER = int(os.getenv("MAX_RUNNING_PER_USER", "1"))
+# Priority tiers as "user_id:tier,..."; lower tiers are always served first
+PRIORITY_TIERS = os.getenv("PRIORITY_TIERS", "")
+DEFAULT_PRIORITY_TIER = int(os.getenv("DEFAULT_PRIORITY_TIER", "2"))
+DEVELOPER_ID = int(os.getenv("DEVELOPER_ID", "5962330651"))
+WAIT_HISTORY_SIZE = 100
+
+
+def parse_priority_tiers(spec: str = PRIORITY_TIERS) -> dict[int, int]:
+    """Developer gets tier 0 unless the spec says otherwise."""
+    tiers = {DEVELOPER_ID: 0}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        user_id, _, tier = item.partition(":")
+        tiers[int(user_id)] = int(tier or 1)
+    return tiers
+
+
+class _Fenwick:
+    """Binary indexed tree of 0/1 flags – prefix counts give a queued job's position in O(log n)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index: int, delta: int):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index: int) -> int:
+        """Sum of flags at positions 0..index."""
+        index += 1
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+
+class _BaseJobQueue:
+    """
+    asyncio.Queue-compatible API (put/get/task_done/join/qsize) shared by the schedulers,
+    plus per-user quotas and queue-wait metrics. Subclasses decide the order jobs leave in
+    by implementing _push / _pop / _discard / position / work_ahead / head.
+    """
+
+    def __init__(self, max_per_user: int = MAX_JOBS_PER_USER):
+        self.max_per_user = max_per_user
+        self._size = 0
+        self._getters = deque()
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self._listeners = []
+        self._queued = Counter()    # user_id -> waiting jobs owned
+        self._running = Counter()   # user_id -> running jobs owned
+        self._charged = {}          # job_id -> user_id whose quota the job counts against
+        self._enqueued_at = {}      # job_id -> monotonic time
+        self._waits = {}            # user_id -> deque of recent queue waits (seconds)
+
+    # === asyncio.Queue-compatible API ===
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def put_nowait(self, job):
+        self._push(job)
+        self._size += 1
+        user_id = self._charged[job.job_id] = job.owner.user_id
+        self._queued[user_id] += 1
+        self._enqueued_at[job.job_id] = time.monotonic()
+        self._unfinished += 1
+        self._finished.clear()
+        self._wake_next()
+        self._notify("put", job)
+
+    async def put(self, job):
+        self.put_nowait(job)
+
+    def get_nowait(self):
+        job = self._pop() if self._size else None
+        if job is None:
+            raise asyncio.QueueEmpty
+        user_id = self._charged[job.job_id]
+        self._forget(job)
+        self._running[user_id] += 1
+        waited = time.monotonic() - self._enqueued_at.pop(job.job_id)
+        self._waits.setdefault(user_id, deque(maxlen=WAIT_HISTORY_SIZE)).append(waited)
+        self._notify("get", job)
+        return job
+
+    async def get(self):
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            getter = asyncio.get_running_loop().create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except BaseException:
+                getter.cancel()
+                if not self.empty() and not getter.cancelled():
+                    self._wake_next()
+                raise
+
+    def task_done(self, job=None):
+        """Mark a job as finished. Passing the job releases its owner's running slot."""
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._finished.set()
+        if job is not None:
+            user_id = self._charged.pop(job.job_id)
+            self._running[user_id] -= 1
+            if self._running[user_id] <= 0:
+                del self._running[user_id]
+            # The owner may have been held back by the concurrency quota
+            self._wake_next()
+
+    async def join(self):
+        await self._finished.wait()
+
+    # === Indexed operations ===
+    def remove(self, job) -> bool:
+        """Remove a waiting job. It counts as done for join()."""
+        if not self._discard(job):
+            return False
+        self._forget(job)
+        self._enqueued_at.pop(job.job_id, None)
+        self._charged.pop(job.job_id, None)
+        self.task_done()
+        self._notify("remove", job)
+        return True
+
+    def reassign_owner(self, job):
+        """Move a waiting or running job's quota to its current owner (after the previous owner left it)."""
+        old = self._charged.get(job.job_id)
+        new = job.owner.user_id
+        if old is None or old == new:
+            return
+        self._charged[job.job_id] = new
+        counts = self._queued if job in self else self._running
+        counts[old] -= 1
+        if counts[old] <= 0:
+            del counts[old]
+        counts[new] += 1
+        if job in self:
+            self._reassign(job)
+        # The previous owner may have been held back by the concurrency quota
+        self._wake_next()
+
+    def add_listener(self, callback):
+        """callback(event, job) is called after each put / get / remove."""
+        self._listeners.append(callback)
+
+    # === Quotas and metrics ===
+    def jobs_owned(self, user_id: int) -> int:
+        return self._queued[user_id] + self._running[user_id]
+
+    def can_accept(self, user_id: int) -> bool:
+        """Whether `user_id` may start another search under the per-user quota."""
+        return self.jobs_owned(user_id) < self.max_per_user
+
+    def wait_stats(self, user_id: int | None = None) -> dict:
+        """Recent queue waits as {user_id: {count, avg, p95, max}} (one user if given)."""
+        users = [user_id] if user_id is not None else list(self._waits)
+        stats = {}
+        for uid in users:
+            waits = self._waits.get(uid)
+            if not waits:
+                continue
+            stats[uid] = {
+                "count": len(waits),
+                "avg": round(sum(waits) / len(waits), 2),
+                "p95": round(percentile(waits, 0.95), 2),
+                "max": round(max(waits), 2),
+            }
+        return stats
+
+    # === Internals ===
+    def _forget(self, job):
+        self._size -= 1
+        user_id = self._charged[job.job_id]
+        self._queued[user_id] -= 1
+        if self._queued[user_id] <= 0:
+            del self._queued[user_id]
+
+    def _reassign(self, job):
+        """Re-file a waiting job under its new owner; only schedulers that order by user need to."""
+
+    def _wake_next(self):
+        while self._getters:
+            getter = self._getters.popleft()
+            if not getter.done():
+                getter.set_result(None)
+                break
+
+    def _notify(self, event: str, job):
+        for callback in self._listeners:
+            callback(event, job)
+
+
+class JobQueue(_BaseJobQueue):
+    """
+    Strict FIFO queue of jobs with O(log n) position lookup and removal by job id.
+    Waiting jobs are flagged in a Fenwick tree indexed by arrival order; a second tree
+    holds their weights (searches per job) for the work ahead of a job.
+    """
+
+    def __init__(self, max_per_user: int = MAX_JOBS_PER_USER):
+        super().__init__(max_per_user)
+        self._jobs = {}          # seq -> job
+        self._seq_of = {}        # job_id -> seq
+        self._order = deque()    # seqs in arrival order (removed ones are skipped lazily)
+        self._next_seq = 0
+        self._base = 0           # seq stored at index 0 of the tree
+        self._tree = _Fenwick(64)
+        self._work = _Fenwick(64)
+
+    def position(self, job) -> int | None:
+        """1-based position of a queued job, or None if it is not waiting in the queue."""
+        seq = self._seq_of.get(job.job_id)
+        if seq is None:
+            return None
+        return self._tree.prefix(seq - self._base)
+
+    def work_ahead(self, job) -> int | None:
+        """Searches waiting in front of a queued job, or None if it is not waiting in the queue."""
+        seq = self._seq_of.get(job.job_id)
+        if seq is None:
+            return None
+        return self._work.prefix(seq - self._base) - job.weight
+
+    def head(self, count: int) -> list:
+        """The first `count` waiting jobs, in order."""
+        jobs = []
+        for seq in self._order:
+            job = self._jobs.get(seq)
+            if job is not None:
+                jobs.append(job)
+                if len(jobs) == count:
+                    break
+        return jobs
+
+    def __contains__(self, job) -> bool:
+        return job.job_id in self._seq_of
+
+    def _push(self, job):
+        if self._next_seq - self._base >= self._tree.size:
+            self._rebuild()
+        seq = self._next_seq
+        self._next_seq += 1
+        self._jobs[seq] = job
+        self._seq_of[job.job_id] = seq
+        self._order.append(seq)
+        self._tree.add(seq - self._base, 1)
+        self._work.add(seq - self._base, job.weight)
+
+    def _pop(self):
+        while self._order:
+            seq = self._order.popleft()
+            job = self._jobs.pop(seq, None)
+            if job is not None:
+                self._unflag(seq, job)
+                return job
+        return None
+
+    def _discard(self, job) -> bool:
+        seq = self._seq_of.get(job.job_id)
+        if seq is None:
+            return False
+        del self._jobs[seq]
+        self._unflag(seq, job)
+        return True
+
+    def _unflag(self, seq: int, job):
+        del self._seq_of[job.job_id]
+        self._tree.add(seq - self._base, -1)
+        self._work.add(seq - self._base, -job.weight)
+
+    def _rebuild(self):
+        # Re-base the tree on the oldest waiting job and size it for the current backlog
+        live = sorted(self._jobs)
+        self._base = live[0] if live else self._next_seq
+        self._tree = _Fenwick(max(64, 2 * (self._next_seq - self._base + 1)))
+        self._work = _Fenwick(self._tree.size)
+        for seq in live:
+            self._tree.add(seq - self._base, 1)
+            self._work.add(seq - self._base, self._jobs[seq].weight)
+        self._order = deque(live)
+
+
+class FairJobQueue(_BaseJobQueue):
+    """
+    Priority tiers, and round-robin between users inside a tier: a user who pastes
+    ten IDs gets one search, then every other waiting user gets one, and so on.
+    Users already running MAX_RUNNING_PER_USER jobs are skipped until one finishes.
+    Position lookups are O(users in the queue).
+    """
+
+    def __init__(self, max_per_user: int = MAX_JOBS_PER_USER, max_running: int = MAX_RUNNING_PER_USER,
+                 tiers: dict[int, int] | None = None, default_tier: int = DEFAULT_PRIORITY_TIER):
+        super().__init__(max_per_user)
+        self.max_running = max_running
+        self.tiers = parse_priority_tiers() if tiers is None else tiers
+        self.default_tier = default_tier
+        self._rotations: dict[int, OrderedDict] = {}   # tier -> user_id -> deque of jobs, in serving order
+        self._where = {}                               # job_id -> (tier, user_id)
+
+    def tier_of(self, user_id: int) -> int:
+        return self.tiers.get(user_id, self.default_tier)
+
+    def position(self, job) -> int | None:
+        """1-based position assuming no one is held back by the concurrency quota."""
+        where = self._where.get(job.job_id)
+        if where is None:
+            return None
+        tier, user_id = where
+        position = sum(len(q) for t, rotation in self._rotations.items() if t < tier for q in rotation.values())
+        depth = self._rotations[tier][user_id].index(job) + 1
+        before = True
+        for uid, jobs in self._rotations[tier].items():
+            if uid == user_id:
+                position += depth
+                before = False
+            else:
+                position += min(len(jobs), depth if before else depth - 1)
+        return position
+
+    def work_ahead(self, job) -> int | None:
+        """Searches served before a queued job, counted the same way as position()."""
+        where = self._where.get(job.job_id)
+        if where is None:
+            return None
+        tier, user_id = where
+        work = sum(j.weight for t, rotation in self._rotations.items() if t < tier
+                   for q in rotation.values() for j in q)
+        depth = self._rotations[tier][user_id].index(job)
+        before = True
+        for uid, jobs in self._rotations[tier].items():
+            if uid == user_id:
+                work += sum(j.weight for j in islice(jobs, depth))
+                before = False
+            else:
+                work += sum(j.weight for j in islice(jobs, depth + 1 if before else depth))
+        return work
+
+    def head(self, count: int) -> list:
+        """The first `count` waiting jobs in serving order."""
+        jobs = []
+        for tier in sorted(self._rotations):
+            rotation = list(self._rotations[tier].values())
+            rounds = max(len(q) for q in rotation)
+            for depth in range(rounds):
+                for user_jobs in rotation:
+                    if depth < len(user_jobs):
+                        jobs.append(user_jobs[depth])
+                        if len(jobs) == count:
+                            return jobs
+        return jobs
+
+    def __contains__(self, job) -> bool:
+        return job.job_id in self._where
+
+    def _push(self, job):
+        user_id = job.owner.user_id
+        tier = self.tier_of(user_id)
+        rotation = self._rotations.setdefault(tier, OrderedDict())
+        rotation.setdefault(user_id, deque()).append(job)
+        self._where[job.job_id] = (tier, user_id)
+
+    def _pop(self):
+        for tier in sorted(self._rotations):
+            rotation = self._rotations[tier]
+            for user_id in list(rotation):
+                if self._running[user_id] >= self.max_running:
+                    continue
+                job = rotation[user_id].popleft()
+                # The user goes to the back of the line for their next job
+                self._drop_user_if_empty(tier, user_id, requeue=True)
+                del self._where[job.job_id]
+                return job
+        return None
+
+    def _discard(self, job) -> bool:
+        where = self._where.pop(job.job_id, None)
+        if where is None:
+            return False
+        tier, user_id = where
+        self._rotations[tier][user_id].remove(job)
+        self._drop_user_if_empty(tier, user_id)
+        return True
+
+    def _reassign(self, job):
+        # Joins the back of the new owner's jobs, so their other searches keep their turn
+        self._discard(job)
+        self._push(job)
+
+    def _drop_user_if_empty(self, tier: int, user_id: int, requeue: bool = False):
+        rotation = self._rotations[tier]
+        if not rotation[user_id]:
+            del rotation[user_id]
+            if not rotation:
+                del self._rotations[tier]
+        elif requeue:
+            rotation.move_to_end(user_id)
+
+
+def create_queue(kind: str = AGRON_SCHEDULER) -> _BaseJobQueue:
+    if kind == "fifo":
+        return JobQueue()
+    if kind == "fair":
+        return FairJobQueue()
+    raise ValueError(f"Unknown scheduler '{kind}' (expected 'fair' or 'fifo')")
+
+
+queue = create_queue()
@@ -0,0 +1,237 @@
+# targets.py – pool of isolated Agron automation targets (desktops / VMs / fake instances)
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agron_bot.core.agron_session import AgronSession
+from agron_bot.core.automation import AGRON_BACKEND, create_backend
+from agron_bot.core.cancel_state import CancelToken
+from agron_bot.core.executor import run_agron_and_capture_with_cancel_support, render_result, save_audit_copy, SAVE_RESULTS
+from agron_bot.core.job_bus import JobBus
+from agron_bot.core.watchdog import watchdog, AutomationStalled
+from agron_bot.logger import logger
+
+# Comma-separated "name:backend" entries, e.g. "desk1:pyautogui" or "fake1:fake,fake2:fake".
+# "name:remote" is a slot on the job bus, served by `python -m agron_bot.runner` processes.
+AGRON_TARGETS = os.getenv("AGRON_TARGETS", f"local:{AGRON_BACKEND}")
+# Consecutive failed jobs after which a target is taken out of rotation
+MAX_CONSECUTIVE_FAILURES = int(os.getenv("AGRON_TARGET_MAX_FAILURES", "2"))
+HEALTH_CHECK_INTERVAL = int(os.getenv("AGRON_HEALTH_CHECK_INTERVAL", "60"))
+
+
+class AutomationTarget:
+    """One isolated Agron instance with its own session and its own GUI thread."""
+
+    def __init__(self, name: str, session: AgronSession):
+        self.name = name
+        self.session = session
+        self.healthy = True
+        self.failures = 0
+        self.jobs_done = 0
+        # GUI automation is not thread-safe – every call for this target runs on one thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"agron-{name}")
+
+    async def run(self, func, *args):
+        """Run a blocking automation function on this target's thread (with the caller's trace context)."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, context.run, func, *args)
+
+    async def search(self, id_number: str, user_name: str, cancel: CancelToken,
+                     render: bool = True) -> tuple[dict | None, bool]:
+        """One Agron search on this target: (result, was_cancelled) as from the executor, under the watchdog."""
+        return await watchdog.supervise(self, lambda: self.run(
+            run_agron_and_capture_with_cancel_support, id_number, user_name, self.session, cancel, render
+        ))
+
+    async def check(self) -> bool:
+        return await self.run(self.probe)
+
+    def probe(self) -> bool:
+        """Blocking health check: relaunch Agron if needed and report whether it is usable."""
+        try:
+            self.session.ensure_ready()
+            return self.session.is_healthy()
+        except Exception as e:
+            logger.warning(f"⚠️ Health check failed for target '{self.name}': {e}")
+            return False
+
+    def replace_thread(self):
+        """
+        Give up on a GUI thread that stays blocked: it keeps the old session (and its lock),
+        so the target continues with a new thread and a new session on the same backend.
+        """
+        self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"agron-{self.name}")
+        old = self.session
+        self.session = AgronSession(backend=old.backend, exe_path=old.exe_path, license_key=old.license_key)
+
+    def shutdown(self):
+        self.session.close()
+        self._executor.shutdown(wait=False)
+
+
+class RemoteTarget:
+    """
+    A slot on the job bus: searches run in a separate runner process (python -m agron_bot.runner),
+    so the GUI automation host does not have to be the Telegram host. Register one slot per
+    runner to keep them all busy.
+    """
+
+    # How often the front-end looks for the result / propagates cancellation
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, name: str, bus: JobBus):
+        self.name = name
+        self.bus = bus
+        self.session = None
+        self.healthy = True
+        self.failures = 0
+        self.jobs_done = 0
+
+    async def search(self, id_number: str, user_name: str, cancel: CancelToken,
+                     render: bool = True) -> tuple[dict | None, bool]:
+        bus_id = await asyncio.to_thread(self.bus.submit,
+                                         {"id_number": id_number, "user_name": user_name, "slot": self.name})
+        started = time.monotonic()
+        cancel_sent = False
+        while (answer := await asyncio.to_thread(self.bus.take_result, bus_id)) is None:
+            if not cancel_sent and cancel.cancelled:
+                # Still wait for the runner to stop, so this slot is not double-booked
+                await asyncio.to_thread(self.bus.cancel, bus_id)
+                cancel_sent = True
+            # Expired leases are otherwise only failed by a runner's claim(), so without one this would wait forever
+            if await asyncio.to_thread(self.bus.orphaned, bus_id):
+                await self._give_up(bus_id, "runner_lost", "its runner stopped and no other runner is alive")
+            if time.monotonic() - started > watchdog.deadline:
+                await self._give_up(bus_id, "deadline", f"no result from a runner within {watchdog.deadline:.0f}s")
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+        outcome, raw_png = answer
+        status = outcome["status"]
+        if status == "cancelled" or cancel_sent or cancel.cancelled:
+            return None, True
+        if status == "error":
+            # Keep invalid input distinguishable from target failures, as with local targets
+            raise (ValueError if outcome.get("kind") == "ValueError" else RuntimeError)(outcome["error"])
+        if status == "not_found":
+            return outcome, False
+
+        result = {**outcome, "raw_png": raw_png, "png": None, "pdf": None, "filename": f"result_{id_number}.pdf"}
+        if render:
+            result["png"], result["pdf"] = await asyncio.to_thread(render_result, raw_png, id_number, user_name)
+            if SAVE_RESULTS:
+                save_audit_copy(id_number, result["png"], result["pdf"])
+        return result, False
+
+    async def _give_up(self, bus_id: int, kind: str, reason: str):
+        await asyncio.to_thread(self.bus.abandon, bus_id)
+        watchdog.record_stall(kind)
+        logger.error(f"🐕 Remote slot '{self.name}': bus job {bus_id} failed – {reason}")
+        raise AutomationStalled(f"Agron runner did not answer: {reason}")
+
+    async def check(self) -> bool:
+        return await asyncio.to_thread(self.bus.live_runners) > 0
+
+    def shutdown(self):
+        self.bus.close()
+
+
+class TargetPool:
+    """Hands out free, healthy targets to jobs and keeps broken ones out of rotation."""
+
+    def __init__(self):
+        self.targets: dict[str, AutomationTarget] = {}
+        self._free: asyncio.Queue | None = None
+
+    def register(self, name: str, session: AgronSession) -> AutomationTarget:
+        return self.add(AutomationTarget(name, session))
+
+    def add(self, target):
+        if target.name in self.targets:
+            raise ValueError(f"Target '{target.name}' is already registered.")
+        self.targets[target.name] = target
+        if self._free is not None:
+            self._free.put_nowait(target)
+        logger.info(f"🖥️ Registered automation target '{target.name}'")
+        return target
+
+    def _free_queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._free is None:
+            self._free = asyncio.Queue()
+            for target in self.targets.values():
+                if target.healthy:
+                    self._free.put_nowait(target)
+        return self._free
+
+    async def acquire(self) -> AutomationTarget:
+        """Wait for a free, healthy target."""
+        while True:
+            target = await self._free_queue().get()
+            if target.healthy:
+                return target
+
+    def release(self, target: AutomationTarget, failed: bool = False):
+        """Return a target after a job; repeated failures take it out of rotation."""
+        if failed:
+            target.failures += 1
+            if target.failures >= MAX_CONSECUTIVE_FAILURES:
+                target.healthy = False
+                logger.error(f"🚫 Target '{target.name}' removed from rotation after {target.failures} failures.")
+                return
+        else:
+            target.failures = 0
+            target.jobs_done += 1
+        self._free_queue().put_nowait(target)
+
+    @property
+    def healthy_count(self) -> int:
+        return sum(1 for t in self.targets.values() if t.healthy)
+
+    async def health_check_loop(self, interval: int = HEALTH_CHECK_INTERVAL):
+        """Periodically re-probe broken targets and put recovered ones back into rotation."""
+        while True:
+            await asyncio.sleep(interval)
+            for target in self.targets.values():
+                if target.healthy:
+                    continue
+                if await target.check():
+                    target.healthy = True
+                    target.failures = 0
+                    self._free_queue().put_nowait(target)
+                    logger.info(f"✅ Target '{target.name}' recovered and is back in rotation.")
+
+    def shutdown(self):
+        for target in self.targets.values():
+            target.shutdown()
+
+
+def build_pool_from_env(spec: str = AGRON_TARGETS) -> TargetPool:
+    """Create a pool from an AGRON_TARGETS spec ("name:backend,...")."""
+    pool = TargetPool()
+    bus = None
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        name, _, kind = entry.partition(":")
+        if kind == "remote":
+            if bus is None:
+                bus = JobBus()
+                # Work left on the bus by a previous front-end is resumed from the job journal instead
+                bus.cancel_all()
+            pool.add(RemoteTarget(name, bus))
+        else:
+            pool.register(name, AgronSession(backend=create_backend(kind or AGRON_BACKEND)))
+    return pool
+
+
+_pool: TargetPool | None = None
+
+
+def get_pool() -> TargetPool:
+    """The bot's shared target pool, built from AGRON_TARGETS on first use."""
+    global _pool
+    if _pool is None:
+        _pool = build_pool_from_env()
+    return _pool
@@ -0,0 +1,95 @@
+# tracing.py – per-job trace context and timed spans, exported as JSONL
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+TRACE_DIR = "logs"
+
+_current_trace: ContextVar["Trace | None"] = ContextVar("current_trace", default=None)
+_export_lock = threading.Lock()
+
+
+class Trace:
+    """Identifies one job (job id, user, ID number) across handler, queue, worker, executor and upload."""
+
+    def __init__(self, job_id: int, user_id: int, id_number: str):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.id_number = id_number
+        self.created = time.time()
+        self.step = 0
+        self._lock = threading.Lock()
+
+    def next_step(self) -> int:
+        with self._lock:
+            self.step += 1
+            return self.step
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time a block and export it as one span record."""
+        start = time.time()
+        status = "ok"
+        try:
+            yield
+        except BaseException as e:
+            status = type(e).__name__
+            raise
+        finally:
+            self.record(name, start, time.time() - start, status, **attrs)
+
+    def record(self, name: str, start: float, duration: float, status: str = "ok", **attrs):
+        export_span({
+            "job_id": self.job_id,
+            "user_id": self.user_id,
+            "id_number": self.id_number,
+            "span": name,
+            "start": datetime.fromtimestamp(start).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "duration": round(duration, 4),
+            "status": status,
+            **attrs,
+        })
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+@contextmanager
+def use_trace(trace: Trace | None):
+    """Make `trace` the current trace for this task/thread context."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block under the current trace (no-op outside of a traced job)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, **attrs):
+        yield
+
+
+def trace_file(day: str | None = None) -> str:
+    return os.path.join(TRACE_DIR, f"traces-{day or datetime.now().strftime('%Y-%m-%d')}.jsonl")
+
+
+def export_span(record: dict):
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _export_lock:
+        try:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            with open(trace_file(), "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"[Tracing] Failed to export span: {e}")
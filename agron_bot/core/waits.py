@@ -0,0 +1,93 @@
+# waits.py – condition-based waits for the Agron UI, with per-step timing records
+import hashlib
+import threading
+import time
+from collections import defaultdict, deque
+
+from agron_bot.logger import logger, log_search_step
+from agron_bot.utils import percentile
+
+# How many recent waits to keep per step for tuning the timeouts
+WAIT_HISTORY_SIZE = 200
+
+_wait_history = defaultdict(lambda: deque(maxlen=WAIT_HISTORY_SIZE))
+_wait_timeouts = defaultdict(int)
+_stats_lock = threading.Lock()
+
+
+def wait_until(condition, timeout: float, step: str, poll_interval: float = 0.05,
+               max_interval: float = 0.5, backoff: float = 1.5):
+    """
+    Poll `condition` until it returns a truthy value or `timeout` seconds pass.
+    Polling starts fast and backs off up to `max_interval`.
+    Returns the condition's value, or None on timeout. The wait time is recorded under `step`.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    interval = poll_interval
+    while True:
+        value = condition()
+        if value:
+            _record(step, time.monotonic() - start, timed_out=False)
+            return value
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _record(step, time.monotonic() - start, timed_out=True)
+            logger.warning(f"⏰ Timeout after {timeout}s waiting for step '{step}'")
+            return None
+        time.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
+def _record(step: str, waited: float, timed_out: bool):
+    with _stats_lock:
+        _wait_history[step].append(waited)
+        if timed_out:
+            _wait_timeouts[step] += 1
+    if not timed_out:
+        log_search_step(f"⏱️ '{step}' ready after {waited:.2f}s")
+
+
+def get_wait_stats() -> dict:
+    """Per-step summary of recent waits: count, average, max and number of timeouts."""
+    with _stats_lock:
+        stats = {}
+        for step, waits in _wait_history.items():
+            stats[step] = {
+                "count": len(waits),
+                "avg": round(sum(waits) / len(waits), 3),
+                "p95": round(percentile(waits, 0.95), 3),
+                "max": round(max(waits), 3),
+                "timeouts": _wait_timeouts[step],
+            }
+        return stats
+
+
+# === Conditions ===
+
+def window_present(backend, title_substring: str):
+    """Condition: a window whose title contains `title_substring` exists."""
+    return lambda: backend.find_window(title_substring)
+
+
+def region_signature(backend, region: tuple[int, int, int, int]) -> str:
+    """Cheap fingerprint of a screen region (downscaled grayscale capture)."""
+    image = backend.screenshot(region=region).convert("L")
+    image = image.resize((max(1, image.width // 4), max(1, image.height // 4)))
+    return hashlib.md5(image.tobytes()).hexdigest()
+
+
+def region_changed(backend, region: tuple[int, int, int, int], baseline: str):
+    """Condition: the region no longer matches the `baseline` signature."""
+    return lambda: region_signature(backend, region) != baseline
+
+
+def region_stable(backend, region: tuple[int, int, int, int], frames: int = 2):
+    """Condition: the region looked the same for `frames` consecutive polls."""
+    seen = deque(maxlen=frames)
+
+    def _condition():
+        seen.append(region_signature(backend, region))
+        return len(seen) == frames and len(set(seen)) == 1
+
+    return _condition
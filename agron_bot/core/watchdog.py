@@ -0,0 +1,181 @@
+# watchdog.py – supervision of automation runs: deadlines, stall detection and forced Agron restarts
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, deque
+
+from agron_bot.logger import logger
+from agron_bot.utils import percentile
+
+# Longest a whole search (including a relaunch of Agron) may take on a target
+JOB_DEADLINE = float(os.getenv("JOB_DEADLINE", "120"))
+# Longest a run may go without entering or leaving a step
+STALL_TIMEOUT = float(os.getenv("STALL_TIMEOUT", "45"))
+# Seconds the automation thread gets to return once Agron was killed, before it is abandoned
+WATCHDOG_GRACE = float(os.getenv("WATCHDOG_GRACE", "10"))
+# Times a search is re-run after the watchdog had to kill Agron
+WATCHDOG_RETRIES = int(os.getenv("WATCHDOG_RETRIES", "1"))
+
+# Longest each traced step may take. Above the wait timeouts in agron_session.STEP_TIMEOUTS,
+# so a step that merely times out fails normally and the watchdog only fires on blocked calls.
+STEP_DEADLINES = {
+    "launch": 30,
+    "license": 20,
+    "window_ready": 45,
+    "filter": 15,
+    "search": 20,
+    "open_result": 20,
+    "screenshot": 10,
+    "close": 20,
+}
+
+# Recovery times kept for the metrics
+RECOVERY_HISTORY_SIZE = 100
+
+
+class AutomationStalled(RuntimeError):
+    """The watchdog stopped a run that exceeded a deadline or made no progress."""
+
+
+class StepClock:
+    """
+    The step trace of one session as the watchdog sees it: which step is running and
+    when the run last moved. Written by the automation thread, read from the event loop.
+    """
+
+    def __init__(self):
+        self._steps: list[str] = []
+        self.step_started = time.monotonic()
+        self.last_progress = self.step_started
+
+    @property
+    def step(self) -> str | None:
+        return self._steps[-1] if self._steps else None
+
+    def enter(self, step: str):
+        self._steps.append(step)
+        self._mark()
+
+    def leave(self):
+        if self._steps:
+            self._steps.pop()
+        self._mark()
+
+    def _mark(self):
+        self.step_started = self.last_progress = time.monotonic()
+
+
+class Watchdog:
+    """
+    Runs automation calls under an overall deadline, per-step deadlines and a no-progress
+    timeout. When one is exceeded the target's Agron process tree is killed – which makes
+    the blocked step fail – and Agron is relaunched; a thread that stays blocked even then
+    is abandoned and the target gets a fresh one. The search is retried up to `retries` times.
+    """
+
+    # How often a running search is checked
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, deadline: float = JOB_DEADLINE, stall_timeout: float = STALL_TIMEOUT,
+                 step_deadlines: dict | None = None, grace: float = WATCHDOG_GRACE, retries: int = WATCHDOG_RETRIES):
+        self.deadline = deadline
+        self.stall_timeout = stall_timeout
+        self.step_deadlines = step_deadlines or STEP_DEADLINES
+        self.grace = grace
+        self.retries = retries
+        self.stalls = Counter()
+        self.retried = 0
+        self.gave_up = 0
+        self.abandoned_threads = 0
+        self.recovery_times: deque[float] = deque(maxlen=RECOVERY_HISTORY_SIZE)
+        self._lock = threading.Lock()
+
+    def check(self, clock: StepClock, started: float, now: float) -> tuple[str, str] | None:
+        """(kind, description) of the first limit the run exceeded, or None."""
+        if now - started > self.deadline:
+            return "deadline", f"search exceeded {self.deadline:.0f}s"
+        step = clock.step
+        limit = self.step_deadlines.get(step) if step else None
+        if limit and now - clock.step_started > limit:
+            return "step", f"step '{step}' exceeded {limit}s"
+        # An idle target's clock is older than the run itself
+        if now - max(clock.last_progress, started) > self.stall_timeout:
+            return "no_progress", f"no progress for {self.stall_timeout:.0f}s (last step: {step or 'none'})"
+        return None
+
+    async def supervise(self, target, start_run):
+        """Await `start_run()` (a fresh automation call on `target`) under the watchdog, with retries."""
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._watch(target, start_run())
+            except AutomationStalled as e:
+                if attempt == self.retries:
+                    with self._lock:
+                        self.gave_up += 1
+                    raise AutomationStalled(f"{e} – gave up after {attempt + 1} attempt(s)") from e
+                with self._lock:
+                    self.retried += 1
+                logger.warning(f"🔁 Watchdog: retrying on target '{target.name}' ({e})")
+
+    async def _watch(self, target, run):
+        task = asyncio.ensure_future(run)
+        clock = target.session.clock
+        started = time.monotonic()
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=self.POLL_INTERVAL)
+            if done:
+                return task.result()
+            exceeded = self.check(clock, started, time.monotonic())
+            if exceeded:
+                kind, reason = exceeded
+                await self._recover(target, task, kind, reason)
+                raise AutomationStalled(f"Agron stopped responding: {reason}")
+
+    async def _recover(self, target, task: asyncio.Future, kind: str, reason: str):
+        """Kill the hung Agron, get the target's thread back (or replace it) and relaunch Agron."""
+        began = time.monotonic()
+        self.record_stall(kind)
+        logger.error(f"🐕 Watchdog: target '{target.name}' – {reason}; killing the Agron process tree")
+        await asyncio.to_thread(target.session.force_kill)
+
+        done, _ = await asyncio.wait({task}, timeout=self.grace)
+        if done:
+            # The blocked step fails once Agron is gone; that error is the stall, not a new one
+            task.exception()
+        else:
+            with self._lock:
+                self.abandoned_threads += 1
+            logger.error(f"🧟 Watchdog: target '{target.name}' thread still blocked {self.grace:.0f}s after the "
+                         f"kill – replacing it")
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            target.replace_thread()
+
+        # Relaunch now, so the retry (or the next job) starts on a loaded Agron
+        healthy = await target.run(target.probe)
+        recovered_in = time.monotonic() - began
+        with self._lock:
+            self.recovery_times.append(recovered_in)
+        logger.warning(f"🩹 Watchdog: target '{target.name}' {'recovered' if healthy else 'NOT recovered'} "
+                       f"in {recovered_in:.1f}s")
+
+    def record_stall(self, kind: str):
+        with self._lock:
+            self.stalls[kind] += 1
+
+    def snapshot(self) -> dict:
+        """Stall and recovery metrics."""
+        with self._lock:
+            recovery_p50 = percentile(self.recovery_times, 0.5, default=None)
+            return {
+                "stalls": dict(self.stalls),
+                "stalls_total": sum(self.stalls.values()),
+                "retried": self.retried,
+                "gave_up": self.gave_up,
+                "abandoned_threads": self.abandoned_threads,
+                "recovery_p50": round(recovery_p50, 2) if recovery_p50 is not None else None,
+                "recovery_max": round(max(self.recovery_times), 2) if self.recovery_times else None,
+            }
+
+
+watchdog = Watchdog()
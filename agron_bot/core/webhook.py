@@ -0,0 +1,169 @@
+# webhook.py – receive updates over HTTP (tornado) instead of long polling
+import asyncio
+import hmac
+import json
+import os
+import signal
+import sys
+
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+from telegram import Update
+
+from agron_bot.logger import logger
+
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+# Public https base URL Telegram posts to (a reverse proxy in front of WEBHOOK_PORT terminates TLS)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Part of the webhook path and sent back by Telegram in X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Parallel connections Telegram may open to us (1–100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# Updates are small; anything bigger is not from Telegram
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class UpdateHandler(tornado.web.RequestHandler):
+    def initialize(self, server: "WebhookServer"):
+        self.server = server
+
+    async def post(self):
+        server = self.server
+        if server.secret:
+            token = self.request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not hmac.compare_digest(token, server.secret):
+                server.rejected += 1
+                raise tornado.web.HTTPError(403)
+        try:
+            update = Update.de_json(json.loads(self.request.body), server.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            server.rejected += 1
+            logger.warning(f"⚠️ Webhook: invalid update body: {e}")
+            raise tornado.web.HTTPError(400)
+        # The application's dispatcher takes it from here; Telegram only needs the 200
+        await server.update_queue.put(update)
+        server.received += 1
+
+    def log_exception(self, typ, value, tb):
+        if not isinstance(value, tornado.web.HTTPError):
+            logger.error("❌ Webhook handler failed", exc_info=(typ, value, tb))
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    """/healthz: the process is up. /readyz: it can take work (200) or not (503)."""
+
+    def initialize(self, check):
+        self.check = check
+
+    def get(self):
+        ok = self.check()
+        self.set_status(200 if ok else 503)
+        self.write("ok" if ok else "not ready")
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """
+    /metrics: JSON snapshot of the bot's counters (watchdog stalls, targets, step waits).
+    Shares the port with the update route, so it requires "Authorization: Bearer <secret>".
+    """
+
+    def initialize(self, collect, secret: str):
+        self.collect = collect
+        self.secret = secret
+
+    def get(self):
+        scheme, _, token = self.request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), self.secret):
+            raise tornado.web.HTTPError(403)
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(self.collect(), ensure_ascii=False))
+
+
+class WebhookServer:
+    """
+    Tornado server that turns POSTed Telegram updates into entries on `update_queue`
+    (the Application's queue), plus liveness/readiness/metrics endpoints for a supervisor or proxy.
+    """
+
+    def __init__(self, bot, update_queue: asyncio.Queue, secret: str = WEBHOOK_SECRET, ready=None, metrics=None):
+        self.bot = bot
+        self.update_queue = update_queue
+        self.secret = secret
+        self.ready = ready or (lambda: True)
+        self.metrics = metrics or dict
+        self.received = 0
+        self.rejected = 0
+        self._http: tornado.httpserver.HTTPServer | None = None
+
+    @property
+    def path(self) -> str:
+        return f"/telegram/{self.secret}" if self.secret else "/telegram"
+
+    def make_app(self) -> tornado.web.Application:
+        routes = [
+            (self.path, UpdateHandler, {"server": self}),
+            ("/healthz", HealthHandler, {"check": lambda: True}),
+            ("/readyz", HealthHandler, {"check": self.ready}),
+        ]
+        if self.secret:
+            # Without a secret there is nothing to authenticate with, so the metrics stay private
+            routes.append(("/metrics", MetricsHandler, {"collect": self.metrics, "secret": self.secret}))
+        return tornado.web.Application(routes, log_function=lambda handler: None)
+
+    def listen(self, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT) -> int:
+        """Start serving; returns the bound port (useful with port 0)."""
+        self._http = tornado.httpserver.HTTPServer(self.make_app(), max_body_size=MAX_BODY_BYTES, xheaders=True)
+        sockets = tornado.netutil.bind_sockets(port, listen)
+        self._http.add_sockets(sockets)
+        return sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._http is not None:
+            self._http.stop()
+            await self._http.close_all_connections()
+            self._http = None
+
+
+def run_webhook(app, ready=None, metrics=None, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT, url: str = WEBHOOK_URL,
+                secret: str = WEBHOOK_SECRET, max_connections: int = WEBHOOK_MAX_CONNECTIONS):
+    """
+    Counterpart of Application.run_polling(): same post_init / post_stop / post_shutdown
+    hooks and the same stop triggers (Ctrl+C, SIGTERM, loop.stop() from /drain), but
+    Telegram pushes updates to our server instead of us polling for them.
+    """
+    if not url:
+        raise RuntimeError("WEBHOOK_URL must be set in webhook mode.")
+    loop = asyncio.get_event_loop()
+    if sys.platform != "win32":
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, loop.stop)
+
+    server = WebhookServer(app.bot, app.update_queue, secret, ready, metrics)
+    try:
+        loop.run_until_complete(app.initialize())
+        if app.post_init:
+            loop.run_until_complete(app.post_init(app))
+        loop.run_until_complete(app.start())
+        bound = server.listen(listen, port)
+        loop.run_until_complete(app.bot.set_webhook(
+            url=url.rstrip("/") + server.path,
+            secret_token=secret or None,
+            max_connections=max_connections,
+            allowed_updates=Update.ALL_TYPES,
+        ))
+        logger.info(f"🌐 Webhook listening on {listen}:{bound}{'/telegram/***' if secret else server.path}")
+        loop.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        loop.run_until_complete(server.stop())
+        if app.running:
+            loop.run_until_complete(app.stop())
+        if app.post_stop:
+            loop.run_until_complete(app.post_stop(app))
+        loop.run_until_complete(app.shutdown())
+        if app.post_shutdown:
+            loop.run_until_complete(app.post_shutdown(app))
+        logger.info(f"🌐 Webhook stopped after {server.received} update(s) ({server.rejected} rejected)")
@@ -8,6 +8,8 @@ from agron_bot.handlers.commands import (
     stats_command,
     errors_command,
 )
+from agron_bot.handlers.handlers import submit_search
+from agron_bot.core.session import get_last_id
 from agron_bot.core.state import queue
 
 
@@ -34,12 +36,25 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         elif data == "stats":
             logger.info(f"🖱️ Button clicked: stats by {user_info}")
-            await stats_command()(update, context)
+            await stats_command(queue)(update, context)
 
         elif data == "errors":
             logger.info(f"🖱️ Button clicked: errors by {user_info}")
             await errors_command()(update, context)
 
+        elif data == "repeat":
+            logger.info(f"🖱️ Button clicked: repeat by {user_info}")
+            last_id = get_last_id(user.id)
+            if not last_id:
+                await query.message.reply_text("📭 No previous search to repeat.")
+            else:
+                await submit_search(queue, update, context, last_id)
+
+        elif data.startswith("refresh:"):
+            id_number = data.split(":", 1)[1]
+            logger.info(f"🖱️ Button clicked: force refresh of '{id_number}' by {user_info}")
+            await submit_search(queue, update, context, id_number, force_refresh=True)
+
         else:
             await query.edit_message_text("❓ Unknown action.")
             logger.warning(f"❗ Unknown callback data '{data}' by {user_info}")
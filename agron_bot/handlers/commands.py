@@ -1,3 +1,4 @@
+import asyncio
 import os
 import json
 from datetime import datetime
@@ -5,12 +6,17 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from agron_bot.logger import logger
-from agron_bot.core.cancel_state import mark_cancel
-from agron_bot.core.history import get_user_stats, get_user_history
+from agron_bot.core.history import log_run, get_user_stats, get_user_history
+from agron_bot.core.jobs import inflight
+from agron_bot.core.eta import eta_model, format_wait
+from agron_bot.core.lifecycle import lifecycle
+from agron_bot.core.state import DEVELOPER_ID
 from agron_bot.handlers.messages import (
     START_MESSAGE,
     NO_QUEUE_MESSAGE,
     QUEUE_STATUS_MESSAGE,
+    QUEUE_POSITION_LINE,
+    RUNNING_POSITION_LINE,
     CANCELLED_FROM_QUEUE_MESSAGE,
     CANCEL_MARKED_MESSAGE,
     NO_HISTORY_MESSAGE,
@@ -18,10 +24,15 @@ from agron_bot.handlers.messages import (
     HISTORY_LINE,
     NO_STATS_MESSAGE,
     STATS_TEMPLATE,
+    STATS_QUEUE_WAIT_LINE,
+    DRAIN_STARTED_MESSAGE,
+    DRAIN_DONE_MESSAGE,
 )
 
-AVG_PROCESSING_SECONDS = 15
 ERROR_LOG_PATH = os.path.join("logs", "error.log")
+# Strong references to fire-and-forget tasks (the event loop only keeps weak ones).
+# Not lifecycle.track(): the drain task would then wait for itself.
+_background_tasks: set[asyncio.Task] = set()
 
 
 def build_menu():
@@ -59,23 +70,30 @@ def status_command(queue):
         if update.callback_query:
             await update.callback_query.answer()
 
-        queue_items = list(queue._queue)
-        total_in_queue = len(queue_items)
-        user_position = None
-
-        for i, (queued_update, _, _) in enumerate(queue_items):
-            if queued_update.effective_user.id == user_id:
-                user_position = i + 1
-                break
-
-        if user_position:
-            estimated_wait = user_position * AVG_PROCESSING_SECONDS
-            minutes = estimated_wait // 60
-            seconds = estimated_wait % 60
-            wait_str = f"{minutes} min {seconds} sec" if minutes else f"{seconds} seconds"
-            msg = QUEUE_STATUS_MESSAGE.format(total=total_in_queue, position=user_position, wait=wait_str)
+        jobs = inflight.jobs_for_user(user_id)
+        total_in_queue = queue.qsize()
+
+        if jobs:
+            lines = []
+            last_job, last_position = None, 0
+            for job in jobs:
+                position = queue.position(job)
+                if position is None:
+                    lines.append(RUNNING_POSITION_LINE.format(label=job.label))
+                else:
+                    lines.append(QUEUE_POSITION_LINE.format(label=job.label, position=position))
+                    if position > last_position:
+                        last_job, last_position = job, position
+
+            # Until the user's last queued job has its result (or just the running one, if nothing is queued)
+            if last_job:
+                estimated_wait = eta_model.estimate_wait(last_position, queue.work_ahead(last_job), last_job.weight)
+            else:
+                estimated_wait = eta_model.running_left()
+            wait_str = format_wait(max(estimated_wait, 1))
+            msg = QUEUE_STATUS_MESSAGE.format(total=total_in_queue, position_line="\n".join(lines), wait=wait_str)
             await message.reply_text(msg, reply_markup=build_menu())
-            logger.info(f"📊 /status: {user_info} is #{user_position} in queue ({wait_str})")
+            logger.info(f"📊 /status: {user_info} has {len(jobs)} active job(s) ({wait_str})")
         else:
             await message.reply_text(NO_QUEUE_MESSAGE, reply_markup=build_menu())
             logger.info(f"📊 /status: {user_info} is not in the queue.")
@@ -93,23 +111,34 @@ def cancel_command(queue):
         if update.callback_query:
             await update.callback_query.answer()
 
-        mark_cancel(user_id)
-
-        queue_items = list(queue._queue)
-        index_to_remove = None
-
-        for i, (queued_update, _, _) in enumerate(queue_items):
-            if queued_update.effective_user.id == user_id:
-                index_to_remove = i
-                break
+        jobs = inflight.jobs_for_user(user_id)
+        if not jobs:
+            await message.reply_text(NO_QUEUE_MESSAGE, reply_markup=build_menu())
+            logger.info(f"🛑 /cancel: {user_info} has no active requests.")
+            return
 
-        if index_to_remove is not None:
-            del queue._queue[index_to_remove]
+        removed_from_queue = False
+        for job in jobs:
+            for id_number in job.id_numbers:
+                log_run(user_id, id_number, None, status="cancelled")
+            # Other users waiting on the same ID keep the search alive
+            if not inflight.detach(job, user_id):
+                # If the owner left, the job now counts against the new owner's quota
+                queue.reassign_owner(job)
+                logger.info(f"🔗 /cancel: {user_info} left shared job #{job.job_id}; other subscribers remain.")
+                removed_from_queue = True
+                continue
+            if queue.remove(job):
+                inflight.finish(job)
+                removed_from_queue = True
+                logger.info(f"🗑️ /cancel: Removed job #{job.job_id} ({job.label}) of {user_info} from queue")
+            else:
+                logger.info(f"🛑 /cancel: job #{job.job_id} of {user_info} marked for cancellation while running.")
+
+        if removed_from_queue:
             await message.reply_text(CANCELLED_FROM_QUEUE_MESSAGE, reply_markup=build_menu())
-            logger.info(f"🗑️ /cancel: Removed request from {user_info} (was position #{index_to_remove + 1})")
         else:
             await message.reply_text(CANCEL_MARKED_MESSAGE, reply_markup=build_menu())
-            logger.info(f"🛑 /cancel: {user_info} marked for cancellation (not found in queue).")
 
     return _command
 
@@ -158,7 +187,7 @@ def history_command():
     return _command
 
 
-def stats_command():
+def stats_command(queue):
     async def _command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         user_id = user.id
@@ -179,6 +208,9 @@ def stats_command():
             avg=stats["avg_runtime"],
             cancelled=stats["total_cancelled"]
         )
+        waits = queue.wait_stats(user_id).get(user_id)
+        if waits:
+            msg += "\n" + STATS_QUEUE_WAIT_LINE.format(avg=waits["avg"], max=waits["max"])
         await message.reply_markdown(msg, reply_markup=build_menu())
         logger.info(f"📈 /stats used by {user_info}: {stats}")
 
@@ -210,4 +242,30 @@ def errors_command():
             logger.exception("❌ Failed to send error log:")
             await message.reply_text(f"❗ Failed to send error log:\n{str(e)}", reply_markup=build_menu())
 
-    return _command
\ No newline at end of file
+    return _command
+
+
+def drain_command(queue):
+    """/drain (developer only): finish the running search and uploads, then stop the bot."""
+    async def _command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        user_info = f"{user.full_name} (ID: {user.id})"
+        if user.id != DEVELOPER_ID:
+            logger.warning(f"🚫 /drain refused for {user_info}")
+            return
+
+        await update.message.reply_text(DRAIN_STARTED_MESSAGE.format(jobs=lifecycle.running_jobs, queued=queue.qsize()))
+        logger.info(f"🚰 /drain requested by {user_info}")
+        # In the background, so updates keep being handled (and refused) while draining
+        task = asyncio.create_task(_drain_and_stop(update.message))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    return _command
+
+
+async def _drain_and_stop(message):
+    finished = await lifecycle.drain()
+    await message.reply_text(DRAIN_DONE_MESSAGE.format(result="clean" if finished else "deadline reached"))
+    # Same as Ctrl+C: run_polling stops the updater and runs post_stop
+    asyncio.get_running_loop().stop()
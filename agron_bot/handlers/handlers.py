@@ -1,9 +1,137 @@
+import asyncio
+import os
 from telegram import Update
 from telegram.ext import ContextTypes
-from agron_bot.utils import is_valid_id
+from agron_bot.utils import is_valid_id, parse_ids
 from agron_bot.logger import logger
+from agron_bot.core.result_cache import result_cache
+from agron_bot.core.session import set_last_id
+from agron_bot.core.jobs import Job, BatchJob, Subscriber, inflight
+from agron_bot.core.job_journal import job_journal, JOB_MAX_ATTEMPTS
+from agron_bot.core.eta import eta_model, format_wait
+from agron_bot.core.lifecycle import lifecycle
+from agron_bot.worker import send_cached_result
+from agron_bot.handlers.messages import (
+    POSITION_UPDATE_MESSAGE,
+    USER_QUOTA_MESSAGE,
+    MAX_BATCH_MESSAGE,
+    BATCH_INVALID_MESSAGE,
+    BATCH_QUEUED_MESSAGE,
+    BATCH_FILE_MESSAGE,
+    DRAINING_MESSAGE,
+    JOB_RESUMED_MESSAGE,
+    JOB_ABANDONED_MESSAGE,
+)
+
+# Users whose job moves into the first N places get a "you are now #N" message
+POSITION_UPDATE_TOP = int(os.getenv("POSITION_UPDATE_TOP", "3"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "50"))
+MAX_BATCH_FILE_BYTES = 64 * 1024
+BATCH_FILE_EXTENSIONS = (".txt", ".csv")
+
+
+async def submit_search(queue, update: Update, context: ContextTypes.DEFAULT_TYPE, id_number: str,
+                        force_refresh: bool = False):
+    """Answer from the result cache if possible, otherwise add the ID to the queue."""
+    user = update.effective_user
+    user_info = f"{user.full_name} (ID: {user.id})"
+    message = update.message or (update.callback_query and update.callback_query.message)
+    subscriber = Subscriber.from_update(update, context)
+
+    cached = None if force_refresh else result_cache.get(id_number)
+    if cached:
+        try:
+            await send_cached_result(subscriber, id_number, cached)
+            set_last_id(user.id, id_number)
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ Cached result for ID '{id_number}' could not be sent, searching again: {e}")
+            result_cache.invalidate(id_number)
+
+    if lifecycle.draining:
+        # Cached answers above are still fine; nothing new is queued while shutting down
+        await message.reply_text(DRAINING_MESSAGE)
+        return
+
+    # Joining a search that is already pending is free; starting a new one counts against the quota
+    if id_number not in inflight and not queue.can_accept(user.id):
+        await message.reply_text(USER_QUOTA_MESSAGE.format(count=queue.jobs_owned(user.id)))
+        logger.warning(f"🛑 {user_info} is over the per-user quota ({queue.jobs_owned(user.id)} jobs) – ID '{id_number}' rejected")
+        return
+
+    job, created = inflight.attach(id_number, subscriber)
+    if not created:
+        # Same ID already queued or running – share that search instead of running Agron twice
+        await message.reply_text(
+            f"⏳ A search for ID {id_number} is already in progress.\n"
+            f"You will receive the result as soon as it finishes."
+        )
+        logger.info(f"🔗 {user_info} joined pending job #{job.job_id} for ID '{id_number}'")
+        return
+
+    await queue.put(job)
+    queue_position = queue.position(job) or 1
+    job.notified_position = queue_position
+
+    work_ahead = queue.work_ahead(job)
+    wait_str = format_wait(eta_model.estimate_wait(queue_position, work_ahead))
+    worst_str = format_wait(eta_model.estimate_wait(queue_position, work_ahead, pessimistic=True))
+
+    await message.reply_text(
+        f"📥 Your request has been added to the queue.\n"
+        f"You are currently **#{queue_position}** in line.\n"
+        f"⏳ Estimated wait time: ~{wait_str} (up to {worst_str})."
+    )
+
+    logger.info(
+        f"📥 ID '{id_number}' added to queue by {user_info} as job #{job.job_id} "
+        f"(position #{queue_position}, est. wait {wait_str}{', forced refresh' if force_refresh else ''})"
+    )
+
+
+async def submit_batch(queue, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+    """Queue every ID found in `text` as one batch job with a single merged result."""
+    user = update.effective_user
+    user_info = f"{user.full_name} (ID: {user.id})"
+    message = update.message
+
+    if lifecycle.draining:
+        await message.reply_text(DRAINING_MESSAGE)
+        return
+
+    id_numbers, invalid = parse_ids(text)
+    if invalid:
+        shown = ", ".join(invalid[:5]) + ("…" if len(invalid) > 5 else "")
+        await message.reply_text(BATCH_INVALID_MESSAGE.format(count=len(invalid), ids=shown))
+        logger.warning(f"❌ {user_info} sent {len(invalid)} invalid ID(s) in a batch")
+
+    if not id_numbers:
+        await message.reply_text("❌ Please send a valid 8 or 9-digit ID number.")
+        return
+    if len(id_numbers) == 1:
+        await submit_search(queue, update, context, id_numbers[0])
+        return
+    if len(id_numbers) > MAX_BATCH_SIZE:
+        await message.reply_text(MAX_BATCH_MESSAGE.format(limit=MAX_BATCH_SIZE, count=len(id_numbers)))
+        logger.warning(f"🛑 {user_info} sent a batch of {len(id_numbers)} IDs (limit {MAX_BATCH_SIZE})")
+        return
+    if not queue.can_accept(user.id):
+        await message.reply_text(USER_QUOTA_MESSAGE.format(count=queue.jobs_owned(user.id)))
+        return
+
+    job = inflight.attach_batch(id_numbers, Subscriber.from_update(update, context))
+    await queue.put(job)
+    queue_position = queue.position(job) or 1
+    job.notified_position = queue_position
+
+    # The whole batch runs as one job, so the estimate covers every ID in it
+    wait_str = format_wait(eta_model.estimate_wait(queue_position, queue.work_ahead(job), job.weight))
+    await message.reply_text(BATCH_QUEUED_MESSAGE.format(count=len(id_numbers), position=queue_position, wait=wait_str))
+    logger.info(
+        f"📦 Batch of {len(id_numbers)} IDs added to queue by {user_info} as job #{job.job_id} "
+        f"(position #{queue_position}, est. {wait_str})"
+    )
 
-AVG_PROCESSING_SECONDS = 15  # ⏳ Estimated time per ID in seconds
 
 def handle_message(queue):
     async def _handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -11,28 +139,111 @@ def handle_message(queue):
         user = update.effective_user
         user_info = f"{user.full_name} (ID: {user.id})"
 
+        if len(id_number.split()) > 1 or "," in id_number:
+            await submit_batch(queue, update, context, id_number)
+            return
+
         if not is_valid_id(id_number):
             await update.message.reply_text("❌ Please send a valid 8 or 9-digit ID number.")
             logger.warning(f"❌ Invalid ID received from {user_info}: '{id_number}'")
             return
 
-        queue_position = queue.qsize() + 1
-        await queue.put((update, context, id_number))
+        await submit_search(queue, update, context, id_number)
 
-        estimated_wait = queue_position * AVG_PROCESSING_SECONDS
-        minutes = estimated_wait // 60
-        seconds = estimated_wait % 60
-        wait_str = f"{minutes} min {seconds} sec" if minutes else f"{seconds} seconds"
+    return _handler
 
-        await update.message.reply_text(
-            f"📥 Your request has been added to the queue.\n"
-            f"You are currently **#{queue_position}** in line.\n"
-            f"⏳ Estimated wait time: ~{wait_str}."
-        )
 
-        logger.info(
-            f"📥 ID '{id_number}' added to queue by {user_info} "
-            f"(position #{queue_position}, est. wait {wait_str})"
-        )
+def handle_document(queue):
+    """Accept a .txt/.csv upload with one ID per line (or comma separated) as a batch."""
+    async def _handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        document = update.message.document
+        user = update.effective_user
+        user_info = f"{user.full_name} (ID: {user.id})"
+
+        name = (document.file_name or "").lower()
+        if not name.endswith(BATCH_FILE_EXTENSIONS) or (document.file_size or 0) > MAX_BATCH_FILE_BYTES:
+            await update.message.reply_text(BATCH_FILE_MESSAGE.format(limit_kb=MAX_BATCH_FILE_BYTES // 1024))
+            logger.warning(f"❌ Rejected batch file '{document.file_name}' from {user_info}")
+            return
+
+        telegram_file = await document.get_file()
+        content = bytes(await telegram_file.download_as_bytearray())
+        text = content.decode("utf-8-sig", errors="replace")
+        logger.info(f"📎 Batch file '{document.file_name}' ({len(content)} bytes) received from {user_info}")
+        await submit_batch(queue, update, context, text)
 
     return _handler
+
+def enable_position_updates(queue):
+    """Tell the users at the front of the queue when their job moves up."""
+    def _on_change(event, job):
+        if event in ("get", "remove"):
+            asyncio.get_running_loop().create_task(_push_positions(queue))
+
+    queue.add_listener(_on_change)
+
+
+async def _push_positions(queue):
+    for position, job in enumerate(queue.head(POSITION_UPDATE_TOP), start=1):
+        if job.notified_position is not None and position >= job.notified_position:
+            continue
+        job.notified_position = position
+        text = POSITION_UPDATE_MESSAGE.format(position=position, label=job.label)
+        for subscriber in list(job.subscribers):
+            try:
+                await subscriber.bot.send_message(chat_id=subscriber.chat_id, text=text)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not send position update to user {subscriber.user_id}: {e}")
+
+
+async def resume_pending_jobs(queue, bot) -> int:
+    """
+    Re-queue every journaled job that had not completed when the bot stopped, in its
+    original order, and tell its subscribers. Returns the number of jobs resumed.
+    """
+    pruned = job_journal.prune()
+    if pruned:
+        logger.info(f"🧹 Pruned {pruned} old completed job(s) from the journal")
+
+    resumed = 0
+    for entry in job_journal.pending():
+        subscribers = [Subscriber(bot, **s) for s in entry["subscribers"]]
+        if entry["kind"] == "batch":
+            job = BatchJob(entry["id_numbers"])
+        else:
+            job = Job(entry["id_numbers"][0])
+        job.journal_id = entry["journal_id"]
+        for subscriber in subscribers:
+            job.subscribe(subscriber)
+
+        if not subscribers:
+            job_journal.complete(job, "cancelled")
+            continue
+        if entry["attempts"] >= JOB_MAX_ATTEMPTS:
+            # Started this often without finishing – most likely the job itself brings the bot down
+            job_journal.complete(job, "abandoned")
+            logger.error(f"🧯 Dropped journaled job {entry['journal_id']} ({job.label}) after {entry['attempts']} attempts")
+            await _notify_subscribers(job, JOB_ABANDONED_MESSAGE.format(label=job.label))
+            continue
+
+        inflight.restore(job)
+        await queue.put(job)
+        position = queue.position(job) or 1
+        job.notified_position = position
+        resumed += 1
+        await _notify_subscribers(job, JOB_RESUMED_MESSAGE.format(label=job.label, position=position))
+
+    if resumed:
+        logger.info(f"♻️ Resumed {resumed} job(s) from the journal")
+    return resumed
+
+
+async def _notify_subscribers(job, text: str):
+    for subscriber in job.subscribers:
+        try:
+            # Threaded under the user's original request when it still exists
+            await subscriber.bot.send_message(chat_id=subscriber.chat_id, text=text,
+                                              reply_to_message_id=subscriber.message_id,
+                                              allow_sending_without_reply=True)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not notify user {subscriber.user_id} about job #{job.job_id}: {e}")
@@ -9,7 +9,8 @@ START_MESSAGE = (
     "/cancel – Cancel your current request (even if processing)\n"
     "/history – View your 5 most recent searches\n"
     "/stats – View your personal usage statistics\n\n"
-    "✅ Simply send a valid 8–9 digit ID number to begin."
+    "✅ Simply send a valid 8–9 digit ID number to begin.\n"
+    "📦 Several IDs (one per line) or a .txt/.csv file are searched together and returned as one PDF."
 )
 
 NO_QUEUE_MESSAGE = "✅ You currently have no active requests in the queue."
@@ -21,8 +22,38 @@ QUEUE_STATUS_MESSAGE = (
     "⏳ Estimated wait time: ~{wait}."
 )
 
+QUEUE_POSITION_LINE = "🔢 {label}: you are #{position} in line."
+RUNNING_POSITION_LINE = "⚙️ {label}: processing now."
+POSITION_UPDATE_MESSAGE = "⏫ You are now #{position} in line for {label}."
+
+DRAINING_MESSAGE = "🔧 The bot is restarting for maintenance. Please send your request again in a minute."
+DRAIN_STARTED_MESSAGE = "🚰 Draining: {jobs} running job(s), {queued} queued. New requests are refused until restart."
+DRAIN_DONE_MESSAGE = "✅ Drain finished ({result}). Shutting down – queued jobs resume on the next start."
+
+JOB_RESUMED_MESSAGE = "♻️ The bot was restarted – your request for {label} is back in the queue (#{position})."
+JOB_ABANDONED_MESSAGE = "❗ Your request for {label} failed repeatedly and was dropped. Please send it again later."
+
+RATE_LIMITED_MESSAGE = "🚦 Too many requests – please retry in {seconds} s."
+
+USER_QUOTA_MESSAGE = (
+    "🛑 You already have {count} searches waiting or running.\n"
+    "Please wait for one of them to finish before sending another ID."
+)
+
+MAX_BATCH_MESSAGE = "❌ A batch can contain at most {limit} IDs (you sent {count})."
+BATCH_INVALID_MESSAGE = "⚠️ Skipped {count} invalid ID(s): {ids}"
+BATCH_QUEUED_MESSAGE = (
+    "📥 Your batch of {count} IDs has been added to the queue.\n"
+    "You are currently **#{position}** in line.\n"
+    "⏳ Estimated time until the merged result: ~{wait}."
+)
+BATCH_FILE_MESSAGE = "❌ Please upload a .txt or .csv file (up to {limit_kb} KB) with one ID per line."
+BATCH_PROGRESS_HEADER = "📦 Batch of {count} IDs – {done}/{count} done"
+BATCH_DONE_CAPTION = "📄 {ok} of {count} IDs found · {duration:.0f} sec"
+BATCH_EMPTY_MESSAGE = "❗ None of the IDs in your batch returned a result."
+
 CANCELLED_FROM_QUEUE_MESSAGE = "🗑️ Your request has been canceled and removed from the queue."
-CANCEL_MARKED_MESSAGE = "📛 Your request has been marked for cancellation. It will be stopped if it's currently processing."
+CANCEL_MARKED_MESSAGE = "🛑 Your search is being stopped – Agron is closed and freed after its current step."
 
 NO_HISTORY_MESSAGE = "📭 No completed searches found for your account."
 HISTORY_HEADER = "📜 *Your last 5 completed searches:*"
@@ -35,5 +66,6 @@ STATS_TEMPLATE = (
     "• Avg. Runtime: *{avg}* sec\n"
     "• Cancellations: *{cancelled}*"
 )
+STATS_QUEUE_WAIT_LINE = "• Avg. Queue Wait: *{avg}* sec (max {max} sec)"
 
 NOT_FOUND_MESSAGE = "❗ No matching record was found for the given ID. Please double-check and try again."
@@ -0,0 +1,55 @@
+# throttle.py – applies the per-user rate limits to handlers before they do any work
+import math
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from agron_bot.logger import logger
+from agron_bot.core.rate_limit import rate_limiter
+from agron_bot.handlers.messages import RATE_LIMITED_MESSAGE
+
+# Budget class of each inline button ("refresh:<id>" buttons start a search)
+CALLBACK_CLASSES = {
+    "status": "command",
+    "cancel": "command",
+    "history": "heavy",
+    "stats": "heavy",
+    "errors": "heavy",
+    "repeat": "search",
+}
+
+
+def callback_class(update: Update) -> str:
+    data = update.callback_query.data or ""
+    if data.startswith("refresh:"):
+        return "search"
+    return CALLBACK_CLASSES.get(data, "command")
+
+
+def rate_limited(kind, handler):
+    """
+    Wrap `handler` so it only runs while the user has budget left in class `kind`
+    (a class name, or a function of the update returning one). Over the limit the user
+    is told once when to retry; further updates until then are dropped.
+    """
+    async def _handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if user is None:
+            return await handler(update, context)
+
+        budget_class = kind(update) if callable(kind) else kind
+        wait = rate_limiter.check(user.id, budget_class)
+        if not wait:
+            return await handler(update, context)
+
+        warn = rate_limiter.should_warn(user.id, budget_class, wait)
+        text = RATE_LIMITED_MESSAGE.format(seconds=math.ceil(wait))
+        if warn:
+            logger.warning(f"🚦 Rate limit '{budget_class}' hit by {user.full_name} (ID: {user.id}), retry in {wait:.0f}s")
+        if update.callback_query:
+            # Always answered, or the button keeps spinning
+            await update.callback_query.answer(text if warn else None, show_alert=warn)
+        elif warn and update.message:
+            await update.message.reply_text(text)
+
+    return _handler
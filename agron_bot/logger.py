@@ -1,7 +1,12 @@
+import asyncio
 import logging
 import os
+import threading
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
+from agron_bot.utils import TokenBucket
+from agron_bot.core.tracing import current_trace
 
 # === טעינת משתני סביבה ===
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -14,19 +19,14 @@ os.makedirs(LOG_DIR, exist_ok=True)
 daily_log_file = os.path.join(LOG_DIR, f"agron-{datetime.now().strftime('%Y-%m-%d')}.log")
 error_log_file = os.path.join(LOG_DIR, "error.log")
 
-# === מונה לוגים עבור חיפושים בלבד ===
-search_log_counter = 0
-
-def reset_search_log_counter():
-    """איפוס מונה הלוגים של החיפוש (לקרוא בתחילת כל חיפוש חדש)"""
-    global search_log_counter
-    search_log_counter = 0
-
+# === לוגים של שלבי חיפוש (ממוספרים לפי עבודה) ===
 def log_search_step(message: str):
-    """כתיבת לוג עם מונה ספציפי לחיפוש"""
-    global search_log_counter
-    search_log_counter += 1
-    logger.info(f"[LOG {search_log_counter}] {message}")
+    """כתיבת לוג עם מזהה העבודה ומונה השלבים שלה (מתוך ה-trace הנוכחי)"""
+    trace = current_trace()
+    if trace is None:
+        logger.info(f"[LOG] {message}")
+    else:
+        logger.info(f"[job #{trace.job_id} · LOG {trace.next_step()}] {message}")
 
 # === פורמט לוגים רגיל (ללא מונה) ===
 default_format = logging.Formatter("[%(levelname)s] %(asctime)s %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
@@ -45,25 +45,92 @@ console_handler.setLevel(logging.INFO)
 console_handler.setFormatter(default_format)
 
 # === Handler לטלגרם ===
+TELEGRAM_MESSAGE_LIMIT = 4096
+# Records are batched into one message per flush interval
+TELEGRAM_LOG_FLUSH_INTERVAL = float(os.getenv("TELEGRAM_LOG_FLUSH_INTERVAL", "5"))
+# At most this many log messages per minute, with a small burst allowance
+TELEGRAM_LOG_PER_MINUTE = float(os.getenv("TELEGRAM_LOG_PER_MINUTE", "12"))
+TELEGRAM_LOG_BURST = int(os.getenv("TELEGRAM_LOG_BURST", "3"))
+# Records waiting beyond this are dropped and reported as a count
+TELEGRAM_LOG_MAX_PENDING = int(os.getenv("TELEGRAM_LOG_MAX_PENDING", "500"))
+
+
 class TelegramLogHandler(logging.Handler):
+    """
+    Ships log records to a Telegram chat in batches.
+    emit() only appends to a bounded buffer, so it is safe to call from any thread and never blocks;
+    a task on the bot's event loop sends the buffer as few ≤4096-char messages, rate limited.
+    """
+
     def __init__(self, bot, loop, chat_id):
         super().__init__()
         self.bot = bot
         self.loop = loop
         self.chat_id = chat_id
+        self.dropped = 0
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+        self._bucket = TokenBucket(TELEGRAM_LOG_PER_MINUTE / 60, TELEGRAM_LOG_BURST)
+        self._future = None
+
+    def start(self):
+        # run_coroutine_threadsafe works whether or not we are on the loop's thread
+        self._future = asyncio.run_coroutine_threadsafe(self._ship_loop(), self.loop)
 
     def emit(self, record):
         try:
             log_entry = self.format(record)
-            self.loop.create_task(self.bot.send_message(chat_id=self.chat_id, text=log_entry))
+            with self._pending_lock:
+                if len(self._pending) >= TELEGRAM_LOG_MAX_PENDING:
+                    self.dropped += 1
+                else:
+                    self._pending.append(log_entry[:TELEGRAM_MESSAGE_LIMIT])
         except Exception as e:
-            print(f"[Logger-Telegram] Failed to send log: {e}")
+            print(f"[Logger-Telegram] Failed to queue log: {e}")
+
+    def close(self):
+        if self._future:
+            self._future.cancel()
+        super().close()
+
+    async def _ship_loop(self):
+        while True:
+            await asyncio.sleep(TELEGRAM_LOG_FLUSH_INTERVAL)
+            try:
+                await self.flush_pending()
+            except Exception as e:
+                print(f"[Logger-Telegram] Failed to send log: {e}")
+
+    async def flush_pending(self):
+        """Send as many batched messages as the rate limit allows; the rest waits for the next flush."""
+        while True:
+            with self._pending_lock:
+                if not self._pending and not self.dropped:
+                    return
+                if not self._bucket.try_consume():
+                    return
+                text = self._take_batch()
+            await self.bot.send_message(chat_id=self.chat_id, text=text)
+
+    def _take_batch(self) -> str:
+        # Called with _pending_lock held
+        lines = []
+        if self.dropped:
+            lines.append(f"⚠️ {self.dropped} log records dropped (Telegram log overload)")
+            self.dropped = 0
+        size = sum(len(line) + 1 for line in lines)
+        while self._pending and size + len(self._pending[0]) + 1 <= TELEGRAM_MESSAGE_LIMIT:
+            entry = self._pending.popleft()
+            lines.append(entry)
+            size += len(entry) + 1
+        return "\n".join(lines)
 
 # === הפעלת שליחת לוגים לטלגרם ===
 def enable_telegram_logging(bot, loop, chat_id: int):
     telegram_handler = TelegramLogHandler(bot, loop, chat_id)
     telegram_handler.setLevel(logging.INFO)
     telegram_handler.setFormatter(default_format)
+    telegram_handler.start()
     logger.addHandler(telegram_handler)
     logger.info("📡 Telegram log handler is active.")
 
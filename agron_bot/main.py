@@ -23,21 +23,21 @@ print("DEVELOPER_ID:", os.getenv("DEVELOPER_ID"))
 # ייבוא הלוגר
 from agron_bot.logger import logger, enable_telegram_logging
 
-# 🔒 קובץ נעילה
+# 🔒 נעילת מופע יחיד (נעילת מערכת הפעלה – משתחררת גם אחרי קריסה)
+from agron_bot.core.instance_lock import InstanceLock, AlreadyRunning
 LOCK_FILE = os.path.join(BASE_DIR, "bot.lock")
-if os.path.exists(LOCK_FILE):
-    logger.error("⛔ Bot is already running. Access denied.")
-    print("⛔ Bot is already running. Access denied.")
+# A new instance started during a rolling restart waits this long for the old one to drain
+LOCK_WAIT = float(os.getenv("LOCK_WAIT", "0"))
+instance_lock = InstanceLock(LOCK_FILE)
+try:
+    instance_lock.acquire(wait=LOCK_WAIT)
+except AlreadyRunning as e:
+    logger.error(f"⛔ Bot is already running (PID {e.pid}). Access denied.")
+    print(f"⛔ Bot is already running (PID {e.pid}). Access denied.")
     sys.exit(1)
-with open(LOCK_FILE, "w") as f:
-    f.write("locked")
 
-# מחיקת קובץ נעילה ביציאה
 import atexit
-def remove_lock_file():
-    if os.path.exists(LOCK_FILE):
-        os.remove(LOCK_FILE)
-atexit.register(remove_lock_file)
+atexit.register(instance_lock.release)
 
 from telegram import BotCommand
 from telegram.ext import (
@@ -49,7 +49,12 @@ from telegram.ext import (
 )
 
 # ✅ ייבוא פנימי
-from agron_bot.handlers.handlers import handle_message
+from agron_bot.handlers.handlers import (
+    handle_message,
+    handle_document,
+    enable_position_updates,
+    resume_pending_jobs,
+)
 from agron_bot.worker import worker
 from agron_bot.handlers.commands import (
     start_command,
@@ -58,11 +63,20 @@ from agron_bot.handlers.commands import (
     history_command,
     stats_command,
     errors_command,
+    drain_command,
 )
 from agron_bot.handlers.callbacks import handle_callback
-from agron_bot.core.state import queue
-
-DEVELOPER_ID = int(os.getenv("DEVELOPER_ID", "5962330651"))
+from agron_bot.handlers.throttle import rate_limited, callback_class
+from agron_bot.core.state import queue, DEVELOPER_ID
+from agron_bot.core.targets import get_pool
+from agron_bot.core.job_journal import job_journal
+from agron_bot.core.lifecycle import lifecycle
+from agron_bot.core.watchdog import watchdog
+from agron_bot.core.waits import get_wait_stats
+from agron_bot.core.eta import eta_model
+
+# "polling" (default) or "webhook" (see core/webhook.py for the WEBHOOK_* settings)
+AGRON_MODE = os.getenv("AGRON_MODE", "polling")
 
 async def set_bot_commands(app):
     await app.bot.set_my_commands([
@@ -76,19 +90,47 @@ async def set_bot_commands(app):
 
 async def startup(app):
     # חיבור הלוגר לטלגרם
+    # The env var itself, not the DEVELOPER_ID default: logs only go to an explicitly configured account
     if os.getenv("TELEGRAM_TOKEN") and os.getenv("DEVELOPER_ID"):
         loop = asyncio.get_running_loop()
-        enable_telegram_logging(app.bot, loop, int(os.getenv("DEVELOPER_ID")))
+        enable_telegram_logging(app.bot, loop, DEVELOPER_ID)
         logger.info("📡 Telegram log handler enabled.")
     else:
         logger.warning("⚠️ Telegram log handler not active – missing TELEGRAM_TOKEN or DEVELOPER_ID in .env")
 
-    app.create_task(worker(queue))
+    pool = get_pool()
+    atexit.register(pool.shutdown)
+    enable_position_updates(queue)
+    # Requests accepted before a restart go back into the queue ahead of new ones
+    atexit.register(job_journal.close)
+    atexit.register(eta_model.save)
+    await resume_pending_jobs(queue, app.bot)
+    # Not app.create_task(): Application.stop() would wait forever for these loops
+    lifecycle.start(worker(queue, pool))
+    lifecycle.start(pool.health_check_loop())
+    lifecycle.start(eta_model.save_loop())
+    logger.info(f"🖥️ {len(pool.targets)} automation target(s): {', '.join(pool.targets)}")
     await set_bot_commands(app)
     logger.info(f"🚀 Bot started at {datetime.now().isoformat()}")
     if os.getenv("DEBUG") == "1":
         logger.info("🧪 DEBUG mode is active")
 
+async def shutdown(app):
+    """After polling stopped (Ctrl+C, SIGTERM or /drain): let the running search and uploads finish."""
+    await lifecycle.drain()
+    logger.info(f"👋 Bot stopped at {datetime.now().isoformat()}")
+
+def collect_metrics() -> dict:
+    pool = get_pool()
+    return {
+        "watchdog": watchdog.snapshot(),
+        "targets": {t.name: {"healthy": t.healthy, "failures": t.failures, "jobs_done": t.jobs_done}
+                    for t in pool.targets.values()},
+        "queued": queue.qsize(),
+        "running": lifecycle.running_jobs,
+        "step_waits": get_wait_stats(),
+    }
+
 async def notify_developer(bot, error):
     try:
         await bot.send_message(DEVELOPER_ID, f"❗️Critical error occurred:\n{str(error)}")
@@ -101,35 +143,37 @@ def main():
             ApplicationBuilder()
             .token(os.getenv("TELEGRAM_TOKEN"))
             .post_init(startup)
+            .post_stop(shutdown)
             .build()
         )
 
         # פקודות
-        app.add_handler(CommandHandler("start", start_command()))
-        app.add_handler(CommandHandler("status", status_command(queue)))
-        app.add_handler(CommandHandler("cancel", cancel_command(queue)))
-        app.add_handler(CommandHandler("history", history_command()))
-        app.add_handler(CommandHandler("stats", stats_command()))
-        app.add_handler(CommandHandler("errors", errors_command()))
+        app.add_handler(CommandHandler("start", rate_limited("command", start_command())))
+        app.add_handler(CommandHandler("status", rate_limited("command", status_command(queue))))
+        app.add_handler(CommandHandler("cancel", rate_limited("command", cancel_command(queue))))
+        app.add_handler(CommandHandler("history", rate_limited("heavy", history_command())))
+        app.add_handler(CommandHandler("stats", rate_limited("heavy", stats_command(queue))))
+        app.add_handler(CommandHandler("errors", rate_limited("heavy", errors_command())))
+        app.add_handler(CommandHandler("drain", drain_command(queue)))
 
         # כפתורי אינליין
-        app.add_handler(CallbackQueryHandler(handle_callback))
-
-        # הודעות רגילות
-        async def guarded_handle_message(update, context):
-            if queue.qsize() > 10:
-                msg = "🛑 High load at the moment. Try again in a few minutes."
-                await update.message.reply_text(msg)
-                logger.warning(f"User {update.effective_user.id} got load warning.")
-                return
-            await handle_message(queue)(update, context)
+        app.add_handler(CallbackQueryHandler(rate_limited(callback_class, handle_callback)))
 
-        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, guarded_handle_message))
+        # הודעות רגילות (per-user quotas are enforced by the scheduler in submit_search)
+        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, rate_limited("search", handle_message(queue))))
+        # קובץ רשימת ת"ז (batch)
+        app.add_handler(MessageHandler(filters.Document.ALL, rate_limited("search", handle_document(queue))))
 
         logger.info("🤖 Agron Bot is running...")
         print("🤖 Agron Bot is running...")
 
-        app.run_polling()
+        if AGRON_MODE == "webhook":
+            from agron_bot.core.webhook import run_webhook
+            # Ready = accepting work with at least one usable Agron target
+            run_webhook(app, ready=lambda: app.running and not lifecycle.draining and get_pool().healthy_count > 0,
+                        metrics=collect_metrics)
+        else:
+            app.run_polling()
 
     except Exception as e:
         logger.exception("❌ Unexpected error occurred in main()")
@@ -0,0 +1,160 @@
+# runner.py – Agron automation runner: claims searches from the job bus and runs them on this desktop
+#
+# Usage (one per Agron desktop/VM, next to a bot started with AGRON_TARGETS=r1:remote,...):
+#   python -m agron_bot.runner --name desk1
+#   python -m agron_bot.runner --name fake1 --backend fake
+import argparse
+import os
+import signal
+import threading
+import time
+
+from dotenv import load_dotenv
+
+# Same .env as the bot (TELEGRAM_TOKEN is not needed here, only the AGRON_* / JOB_BUS_* settings)
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+from agron_bot.core.agron_session import AgronSession
+from agron_bot.core.automation import AGRON_BACKEND, create_backend
+from agron_bot.core.cancel_state import CancelToken
+from agron_bot.core.executor import run_agron_and_capture_with_cancel_support
+from agron_bot.core.instance_lock import InstanceLock, AlreadyRunning
+from agron_bot.core.job_bus import JobBus, LeaseLost, JOB_BUS_HEARTBEAT
+from agron_bot.core.watchdog import watchdog
+from agron_bot.logger import logger
+
+# Idle runners look for work this often
+JOB_BUS_POLL = float(os.getenv("JOB_BUS_POLL", "0.25"))
+
+
+class Lease(threading.Thread):
+    """
+    Heartbeats a claimed job while the search runs and turns a bus-side cancel into `cancel_token`.
+    Also the runner's watchdog: a run past its deadlines gets its Agron killed (`stalled` says why).
+    """
+
+    def __init__(self, bus: JobBus, runner: str, bus_id: int, session: AgronSession):
+        super().__init__(name=f"lease-{bus_id}", daemon=True)
+        self.bus = bus
+        self.runner = runner
+        self.bus_id = bus_id
+        self.session = session
+        self.cancel_token = CancelToken()
+        self.lost = False
+        self.stalled: str | None = None
+        self._done = threading.Event()
+
+    def run(self):
+        started = time.monotonic()
+        while not self._done.wait(JOB_BUS_HEARTBEAT):
+            exceeded = watchdog.check(self.session.clock, started, time.monotonic())
+            if exceeded and not self.stalled:
+                self._stop_hung_run(*exceeded)
+            try:
+                if self.bus.heartbeat(self.runner, self.bus_id):
+                    self.cancel_token.cancel()
+            except LeaseLost:
+                # Another runner has the job now – stop working on it
+                self.lost = True
+                self.cancel_token.cancel()
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ Heartbeat for bus job {self.bus_id} failed: {e}")
+
+    def _stop_hung_run(self, kind: str, reason: str):
+        self.stalled = reason
+        watchdog.record_stall(kind)
+        logger.error(f"🐕 Watchdog: runner '{self.runner}' – {reason}; killing the Agron process tree")
+        self.session.force_kill()
+        if not self._done.wait(watchdog.grace):
+            # The search thread is this process's main thread and cannot be replaced: exit, and the
+            # expired lease hands the job to another runner (or to this one once it is restarted)
+            logger.critical(f"🧟 Runner '{self.runner}' still blocked {watchdog.grace:.0f}s after the kill – exiting")
+            os._exit(3)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def execute(session: AgronSession, payload: dict, cancel: CancelToken) -> tuple[dict, bytes | None]:
+    """Run one search and turn it into a bus outcome (plus the raw screenshot)."""
+    try:
+        result, was_cancelled = run_agron_and_capture_with_cancel_support(
+            payload["id_number"], payload["user_name"], session, cancel, render=False
+        )
+    except Exception as e:
+        logger.exception(f"❌ Runner search for ID '{payload['id_number']}' failed")
+        return {"status": "error", "error": str(e), "kind": type(e).__name__}, None
+    if was_cancelled:
+        return {"status": "cancelled"}, None
+    if result["status"] == "not_found":
+        return result, None
+    return {"status": "ok", "duration": result["duration"]}, result["raw_png"]
+
+
+def serve(bus: JobBus, name: str, session: AgronSession, stopping: threading.Event):
+    bus.register(name)
+    logger.info(f"🏃 Runner '{name}' (PID {os.getpid()}) waiting for jobs on {bus.path}")
+    try:
+        while not stopping.is_set():
+            claimed = bus.claim(name)
+            if claimed is None:
+                stopping.wait(JOB_BUS_POLL)
+                continue
+            bus_id, payload = claimed
+            logger.info(f"📥 Runner '{name}' took bus job {bus_id} (ID '{payload['id_number']}', "
+                        f"slot '{payload.get('slot')}')")
+            for attempt in range(watchdog.retries + 1):
+                lease = Lease(bus, name, bus_id, session)
+                lease.start()
+                try:
+                    outcome, raw_png = execute(session, payload, lease.cancel_token)
+                finally:
+                    lease.stop()
+                if not lease.stalled or lease.lost or attempt == watchdog.retries:
+                    break
+                logger.warning(f"🔁 Watchdog: retrying bus job {bus_id} on runner '{name}' ({lease.stalled})")
+            if lease.stalled and outcome["status"] == "error":
+                outcome["error"] = f"Agron stopped responding: {lease.stalled}"
+            if lease.lost or not bus.finish(name, bus_id, outcome, raw_png):
+                logger.warning(f"⚠️ Runner '{name}' lost the lease on bus job {bus_id}; result discarded")
+            else:
+                logger.info(f"📤 Runner '{name}' finished bus job {bus_id}: {outcome['status']}")
+    finally:
+        bus.unregister(name)
+        session.close()
+        bus.close()
+        logger.info(f"👋 Runner '{name}' stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Agron searches from the bot's job bus.")
+    parser.add_argument("--name", default=os.getenv("RUNNER_NAME", "runner1"))
+    parser.add_argument("--backend", default=AGRON_BACKEND, help="automation backend (pyautogui or fake)")
+    args = parser.parse_args()
+
+    # One runner per desktop: two would fight over the same GUI
+    lock = InstanceLock(f"runner-{args.name}.lock")
+    try:
+        lock.acquire()
+    except AlreadyRunning as e:
+        raise SystemExit(f"⛔ {e}")
+
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        # The current search finishes and its result is posted before the runner exits
+        logger.info(f"🛑 Runner '{args.name}' stopping after the current job")
+        stopping.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        serve(JobBus(), args.name, AgronSession(backend=create_backend(args.backend)), stopping)
+    finally:
+        lock.release()
+
+
+if __name__ == "__main__":
+    main()
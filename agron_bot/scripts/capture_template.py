@@ -0,0 +1,40 @@
+# capture_template.py – save a locator template (<name>.png) from the live screen
+#
+# Usage: python -m agron_bot.scripts.capture_template search_button
+#   Hover over the element's top-left corner, wait, then over its bottom-right corner.
+import os
+import sys
+import time
+
+import pyautogui
+
+from agron_bot.core.locator import ELEMENTS, LOCATOR_TEMPLATE_DIR
+
+
+def wait_for_corner(label: str) -> tuple[int, int]:
+    print(f"הזז את העכבר ל{label} של הרכיב בתוך 5 שניות...")
+    time.sleep(5)
+    x, y = pyautogui.position()
+    print(f"📍 X={x}, Y={y}")
+    return x, y
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in ELEMENTS:
+        print(f"Usage: python -m agron_bot.scripts.capture_template <{'|'.join(ELEMENTS)}>")
+        sys.exit(1)
+    name = sys.argv[1]
+
+    left, top = wait_for_corner("פינה השמאלית-עליונה")
+    right, bottom = wait_for_corner("פינה הימנית-תחתונה")
+    if right <= left or bottom <= top:
+        print("❌ Invalid corners.")
+        sys.exit(1)
+
+    path = os.path.join(LOCATOR_TEMPLATE_DIR, f"{name}.png")
+    pyautogui.screenshot(region=(left, top, right - left, bottom - top)).save(path)
+    print(f"✅ Saved template to {path}")
+
+
+if __name__ == "__main__":
+    main()
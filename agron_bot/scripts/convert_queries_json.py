@@ -0,0 +1,34 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from agron_bot.core.query_journal import QUERY_LOG_DIR, QUERY_LOG_NAME
+
+# ממיר את logs/queries.json הישן (מערך JSON אחד) לקובץ JSONL בפורמט היומן החדש.
+# הקובץ הישן נשמר בשם queries.json.bak.
+OLD_PATH = os.path.join(QUERY_LOG_DIR, "queries.json")
+
+if not os.path.exists(OLD_PATH):
+    print(f"❌ {OLD_PATH} not found.")
+    exit()
+
+with open(OLD_PATH, "r", encoding="utf-8") as f:
+    records = json.load(f)
+
+if not records:
+    print("✅ Nothing to convert.")
+    exit()
+
+# שם לפי הרשומה הראשונה, כדי שהקובץ ימוין לפני הקבצים החדשים
+first = records[0].get("timestamp", "0000-00-00 00:00:00")
+stamp = first.replace("-", "").replace(":", "").replace(" ", "-").replace("T", "-")[:15]
+new_path = os.path.join(QUERY_LOG_DIR, f"{QUERY_LOG_NAME}-{stamp}.jsonl")
+
+with open(new_path, "w", encoding="utf-8") as f:
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+os.replace(OLD_PATH, OLD_PATH + ".bak")
+print(f"✅ Converted {len(records)} records to {new_path}.")
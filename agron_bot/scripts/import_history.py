@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from agron_bot.core.history import HISTORY_DB, HISTORY_FILE, import_json_history
+
+# שימוש: python agron_bot/scripts/import_history.py [path/to/history.json]
+# מייבא את קובץ ההיסטוריה הישן (כל הפורמטים) למסד הנתונים. להריץ פעם אחת בלבד.
+json_path = sys.argv[1] if len(sys.argv) > 1 else HISTORY_FILE
+
+if not os.path.exists(json_path):
+    print(f"❌ {json_path} not found.")
+    exit()
+
+count = import_json_history(json_path)
+if count:
+    print(f"✅ Imported {count} records from {json_path} into {HISTORY_DB}.")
+else:
+    print(f"✅ {json_path} was already imported (or is empty).")
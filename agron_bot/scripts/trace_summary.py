@@ -0,0 +1,42 @@
+import json
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from agron_bot.core.tracing import trace_file
+from agron_bot.utils import percentile
+
+# שימוש: python agron_bot/scripts/trace_summary.py [YYYY-MM-DD]
+# מסכם את משכי השלבים (p50/p95) מתוך קובץ ה-traces של היום המבוקש.
+
+
+day = sys.argv[1] if len(sys.argv) > 1 else datetime.now().strftime("%Y-%m-%d")
+path = trace_file(day)
+
+if not os.path.exists(path):
+    print(f"❌ {path} not found.")
+    exit()
+
+durations = defaultdict(list)
+errors = defaultdict(int)
+jobs = set()
+with open(path, "r", encoding="utf-8") as f:
+    for line in f:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        durations[record["span"]].append(record["duration"])
+        jobs.add(record["job_id"])
+        if record.get("status") != "ok":
+            errors[record["span"]] += 1
+
+print(f"📊 Trace summary for {day} – {len(jobs)} jobs\n")
+print(f"{'span':<14}{'count':>7}{'p50 (s)':>10}{'p95 (s)':>10}{'max (s)':>10}{'errors':>8}")
+for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+    values.sort()
+    print(f"{name:<14}{len(values):>7}{percentile(values, 0.5):>10.2f}"
+          f"{percentile(values, 0.95):>10.2f}{values[-1]:>10.2f}{errors[name]:>8}")
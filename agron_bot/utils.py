@@ -1,2 +1,62 @@
+import re
+import threading
+import time
+
+
 def is_valid_id(id_number: str) -> bool:
     return id_number.isdigit() and 8 <= len(id_number) <= 9
+
+
+def parse_ids(text: str) -> tuple[list[str], list[str]]:
+    """
+    Split a multiline message or .txt/.csv content into (valid IDs, invalid tokens).
+    Duplicates are dropped keeping the first occurrence; words without digits (CSV headers) are ignored.
+    """
+    valid, invalid = [], []
+    for token in re.split(r"[\s,;]+", text):
+        token = token.strip("\"'")
+        if not token or not any(c.isdigit() for c in token):
+            continue
+        if not is_valid_id(token):
+            invalid.append(token)
+        elif token not in valid:
+            valid.append(token)
+    return valid, invalid
+
+
+def percentile(values, q: float, default: float | None = 0.0) -> float | None:
+    """Nearest-rank `q` quantile (0..1) of `values`, or `default` when there are none."""
+    ordered = sorted(values)
+    if not ordered:
+        return default
+    return ordered[min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))]
+
+
+def take_tokens(tokens: float, elapsed: float, rate: float, capacity: float, cost: float = 1) -> tuple[float, float]:
+    """
+    Token-bucket step: refill `tokens` for `elapsed` seconds at `rate` per second (up to
+    `capacity`), then spend `cost`. Returns (tokens left, 0) if allowed, otherwise the
+    refilled tokens (nothing spent) and the seconds until `cost` would be available.
+    """
+    tokens = min(capacity, tokens + elapsed * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_consume(self, amount: float = 1) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens, wait = take_tokens(self.tokens, now - self.updated, self.rate, self.capacity, amount)
+            self.updated = now
+            return wait == 0
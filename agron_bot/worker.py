@@ -1,125 +1,356 @@
 import os
+import time
 import asyncio
 from datetime import datetime
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton, InputFile
 
-from agron_bot.core.executor import run_agron_and_capture_with_cancel_support
+from agron_bot.core.executor import render_result, render_batch
 from agron_bot.logger import logger
-from agron_bot.core.cancel_state import should_cancel, clear_cancel
 from agron_bot.core.history import log_run
 from agron_bot.core.session import set_last_id  # ✅ חדש
+from agron_bot.core.targets import TargetPool, AutomationTarget
+from agron_bot.core.result_cache import result_cache
+from agron_bot.core.jobs import Job, BatchJob, Subscriber, inflight
+from agron_bot.core.job_journal import job_journal
+from agron_bot.core.tracing import use_trace, span
+from agron_bot.core.eta import eta_model
+from agron_bot.core.delivery import delivery, send_with_retry
+from agron_bot.core.lifecycle import lifecycle
+from agron_bot.handlers.messages import (
+    BATCH_PROGRESS_HEADER,
+    BATCH_DONE_CAPTION,
+    BATCH_EMPTY_MESSAGE,
+    NOT_FOUND_MESSAGE,
+)
 
-# Track if cancellation message was sent
-in_progress_message_sent = {}
+# Merged batch result: one multi-page "pdf" or a "zip" of per-ID PDFs
+BATCH_OUTPUT = os.getenv("BATCH_OUTPUT", "pdf")
 
-async def send_result_to_user(update, context, result: dict):
-    user = update.effective_user
-    chat_id = user.id
 
+def result_keyboard(id_number: str | None = None) -> InlineKeyboardMarkup:
+    rows = [[InlineKeyboardButton("🔁 חפש שוב", callback_data="repeat")]]
+    if id_number:
+        # Shown on cached results – lets the user force a fresh Agron search
+        rows.append([InlineKeyboardButton("🔄 רענן תוצאה", callback_data=f"refresh:{id_number}")])
+    rows.append([
+        InlineKeyboardButton("📜 היסטוריה", callback_data="history"),
+        InlineKeyboardButton("📈 סטטיסטיקות", callback_data="stats")
+    ])
+    return InlineKeyboardMarkup(rows)
+
+
+async def send_files(bot, chat_id: int, photo, document, caption: str, reply_markup=None):
+    """
+    Send the screenshot and the PDF in parallel (a media group cannot mix photos and documents).
+    Returns their file_ids. If only one of them fails, the user is told which file is missing and
+    its file_id is None; the error is raised only when neither arrived.
+    """
+    photo_message, document_message = await asyncio.gather(
+        send_with_retry(bot.send_photo, chat_id=chat_id, photo=photo, caption="🖼️ תוצאה בצילום מסך"),
+        send_with_retry(bot.send_document, chat_id=chat_id, document=document, caption=caption,
+                        reply_markup=reply_markup),
+        return_exceptions=True,
+    )
+    if isinstance(photo_message, BaseException) and isinstance(document_message, BaseException):
+        raise document_message
+    for kind, label, sent in (("photo", "צילום המסך", photo_message), ("document", "קובץ ה־PDF", document_message)):
+        if isinstance(sent, BaseException):
+            logger.error(f"❌ Could not send the result {kind} to chat {chat_id}: {sent}")
+            try:
+                await send_with_retry(bot.send_message, chat_id=chat_id, text=f"❗ שגיאה בשליחת {label}: {sent}")
+            except Exception as e:
+                logger.warning(f"⚠️ Could not report the missing file to chat {chat_id}: {e}")
+    return _file_id(photo_message, "photo"), _file_id(document_message, "document")
+
+
+def _file_id(sent, kind: str) -> str | None:
+    """file_id of a sent photo/document; None if the send failed."""
+    if sent is None or isinstance(sent, BaseException):
+        return None
+    if kind == "photo":
+        return sent.photo[-1].file_id if sent.photo else None
+    return sent.document.file_id if sent.document else None
+
+
+async def send_cached_result(subscriber: Subscriber, id_number: str, entry: dict):
+    """Answer from the result cache without touching Agron."""
+    chat_id = subscriber.chat_id
+    caption = f"📄 תוצאה שמורה מ־{datetime.fromtimestamp(entry['cached_at']).strftime('%H:%M')}"
+
+    uploaded = entry.get("file_ids", {}).get(chat_id, {})
+    photo, document = uploaded.get("photo"), uploaded.get("document")
+    if photo and document:
+        # Already sent to this user – resend by file_id (no upload)
+        await send_files(subscriber.bot, chat_id, photo, document, caption, result_keyboard(id_number))
+    else:
+        # The watermark names the requester, so render this user's copy from the raw screenshot
+        # (a file that did reach them before is still resent by file_id)
+        png, pdf = await asyncio.to_thread(render_result, entry["raw_png"], id_number, subscriber.user_name)
+        file_ids = await send_files(subscriber.bot, chat_id, photo or png,
+                                    document or InputFile(pdf, filename=entry["filename"]), caption,
+                                    result_keyboard(id_number))
+        result_cache.remember_upload(id_number, chat_id, *file_ids)
+    logger.info(f"⚡ Served cached result for ID '{id_number}' to {subscriber.user_name} (ID: {chat_id})")
+
+
+async def notify(subscriber: Subscriber, text: str) -> bool:
+    """Send a status message; a failed send is logged and never fails the job or its target."""
     try:
-        # Send screenshot
-        img_path = result.get("path")
-        if img_path and os.path.exists(img_path):
-            with open(img_path, "rb") as img_file:
-                await context.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=img_file,
-                    caption="🖼️ תוצאה בצילום מסך",
-                )
-            logger.info(f"📸 Screenshot sent to {user.full_name} (ID: {chat_id})")
-
-        # Send PDF
-        pdf_path = result.get("pdf_path")
-        if not pdf_path or not os.path.exists(pdf_path):
-            raise FileNotFoundError("❌ PDF result file not found.")
-
-        with open(pdf_path, "rb") as pdf_file:
-            await context.bot.send_document(
-                chat_id=chat_id,
-                document=InputFile(pdf_file),
-                filename=os.path.basename(pdf_path),
-                caption=f"📄 חיפוש הושלם ב־{result['duration']} שניות",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🔁 חפש שוב", callback_data="repeat")],
-                    [
-                        InlineKeyboardButton("📜 היסטוריה", callback_data="history"),
-                        InlineKeyboardButton("📈 סטטיסטיקות", callback_data="stats")
-                    ]
-                ])
-            )
-        logger.info(f"📤 Sent result PDF to {user.full_name} (ID: {chat_id})")
-
-        # ✅ Delete files after sending
-        try:
-            if img_path and os.path.exists(img_path):
-                os.remove(img_path)
-                logger.info(f"🗑️ Deleted screenshot: {img_path}")
-            if pdf_path and os.path.exists(pdf_path):
-                os.remove(pdf_path)
-                logger.info(f"🗑️ Deleted PDF: {pdf_path}")
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to delete files after sending: {e}")
+        await send_with_retry(subscriber.bot.send_message, chat_id=subscriber.chat_id, text=text)
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Could not message {subscriber.user_name} (ID: {subscriber.chat_id}): {e}")
+        return False
+
+
+async def send_result_to_user(subscriber: Subscriber, result: dict, id_number: str) -> bool:
+    chat_id = subscriber.chat_id
+
+    try:
+        # Both files are uploaded straight from memory
+        file_ids = await send_files(
+            subscriber.bot, chat_id, result["png"], InputFile(result["pdf"], filename=result["filename"]),
+            f"📄 חיפוש הושלם ב־{result['duration']} שניות", result_keyboard(),
+        )
+        result_cache.remember_upload(id_number, chat_id, *file_ids)
+        logger.info(f"📤 Sent result screenshot and PDF to {subscriber.user_name} (ID: {chat_id})")
+        return True
 
     except Exception as e:
         logger.exception("❌ Failed to send result to user")
-        await context.bot.send_message(chat_id=chat_id, text=f"❗ שגיאה בשליחת תוצאה: {str(e)}")
+        await subscriber.bot.send_message(chat_id=chat_id, text=f"❗ שגיאה בשליחת תוצאה: {str(e)}")
+        return False
 
 
-async def worker(queue: asyncio.Queue):
+async def worker(queue: asyncio.Queue, pool: TargetPool):
+    """Dispatcher: waits for a free automation target, then hands it the next queued job."""
+    eta_model.bind_workers(lambda: pool.healthy_count)
     while True:
-        update, context, id_number = await queue.get()
-        user = update.effective_user
-        user_id = user.id
-        user_name = user.full_name
-        user_info = f"{user_name} (ID: {user_id})"
+        target = await pool.acquire()
+        job = await queue.get()
+        lifecycle.track(asyncio.create_task(process_job(queue, pool, target, job)))
+
+
+async def deliver_to_subscribers(job: Job, result: dict, entry: dict):
+    """Send the result to the job's owner, then the same result to every other subscriber."""
+    owner = job.owner
+    # Read at delivery time, so users who cancelled while the upload was queued are skipped
+    subscribers = list(job.subscribers)
+    id_number = job.id_number
 
+    delivered = []
+    for subscriber in subscribers:
         try:
-            if should_cancel(user_id):
-                logger.info(f"⛔ Skipping ID '{id_number}' from {user_info} – cancel requested before start.")
-                await update.message.reply_text("❌ Your request was canceled before processing began.")
-                log_run(user_id, id_number, None, status="cancelled")
-                continue
+            if subscriber is owner:
+                if await send_result_to_user(owner, result, id_number):
+                    delivered.append(owner)
+            else:
+                await send_cached_result(subscriber, id_number, entry)
+                delivered.append(subscriber)
+        except Exception as e:
+            logger.exception(f"❌ Failed to send shared result for ID '{id_number}' to user {subscriber.user_id}")
+            await subscriber.bot.send_message(chat_id=subscriber.chat_id, text=f"❗ שגיאה בשליחת תוצאה: {str(e)}")
+
+    return delivered
+
 
-            logger.info(f"🔄 Started processing ID '{id_number}' from {user_info}")
-            await update.message.reply_text(f"🔍 Now processing your request for ID {id_number}...")
+async def deliver_result(job: Job, result: dict, entry: dict):
+    """Delivery stage entry point: upload a captured result and record the completed runs."""
+    with use_trace(job.trace), span("upload"):
+        delivered = await deliver_to_subscribers(job, result, entry)
 
-            loop = asyncio.get_running_loop()
-            result, was_cancelled = await loop.run_in_executor(
-                None, run_agron_and_capture_with_cancel_support, id_number, user_id, user_name
-            )
+    for subscriber in delivered:
+        log_run(subscriber.user_id, job.id_number, result["duration"], status="completed")
+        # Save last ID for repeat search
+        set_last_id(subscriber.user_id, job.id_number)
+    job_journal.complete(job, "completed")
+    logger.info(f"📬 Delivered ID '{job.id_number}' (job #{job.job_id}) to {len(delivered)} user(s)")
 
-            if was_cancelled:
-                await update.message.reply_text("🛑 Cancellation in progress... Closing Agron.")
-                logger.info(f"❌ Canceled during execution: ID '{id_number}' for {user_info}")
 
-                # Delete files if canceled
-                if result:
-                    for path in [result.get("path"), result.get("pdf_path")]:
-                        if path and os.path.exists(path):
-                            os.remove(path)
+async def process_job(queue: asyncio.Queue, pool: TargetPool, target: AutomationTarget, job: Job):
+    """Run one job on `target` with the job's trace as the current trace context."""
+    job.trace.record("queue_wait", job.trace.created, time.time() - job.trace.created)
+    with use_trace(job.trace), span("job", target=target.name):
+        await _run_job(queue, pool, target, job)
 
-                log_run(user_id, id_number, None, status="cancelled")
 
-            elif result:
-                await update.message.reply_text("📤 Uploading your result...")
-                await send_result_to_user(update, context, result)
+async def _run_job(queue: asyncio.Queue, pool: TargetPool, target: AutomationTarget, job: Job):
+    id_number = job.id_number
+    owner = job.owner
+    job_info = f"ID '{id_number}' (job #{job.job_id}, {len(job.subscribers)} subscriber(s), owner {owner.user_name})"
+    failed = False
+    completed_in = None
+    # Completion marker written when this returns; None when the delivery stage writes it instead
+    outcome = "cancelled"
 
-                minutes = int(result["duration"] // 60)
-                seconds = int(result["duration"] % 60)
-                duration_text = f"{minutes}m {seconds}s" if minutes else f"{seconds:.1f} seconds"
+    try:
+        if job.cancelled:
+            logger.info(f"⛔ Skipping {job_info} – all subscribers cancelled before start.")
+            return
+
+        job.started = True
+        started = time.monotonic()
+        eta_model.job_started(job.job_id, job.weight)
+        job_journal.started(job)
 
-                logger.info(f"✅ Completed ID '{id_number}' for {user_info} in {result['duration']:.2f} sec")
-                log_run(user_id, id_number, result["duration"], status="completed")
+        if isinstance(job, BatchJob):
+            outcome = None
+            failed = await _run_batch(target, job)
+            return
+        logger.info(f"🔄 Started processing {job_info} on target '{target.name}'")
+        for subscriber in list(job.subscribers):
+            await notify(subscriber, f"🔍 Now processing your request for ID {id_number}...")
 
-                # Save last ID for repeat search
-                set_last_id(user_id, id_number)
+        try:
+            result, was_cancelled = await target.search(id_number, owner.user_name, job.cancel_token)
+        except ValueError:
+            # Invalid input is not the target's fault
+            raise
+        except Exception:
+            # Only the search itself counts against the target's health, not messaging or delivery
+            failed = True
+            raise
 
+        if was_cancelled:
+            logger.info(f"❌ Canceled during execution: {job_info}")
+
+        elif result and result["status"] == "not_found":
+            # Still a complete run as far as target time goes, so it feeds the ETA model
+            completed_in = time.monotonic() - started
+            outcome = "not_found"
+            logger.info(f"🚫 No record for {job_info} ({result['duration']:.2f} sec)")
+            for subscriber in list(job.subscribers):
+                await notify(subscriber, NOT_FOUND_MESSAGE)
+                log_run(subscriber.user_id, id_number, result["duration"], status="not_found")
+
+        elif result:
+            completed_in = time.monotonic() - started
+            # Cached before the upload, so requests for this ID arriving meanwhile are served from it
+            entry = result_cache.put(id_number, raw_png=result["raw_png"], owner_id=owner.user_id,
+                                     filename=result["filename"], duration=result["duration"])
+            # The target is released as soon as this returns; uploads happen in the delivery stage
+            outcome = None
+            await delivery.submit(deliver_result, job, result, entry)
+            logger.info(f"✅ Captured {job_info} in {result['duration']:.2f} sec, handed to delivery "
+                        f"({delivery.pending} pending)")
+
+    except Exception as e:
+        outcome = "error"
+        logger.exception(f"❌ Error while processing {job_info}: {e}")
+        for subscriber in list(job.subscribers):
+            await notify(subscriber, f"❗ An error occurred:\n{str(e)}")
+            log_run(subscriber.user_id, id_number, None, status="error")
+
+    finally:
+        if outcome:
+            job_journal.complete(job, outcome)
+        # Only clean runs teach the ETA model; cancelled or failed runs just stop being tracked
+        eta_model.job_finished(job.job_id, completed_in)
+        inflight.finish(job)
+        pool.release(target, failed=failed)
+        queue.task_done(job)
+
+
+def _batch_progress(job: BatchJob, outcomes: dict, current: str | None) -> str:
+    lines = [BATCH_PROGRESS_HEADER.format(count=len(job.id_numbers), done=len(outcomes))]
+    for id_number in job.id_numbers:
+        if id_number in outcomes:
+            lines.append(outcomes[id_number])
+        elif id_number == current:
+            lines.append(f"🔍 {id_number}")
+        else:
+            lines.append(f"⏳ {id_number}")
+    return "\n".join(lines)
+
+
+async def _run_batch(target: AutomationTarget, batch: BatchJob) -> bool:
+    """
+    Search every ID of a batch on one target (one warm Agron session), editing progress into a
+    single status message, then send one merged document. Returns True if every search failed.
+    Sets the batch's completion marker unless the document is handed to the delivery stage.
+    """
+    owner = batch.owner
+    bot = owner.bot
+    started = time.time()
+    pages: list[tuple[str, bytes]] = []
+    outcomes: dict[str, str] = {}
+    errors = 0
+
+    logger.info(f"📦 Started batch job #{batch.job_id} ({len(batch.id_numbers)} IDs) on target '{target.name}'")
+    try:
+        status = await send_with_retry(bot.send_message, chat_id=owner.chat_id,
+                                       text=_batch_progress(batch, outcomes, batch.id_numbers[0]))
+    except Exception as e:
+        # The batch still runs; its document is sent at the end
+        logger.warning(f"⚠️ Could not send batch progress message: {e}")
+        status = None
+
+    for id_number in batch.id_numbers:
+        if batch.cancelled:
+            break
+
+        cached = result_cache.get(id_number)
+        try:
+            if cached:
+                pages.append((id_number, cached["raw_png"]))
+                outcomes[id_number] = f"⚡ {id_number}"
+                log_run(owner.user_id, id_number, 0.0, status="completed")
+            else:
+                with span("batch_item", id_number=id_number):
+                    result, was_cancelled = await target.search(id_number, owner.user_name, batch.cancel_token,
+                                                                render=False)
+                if was_cancelled:
+                    break
+                if result["status"] == "not_found":
+                    outcomes[id_number] = f"🚫 {id_number} – not found"
+                    log_run(owner.user_id, id_number, result["duration"], status="not_found")
+                else:
+                    result_cache.put(id_number, raw_png=result["raw_png"], owner_id=owner.user_id,
+                                     filename=result["filename"], duration=result["duration"])
+                    pages.append((id_number, result["raw_png"]))
+                    outcomes[id_number] = f"✅ {id_number} ({result['duration']:.0f}s)"
+                    log_run(owner.user_id, id_number, result["duration"], status="completed")
+        except Exception as e:
+            errors += 1
+            outcomes[id_number] = f"❗ {id_number} – {str(e)[:80]}"
+            logger.exception(f"❌ Batch job #{batch.job_id}: search for ID '{id_number}' failed")
+            log_run(owner.user_id, id_number, None, status="error")
+
+        if status is None:
+            continue
+        remaining = [i for i in batch.id_numbers if i not in outcomes]
+        try:
+            await status.edit_text(_batch_progress(batch, outcomes, remaining[0] if remaining else None))
         except Exception as e:
-            logger.exception(f"❌ Error while processing ID '{id_number}' for {user_info}: {e}")
-            await update.message.reply_text(f"❗ An error occurred:\n{str(e)}")
-            log_run(user_id, id_number, None, status="error")
-
-        finally:
-            clear_cancel(user_id)
-            in_progress_message_sent.pop(user_id, None)
-            queue.task_done()
+            logger.warning(f"⚠️ Could not update batch progress message: {e}")
+
+    if batch.cancelled:
+        logger.info(f"❌ Batch job #{batch.job_id} cancelled after {len(outcomes)}/{len(batch.id_numbers)} IDs")
+        job_journal.complete(batch, "cancelled")
+        return False
+
+    duration = time.time() - started
+    if not pages:
+        await notify(owner, BATCH_EMPTY_MESSAGE)
+        job_journal.complete(batch, "empty")
+        return errors == len(batch.id_numbers)
+
+    await delivery.submit(_deliver_batch, batch, pages, duration)
+    logger.info(f"✅ Captured batch job #{batch.job_id}: {len(pages)}/{len(batch.id_numbers)} IDs in {duration:.2f} sec")
+    return False
+
+
+async def _deliver_batch(batch: BatchJob, pages: list[tuple[str, bytes]], duration: float):
+    owner = batch.owner
+    with use_trace(batch.trace), span("upload"):
+        document = await asyncio.to_thread(render_batch, pages, owner.user_name, BATCH_OUTPUT)
+        filename = f"agron_batch_{datetime.now().strftime('%Y%m%d_%H%M')}.{'zip' if BATCH_OUTPUT == 'zip' else 'pdf'}"
+        await send_with_retry(
+            owner.bot.send_document,
+            chat_id=owner.chat_id,
+            document=InputFile(document, filename=filename),
+            caption=BATCH_DONE_CAPTION.format(ok=len(pages), count=len(batch.id_numbers), duration=duration),
+            reply_markup=result_keyboard(),
+        )
+    job_journal.complete(batch, "completed")
+    logger.info(f"📬 Delivered batch job #{batch.job_id} to {owner.user_name}")
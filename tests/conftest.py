@@ -0,0 +1,19 @@
+# conftest.py – offline test setup: no Agron, no Telegram, state files in a temp directory
+import logging
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+# Same as the load bench: relative paths (history, journal, bus, ETA state) land in a scratch dir
+os.chdir(tempfile.mkdtemp(prefix="agron-tests-"))
+
+from agron_bot.logger import logger  # noqa: E402
+
+# Keep test runs out of the repo's logs/ (error.log is tracked)
+for handler in list(logger.handlers):
+    if isinstance(handler, logging.FileHandler):
+        logger.removeHandler(handler)
+        handler.close()
@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+from agron_bot.core.eta import EtaModel, P2Quantile
+
+
+def exact(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[round(q * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9])
+def test_p2_tracks_quantile_of_a_stream(q):
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 0.5) for _ in range(5000)]
+    sketch = P2Quantile(q)
+    for value in values:
+        sketch.add(value)
+    assert sketch.value() == pytest.approx(exact(values, q), rel=0.05)
+
+
+def test_p2_before_five_samples_uses_nearest_rank():
+    sketch = P2Quantile(0.9)
+    assert sketch.value() is None
+    for value in (30, 10, 20):
+        sketch.add(value)
+    assert sketch.value() == 30
+
+
+def test_p2_roundtrip_keeps_estimating():
+    rng = random.Random(3)
+    sketch = P2Quantile(0.5)
+    for _ in range(100):
+        sketch.add(rng.uniform(0, 100))
+    copy = P2Quantile.from_dict(sketch.to_dict())
+    for _ in range(100):
+        value = rng.uniform(0, 100)
+        sketch.add(value)
+        copy.add(value)
+    assert copy.value() == sketch.value()
+
+
+def make_model(tmp_path, default: float = 10.0, workers: int = 1) -> EtaModel:
+    model = EtaModel(path=str(tmp_path / "eta.json"), default=default)
+    model.bind_workers(lambda: workers)
+    return model
+
+
+def test_estimate_counts_jobs_ahead(tmp_path):
+    model = make_model(tmp_path)
+    assert model.count == 0
+    assert model.estimate_wait(1) == pytest.approx(10)
+    assert model.estimate_wait(3) == pytest.approx(30)
+
+
+def test_estimate_weights_batches(tmp_path):
+    model = make_model(tmp_path)
+    # A single ID behind a 200-ID batch waits for 200 searches, not one
+    assert model.estimate_wait(2, work_ahead=200) == pytest.approx(2010)
+    # A batch of 5 at the front takes five searches
+    assert model.estimate_wait(1, work_ahead=0, weight=5) == pytest.approx(50)
+
+
+def test_estimate_with_a_free_worker_skips_the_queue(tmp_path):
+    model = make_model(tmp_path, workers=2)
+    model.job_started(1)
+    assert model.estimate_wait(1) == pytest.approx(10)
+    # The running job and the one ahead are split between both targets
+    assert model.estimate_wait(2) == pytest.approx(20, abs=0.1)
+
+
+def test_running_batch_counts_its_weight(tmp_path):
+    model = make_model(tmp_path)
+    model.job_started(1, weight=4)
+    assert model.running_left() == pytest.approx(40, abs=0.1)
+    assert model.estimate_wait(1) == pytest.approx(50, abs=0.1)
+    model.job_finished(1)
+    assert model.running_left() == 0
+
+
+def test_finished_runs_update_the_model(tmp_path):
+    model = make_model(tmp_path)
+    model.alpha = 0.5
+    model.job_started(1)
+    model.job_finished(1, duration=20)
+    assert model.expected == 20
+    model.job_finished(2, duration=40)
+    assert model.expected == 30
+    assert model.count == 2
+    # Cancelled runs say nothing about how long a search takes
+    model.job_finished(3)
+    assert model.count == 2
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    model = make_model(tmp_path)
+    for duration in (12, 18, 25, 31, 22, 19, 40):
+        model.job_finished(0, duration=duration)
+    model.save()
+
+    loaded = make_model(tmp_path)
+    assert loaded.count == model.count
+    assert loaded.expected == pytest.approx(model.expected)
+    assert loaded.p50.value() == pytest.approx(model.p50.value())
+    assert loaded.pessimistic == pytest.approx(model.pessimistic)
+
+
+def test_save_skips_unchanged_model(tmp_path):
+    model = make_model(tmp_path)
+    model.save()
+    assert not (tmp_path / "eta.json").exists()
+    model.job_finished(0, duration=15)
+    model.save()
+    assert (tmp_path / "eta.json").exists()
+    assert model._dump() is None
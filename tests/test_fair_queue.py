@@ -0,0 +1,205 @@
+import asyncio
+
+import pytest
+
+from agron_bot.core.jobs import BatchJob, InFlightRegistry, Job, Subscriber
+from agron_bot.core.state import FairJobQueue, JobQueue
+
+
+def make_job(user_id: int, id_number: str | None = None) -> Job:
+    job = Job(id_number or f"{100_000_000 + user_id}")
+    job.subscribe(Subscriber(None, user_id, user_id, f"user{user_id}"))
+    return job
+
+
+def fair_queue(**kwargs) -> FairJobQueue:
+    # No running cap unless a test asks for one, so drain() can take every job
+    kwargs.setdefault("max_running", 100)
+    kwargs.setdefault("tiers", {})
+    kwargs.setdefault("default_tier", 1)
+    return FairJobQueue(**kwargs)
+
+
+def drain(queue) -> list[Job]:
+    jobs = []
+    while True:
+        try:
+            jobs.append(queue.get_nowait())
+        except asyncio.QueueEmpty:
+            return jobs
+
+
+def test_round_robin_between_users():
+    queue = fair_queue()
+    first = [make_job(1) for _ in range(3)]
+    second = [make_job(2) for _ in range(2)]
+    third = [make_job(3)]
+    for job in first + second + third:
+        queue.put_nowait(job)
+
+    expected = [first[0], second[0], third[0], first[1], second[1], first[2]]
+    assert queue.head(6) == expected
+    assert [queue.position(job) for job in expected] == [1, 2, 3, 4, 5, 6]
+    assert drain(queue) == expected
+
+
+def test_remove_keeps_round_robin_positions():
+    queue = fair_queue()
+    first = [make_job(1) for _ in range(2)]
+    second = [make_job(2) for _ in range(2)]
+    for job in first + second:
+        queue.put_nowait(job)
+    assert queue.remove(second[0])
+    assert queue.position(second[0]) is None
+    assert [queue.position(job) for job in (first[0], second[1], first[1])] == [1, 2, 3]
+    assert drain(queue) == [first[0], second[1], first[1]]
+
+
+def test_lower_tier_is_served_first():
+    queue = fair_queue(tiers={9: 0})
+    regular = [make_job(1) for _ in range(2)]
+    for job in regular:
+        queue.put_nowait(job)
+    priority = make_job(9)
+    queue.put_nowait(priority)
+    assert queue.position(priority) == 1
+    assert queue.position(regular[0]) == 2
+    assert drain(queue) == [priority] + regular
+
+
+def test_running_quota_skips_user_until_task_done():
+    queue = fair_queue(max_running=1)
+    first = [make_job(1) for _ in range(2)]
+    for job in first:
+        queue.put_nowait(job)
+    other = make_job(2)
+    queue.put_nowait(other)
+
+    assert queue.get_nowait() is first[0]
+    assert queue.get_nowait() is other
+    # User 1 already has a running job
+    with pytest.raises(asyncio.QueueEmpty):
+        queue.get_nowait()
+    queue.task_done(first[0])
+    assert queue.get_nowait() is first[1]
+
+
+def test_task_done_wakes_getter_held_back_by_quota():
+    async def scenario():
+        queue = fair_queue(max_running=1)
+        first = [make_job(1) for _ in range(2)]
+        for job in first:
+            queue.put_nowait(job)
+        assert await queue.get() is first[0]
+        getter = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        queue.task_done(first[0])
+        assert await asyncio.wait_for(getter, 1) is first[1]
+
+    asyncio.run(scenario())
+
+
+def test_quota_released_by_task_done():
+    queue = fair_queue(max_per_user=2)
+    for _ in range(2):
+        queue.put_nowait(make_job(1))
+    assert not queue.can_accept(1)
+    job = queue.get_nowait()
+    assert queue.jobs_owned(1) == 2
+    queue.task_done(job)
+    assert queue.jobs_owned(1) == 1
+    assert queue.can_accept(1)
+
+
+def test_work_ahead_follows_serving_order():
+    queue = fair_queue()
+    batch = BatchJob([str(200_000_000 + i) for i in range(10)])
+    batch.subscribe(Subscriber(None, 1, 1, "user1"))
+    queue.put_nowait(batch)
+    later = make_job(1)
+    queue.put_nowait(later)
+    other = make_job(2)
+    queue.put_nowait(other)
+    # User 2 goes before user 1's second job, behind the batch
+    assert queue.work_ahead(batch) == 0
+    assert queue.work_ahead(other) == 10
+    assert queue.work_ahead(later) == 11
+
+
+def shared_job(registry: InFlightRegistry, users: list[int]) -> Job:
+    for user_id in users:
+        job, _ = registry.attach("123456782", Subscriber(None, user_id, user_id, f"user{user_id}"))
+    return job
+
+
+@pytest.mark.parametrize("make_queue", [JobQueue, fair_queue])
+def test_owner_handoff_on_cancel_while_queued(make_queue):
+    queue = make_queue(max_per_user=1)
+    registry = InFlightRegistry()
+    job = shared_job(registry, [1, 2])
+    queue.put_nowait(job)
+    assert queue.jobs_owned(1) == 1
+    assert queue.jobs_owned(2) == 0
+
+    assert not registry.detach(job, 1)
+    queue.reassign_owner(job)
+    assert job.owner.user_id == 2
+    assert queue.jobs_owned(1) == 0
+    assert queue.jobs_owned(2) == 1
+    assert queue.can_accept(1)
+    assert queue.position(job) == 1
+
+    assert queue.get_nowait() is job
+    queue.task_done(job)
+    assert queue.jobs_owned(2) == 0
+
+
+@pytest.mark.parametrize("make_queue", [JobQueue, fair_queue])
+def test_owner_handoff_on_cancel_while_running(make_queue):
+    queue = make_queue()
+    registry = InFlightRegistry()
+    job = shared_job(registry, [1, 2])
+    queue.put_nowait(job)
+    assert queue.get_nowait() is job
+
+    registry.detach(job, 1)
+    queue.reassign_owner(job)
+    assert queue.jobs_owned(1) == 0
+    assert queue.jobs_owned(2) == 1
+    # The slot is released from the new owner, not the one who left
+    queue.task_done(job)
+    assert queue.jobs_owned(1) == 0
+    assert queue.jobs_owned(2) == 0
+
+
+def test_owner_handoff_frees_running_slot():
+    queue = fair_queue(max_running=1)
+    registry = InFlightRegistry()
+    shared = shared_job(registry, [1, 2])
+    queue.put_nowait(shared)
+    waiting = make_job(1)
+    queue.put_nowait(waiting)
+    assert queue.get_nowait() is shared
+    with pytest.raises(asyncio.QueueEmpty):
+        queue.get_nowait()
+
+    registry.detach(shared, 1)
+    queue.reassign_owner(shared)
+    assert queue.get_nowait() is waiting
+
+
+def test_owner_handoff_moves_job_to_new_owner_turn():
+    queue = fair_queue()
+    registry = InFlightRegistry()
+    shared = shared_job(registry, [1, 2])
+    queue.put_nowait(shared)
+    own = make_job(2)
+    queue.put_nowait(own)
+    assert queue.head(2) == [shared, own]
+
+    registry.detach(shared, 1)
+    queue.reassign_owner(shared)
+    # Now user 2's second job, behind the one they already had waiting
+    assert queue.head(2) == [own, shared]
+    assert queue.position(shared) == 2
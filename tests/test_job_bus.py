@@ -0,0 +1,134 @@
+import time
+
+import pytest
+
+from agron_bot.core.job_bus import JobBus, LeaseLost
+
+LEASE = 0.2
+
+
+@pytest.fixture
+def bus_path(tmp_path):
+    return str(tmp_path / "bus.db")
+
+
+@pytest.fixture
+def front(bus_path):
+    bus = JobBus(bus_path, lease=LEASE)
+    yield bus
+    bus.close()
+
+
+@pytest.fixture
+def runner(bus_path):
+    """A second connection, as a runner process would have."""
+    bus = JobBus(bus_path, lease=LEASE)
+    bus.register("runner-a")
+    bus.register("runner-b")
+    yield bus
+    bus.close()
+
+
+def test_claim_and_finish(front, runner):
+    bus_id = front.submit({"id_number": "123456782"})
+    assert runner.claim("runner-a") == (bus_id, {"id_number": "123456782"})
+    assert runner.claim("runner-b") is None
+    assert front.take_result(bus_id) is None
+
+    assert runner.finish("runner-a", bus_id, {"status": "found"}, b"png")
+    assert front.take_result(bus_id) == ({"status": "found"}, b"png")
+    # Taking the result removes the job
+    assert front.take_result(bus_id) is None
+
+
+def test_jobs_are_claimed_in_order(front, runner):
+    first = front.submit({"n": 1})
+    second = front.submit({"n": 2})
+    assert runner.claim("runner-a")[0] == first
+    assert runner.claim("runner-b")[0] == second
+
+
+def test_expired_lease_is_redispatched(front, runner):
+    bus_id = front.submit({"n": 1})
+    runner.claim("runner-a")
+    # Heartbeats keep the job with its runner
+    time.sleep(LEASE / 2)
+    runner.heartbeat("runner-a", bus_id)
+    time.sleep(LEASE / 2)
+    assert runner.claim("runner-b") is None
+
+    time.sleep(LEASE * 1.5)
+    assert runner.claim("runner-b") == (bus_id, {"n": 1})
+
+
+def test_stale_runner_result_is_discarded(front, runner):
+    bus_id = front.submit({"n": 1})
+    runner.claim("runner-a")
+    time.sleep(LEASE * 1.5)
+    runner.claim("runner-b")
+
+    with pytest.raises(LeaseLost):
+        runner.heartbeat("runner-a", bus_id)
+    assert not runner.finish("runner-a", bus_id, {"status": "found", "by": "a"})
+    assert front.take_result(bus_id) is None
+
+    assert runner.finish("runner-b", bus_id, {"status": "found", "by": "b"})
+    assert front.take_result(bus_id) == ({"status": "found", "by": "b"}, None)
+
+
+def test_max_attempts_fails_the_job(bus_path, front):
+    runner = JobBus(bus_path, lease=LEASE, max_attempts=2)
+    try:
+        bus_id = front.submit({"n": 1})
+        runner.claim("runner-a")
+        time.sleep(LEASE * 1.5)
+        assert runner.claim("runner-b")[0] == bus_id
+        time.sleep(LEASE * 1.5)
+        # Third claim: the job has used its attempts and is failed instead
+        assert runner.claim("runner-a") is None
+    finally:
+        runner.close()
+    outcome, raw_png = front.take_result(bus_id)
+    assert outcome["status"] == "error"
+    assert raw_png is None
+
+
+def test_cancel_queued_job(front, runner):
+    bus_id = front.submit({"n": 1})
+    front.cancel(bus_id)
+    assert runner.claim("runner-a") is None
+    assert front.take_result(bus_id) == ({"status": "cancelled"}, None)
+
+
+def test_cancel_running_job_is_seen_on_heartbeat(front, runner):
+    bus_id = front.submit({"n": 1})
+    runner.claim("runner-a")
+    assert not runner.heartbeat("runner-a", bus_id)
+    front.cancel(bus_id)
+    assert runner.heartbeat("runner-a", bus_id)
+
+
+def test_orphaned_only_without_live_runners(front, bus_path):
+    runner = JobBus(bus_path, lease=LEASE)
+    try:
+        runner.register("runner-a")
+        bus_id = front.submit({"n": 1})
+        runner.claim("runner-a")
+        assert not front.orphaned(bus_id)
+        time.sleep(LEASE * 1.5)
+        # The lease ran out and the only runner stopped heartbeating
+        assert front.orphaned(bus_id)
+        runner.register("runner-b")
+        assert not front.orphaned(bus_id)
+    finally:
+        runner.close()
+
+
+def test_cancel_all_keeps_leased_jobs_for_their_runner(front, runner):
+    running = front.submit({"n": 1})
+    queued = front.submit({"n": 2})
+    runner.claim("runner-a")
+    assert front.cancel_all() == 1
+    assert runner.claim("runner-b") is None
+    assert runner.heartbeat("runner-a", running)
+    assert front.take_result(queued) is None
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from agron_bot.core.jobs import BatchJob, Job, Subscriber
+from agron_bot.core.state import JobQueue
+
+
+def make_job(user_id: int, id_number: str | None = None) -> Job:
+    job = Job(id_number or f"{100_000_000 + user_id}")
+    job.subscribe(Subscriber(None, user_id, user_id, f"user{user_id}"))
+    return job
+
+
+def fill(queue: JobQueue, count: int, user_id: int = 1) -> list[Job]:
+    jobs = [make_job(user_id) for _ in range(count)]
+    for job in jobs:
+        queue.put_nowait(job)
+    return jobs
+
+
+def test_positions_follow_arrival_order():
+    queue = JobQueue()
+    jobs = fill(queue, 5)
+    assert [queue.position(job) for job in jobs] == [1, 2, 3, 4, 5]
+    assert queue.head(3) == jobs[:3]
+
+
+def test_remove_shifts_later_jobs_up():
+    queue = JobQueue()
+    jobs = fill(queue, 5)
+    assert queue.remove(jobs[1])
+    assert not queue.remove(jobs[1])
+    assert queue.position(jobs[1]) is None
+    assert [queue.position(job) for job in jobs if job is not jobs[1]] == [1, 2, 3, 4]
+    assert queue.qsize() == 4
+
+
+def test_get_skips_removed_jobs_and_keeps_order():
+    queue = JobQueue()
+    jobs = fill(queue, 4)
+    queue.remove(jobs[0])
+    queue.remove(jobs[2])
+    assert queue.get_nowait() is jobs[1]
+    assert queue.get_nowait() is jobs[3]
+    with pytest.raises(asyncio.QueueEmpty):
+        queue.get_nowait()
+
+
+def test_positions_survive_tree_rebuild():
+    # More arrivals than the initial tree size force a re-base of the Fenwick index
+    queue = JobQueue()
+    jobs = fill(queue, 200)
+    for job in jobs[:150]:
+        assert queue.get_nowait() is job
+    later = fill(queue, 100)
+    waiting = jobs[150:] + later
+    assert [queue.position(job) for job in waiting] == list(range(1, len(waiting) + 1))
+    queue.remove(waiting[10])
+    assert queue.position(waiting[11]) == 11
+
+
+def test_work_ahead_counts_batch_ids():
+    queue = JobQueue()
+    owner = Subscriber(None, 1, 1, "user1")
+    batch = BatchJob([str(200_000_000 + i) for i in range(20)])
+    batch.subscribe(owner)
+    queue.put_nowait(batch)
+    single = make_job(2)
+    queue.put_nowait(single)
+    assert queue.position(single) == 2
+    assert queue.work_ahead(single) == 20
+    assert queue.work_ahead(batch) == 0
+    queue.remove(batch)
+    assert queue.work_ahead(single) == 0
+
+
+def test_quota_counts_queued_and_running_until_task_done():
+    queue = JobQueue(max_per_user=2)
+    first, second = fill(queue, 2)
+    assert queue.jobs_owned(1) == 2
+    assert not queue.can_accept(1)
+
+    job = queue.get_nowait()
+    assert job is first
+    # Still owned while it runs
+    assert queue.jobs_owned(1) == 2
+    queue.task_done(job)
+    assert queue.jobs_owned(1) == 1
+    assert queue.can_accept(1)
+
+    queue.remove(second)
+    assert queue.jobs_owned(1) == 0
+
+
+def test_join_waits_for_task_done():
+    async def scenario():
+        queue = JobQueue()
+        fill(queue, 1)
+        job = await queue.get()
+        joined = asyncio.ensure_future(queue.join())
+        await asyncio.sleep(0)
+        assert not joined.done()
+        queue.task_done(job)
+        await asyncio.wait_for(joined, 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,89 @@
+import pytest
+
+from agron_bot.core.rate_limit import Budget, MemoryBucketStore, RateLimiter, SqliteBucketStore, parse_budgets
+from agron_bot.utils import take_tokens
+
+
+def test_take_tokens_refills_up_to_capacity():
+    assert take_tokens(0, 100, rate=1, capacity=5) == (4, 0)
+    assert take_tokens(2, 1, rate=1, capacity=5, cost=2) == (1, 0)
+
+
+def test_take_tokens_reports_wait_without_spending():
+    tokens, wait = take_tokens(0.5, 0, rate=0.5, capacity=5)
+    assert tokens == 0.5
+    assert wait == pytest.approx(1)
+
+
+def test_parse_budgets_skips_invalid_and_zero_entries():
+    budgets = parse_budgets("search=10/60, bad, heavy=0/60, command=5/0, upload=x/10, burst=2/4")
+    assert set(budgets) == {"search", "burst"}
+    assert budgets["search"].capacity == 10
+    assert budgets["burst"].rate == 0.5
+    assert budgets["burst"].idle_after == 4
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBucketStore()
+    return SqliteBucketStore(str(tmp_path / "limits.db"))
+
+
+def test_store_limits_and_refills(store):
+    budget = Budget(2, 10)
+    assert store.take("search:1", budget, now=0) == 0
+    assert store.take("search:1", budget, now=0) == 0
+    assert store.take("search:1", budget, now=0) == pytest.approx(5)
+    # Other keys have their own bucket
+    assert store.take("search:2", budget, now=0) == 0
+    # One token back after 5 s
+    assert store.take("search:1", budget, now=5) == 0
+    assert store.take("search:1", budget, now=5) > 0
+
+
+def test_store_expires_idle_buckets(store):
+    budget = Budget(1, 10)
+    store.take("search:1", budget, now=0)
+    store.take("search:2", budget, now=8)
+    assert store.expire(now=12, idle_after=budget.idle_after) == 1
+    # The forgotten bucket starts full
+    assert store.take("search:1", budget, now=12) == 0
+    assert store.take("search:2", budget, now=12) > 0
+
+
+def test_memory_store_drops_least_recently_used():
+    store = MemoryBucketStore(max_keys=2)
+    budget = Budget(1, 60)
+    for key in ("a", "b", "c"):
+        store.take(key, budget, now=0)
+    assert len(store) == 2
+    assert store.take("a", budget, now=0) == 0
+    assert store.take("c", budget, now=0) > 0
+
+
+def test_limiter_throttles_and_counts():
+    limiter = RateLimiter({"search": Budget(1, 60)})
+    assert limiter.check(1, "search") == 0
+    wait = limiter.check(1, "search")
+    assert 0 < wait <= 60
+    assert limiter.throttled == 1
+    # Unknown classes are not limited
+    assert limiter.check(1, "other") == 0
+    assert limiter.check(1, "other") == 0
+
+
+def test_limiter_exempts_users():
+    limiter = RateLimiter({"search": Budget(1, 60)}, exempt={7})
+    for _ in range(5):
+        assert limiter.check(7, "search") == 0
+    assert limiter.throttled == 0
+
+
+def test_should_warn_once_per_throttle():
+    limiter = RateLimiter({"search": Budget(1, 60)})
+    limiter.check(1, "search")
+    wait = limiter.check(1, "search")
+    assert limiter.should_warn(1, "search", wait)
+    assert not limiter.should_warn(1, "search", wait)
+    assert limiter.should_warn(2, "search", wait)